@@ -0,0 +1,198 @@
+# /home/ubuntu/lab_scheduler/benchmarks/booking_release_load_test.py
+
+# Simula a abertura semanal (RELEASE_TIME): N usuários enviam POST /api/bookings ao
+# mesmo tempo para a mesma semana, disputando em parte as mesmas salas, e se comportam
+# como o frontend (respeitam Retry-After e reenviam o X-Queue-Token em respostas 503).
+#
+# Reporta a latência até a resposta final de cada usuário (p50/p99), as respostas por
+# status e a justiça do atendimento: o tau de Kendall entre a ordem de chegada e a ordem
+# de conclusão (1 = ordem de chegada perfeita) e o índice de Jain das latências.
+#
+# Roda a aplicação completa (src.main.create_app) em um servidor com um pool fixo de threads, como um
+# worker gthread do gunicorn (--server-threads = --threads), com um SQLite temporário. A janela de agendamento é considerada
+# aberta durante o teste (is_booking_allowed é substituído), independente da data atual.
+#
+# Uso (a partir da pasta lab_scheduler):
+#     python -m benchmarks.booking_release_load_test --users 200
+#     python -m benchmarks.booking_release_load_test --users 200 --no-admission
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PERIODS = ["Manhã", "Tarde"]
+MAX_ATTEMPTS = 20
+
+def create_app(args):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'release_load_test.db')}"
+    os.environ["EMAIL_OUTBOX_DISPATCHER_ENABLED"] = "false"
+    os.environ["SCHEDULE_EVENTS_ENABLED"] = "false"
+    from src.main import create_app, init_database
+    from src.routes import booking_routes
+    booking_routes.is_booking_allowed = lambda booking_date, group=None: (True, "OK")
+    app = create_app({
+        "PDF_PRERENDER_ENABLED": False,
+        "MAIL_SUPPRESS_SEND": True,
+        "BOOKING_ADMISSION_ENABLED": not args.no_admission,
+        "BOOKING_ADMISSION_MAX_IN_FLIGHT": args.max_in_flight,
+        "BOOKING_ADMISSION_QUEUE_SIZE": args.queue_size,
+    })
+    app.logger.setLevel("ERROR")
+    with app.app_context():
+        init_database(app)
+    return app
+
+# Como o gthread: conexões além das threads livres esperam na fila do pool
+def make_pooled_server(app, threads):
+    from werkzeug.serving import BaseWSGIServer
+    class PooledWSGIServer(BaseWSGIServer):
+        executor = ThreadPoolExecutor(max_workers=threads)
+        request_queue_size = 1024
+        def process_request(self, request, client_address):
+            self.executor.submit(self._handle, request, client_address)
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+    return PooledWSGIServer("127.0.0.1", 0, app)
+
+def build_requests(users, slots_per_user, popular_rooms, room_ids, week_start):
+    rng = random.Random(42)
+    dates = [week_start + timedelta(days=i) for i in range(5)]
+    requests = []
+    for user in range(users):
+        # Metade dos usuários disputa as salas mais procuradas
+        candidate_rooms = room_ids[:popular_rooms] if user % 2 == 0 else room_ids
+        slots = set()
+        while len(slots) < slots_per_user:
+            slots.add((rng.choice(candidate_rooms), rng.choice(dates).isoformat(), rng.choice(PERIODS)))
+        requests.append({
+            "user_name": f"Usuário {user}", "user_email": f"usuario{user}@example.com",
+            "coordinator_name": "Coordenador",
+            "slots": [{"room_id": room_id, "booking_date": day, "period": period} for room_id, day, period in sorted(slots)]
+        })
+    return requests
+
+def run_user(base_url, payload, result):
+    body = json.dumps(payload).encode()
+    queue_token = None
+    started = time.perf_counter()
+    result["started"] = started
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        headers = {"Content-Type": "application/json"}
+        if queue_token:
+            headers["X-Queue-Token"] = queue_token
+        request = urllib.request.Request(f"{base_url}/api/bookings", data=body, headers=headers, method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                status, response_body, retry_after = response.status, response.read(), None
+        except urllib.error.HTTPError as e:
+            status, response_body, retry_after = e.code, e.read(), e.headers.get("Retry-After")
+        except Exception as e:
+            status, response_body, retry_after = f"erro ({type(e).__name__})", b"", None
+        result.update(status=status, attempts=attempt)
+        if status != 503:
+            break
+        try:
+            rejection = json.loads(response_body)
+        except ValueError:
+            rejection = {}
+        queue_token = rejection.get("queue_token")
+        if not queue_token:
+            break
+        retry_after_seconds = rejection["retry_after_ms"] / 1000 if "retry_after_ms" in rejection else float(retry_after or 1)
+        time.sleep(retry_after_seconds * random.uniform(0.8, 1.2))
+    result["finished"] = time.perf_counter()
+    result["latency_ms"] = (result["finished"] - started) * 1000
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+# Tau de Kendall entre ordem de chegada e ordem de conclusão
+def kendall_tau(arrival_order, completion_times):
+    concordant = discordant = 0
+    for i in range(len(arrival_order)):
+        for j in range(i + 1, len(arrival_order)):
+            a = completion_times[arrival_order[i]]
+            b = completion_times[arrival_order[j]]
+            if a < b:
+                concordant += 1
+            elif a > b:
+                discordant += 1
+    total = concordant + discordant
+    return (concordant - discordant) / total if total else 1.0
+
+def jain_index(values):
+    return sum(values) ** 2 / (len(values) * sum(v * v for v in values)) if values else 1.0
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do POST /api/bookings na abertura semanal")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--slots-per-user", type=int, default=2)
+    parser.add_argument("--popular-rooms", type=int, default=5)
+    parser.add_argument("--spread-ms", type=float, default=200, help="intervalo em que as chegadas se distribuem")
+    parser.add_argument("--max-in-flight", type=int, default=4)
+    parser.add_argument("--queue-size", type=int, default=32)
+    parser.add_argument("--server-threads", type=int, default=64, help="threads do worker (gunicorn --threads)")
+    parser.add_argument("--no-admission", action="store_true", help="desliga o controle de admissão")
+    args = parser.parse_args()
+
+    app = create_app(args)
+    from src.models.entities import Room
+    with app.app_context():
+        room_ids = [room.id for room in Room.query.order_by(Room.id)]
+    today = date.today()
+    week_start = today + timedelta(days=7 - today.weekday())
+    payloads = build_requests(args.users, args.slots_per_user, args.popular_rooms, room_ids, week_start)
+
+    server = make_pooled_server(app, args.server_threads)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    results = [{} for _ in payloads]
+    threads = []
+    start_at = time.perf_counter() + 0.5
+    for index, payload in enumerate(payloads):
+        def delayed_user(index=index, payload=payload):
+            time.sleep(max(0, start_at + index * args.spread_ms / 1000 / len(payloads) - time.perf_counter()))
+            run_user(base_url, payload, results[index])
+        thread = threading.Thread(target=delayed_user)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    server.shutdown()
+
+    latencies = sorted(result["latency_ms"] for result in results)
+    statuses = {}
+    for result in results:
+        statuses[str(result["status"])] = statuses.get(str(result["status"]), 0) + 1
+    arrival_order = sorted(range(len(results)), key=lambda i: results[i]["started"])
+    tau = kendall_tau(arrival_order, [result["finished"] for result in results])
+
+    print(f"Controle de admissão: {'desligado' if args.no_admission else f'ligado (max_in_flight={args.max_in_flight}, fila={args.queue_size})'}")
+    print(f"{args.users} usuários, {args.slots_per_user} slots cada, chegadas em {args.spread_ms:.0f}ms, {args.server_threads} threads no servidor")
+    print(f"Latência até a resposta final: p50={percentile(latencies, 0.50):.1f}ms p99={percentile(latencies, 0.99):.1f}ms máx={latencies[-1]:.1f}ms")
+    print(f"Respostas finais: {dict(sorted(statuses.items()))}")
+    print(f"Tentativas: média={sum(r['attempts'] for r in results) / len(results):.2f} máx={max(r['attempts'] for r in results)}")
+    if not args.no_admission:
+        from src.services.booking_admission import booking_admission
+        print(f"Admissão: {booking_admission.stats()}")
+    print(f"Justiça: tau de Kendall (chegada x conclusão)={tau:.3f} índice de Jain das latências={jain_index(latencies):.3f}")
+
+if __name__ == "__main__":
+    main()
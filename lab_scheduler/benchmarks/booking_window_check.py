@@ -0,0 +1,167 @@
+# /home/ubuntu/lab_scheduler/benchmarks/booking_window_check.py
+
+# Confere o calendário pré-calculado de src/services/booking_window.py contra a
+# implementação anterior de is_booking_allowed / get_booking_status (copiada abaixo, com o
+# horário atual como parâmetro) e mede o custo de cada uma.
+#
+# Propriedades verificadas, para várias semanas em volta de hoje:
+#   - mesmo (permitido, mensagem) e mesmo status em cada fronteira (cutoff, release, virada
+#     de semana) e 1 microssegundo antes/depois dela, para todas as datas de 3 semanas;
+#   - o mesmo em instantes aleatórios;
+#   - o status não muda entre now e next_transition_at, e muda (ou vira a semana) nele.
+#
+# Uso (a partir da pasta lab_scheduler):
+#     python -m benchmarks.booking_window_check
+#     python -m benchmarks.booking_window_check --weeks 104 --samples 50000
+
+import argparse
+import os
+import random
+import sys
+import time as time_module
+from datetime import datetime, date, time, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from src.services.booking_window import BookingWindow, week_begins_at
+
+# --- Implementação anterior (booking_routes.py), referência das regras ---
+CUTOFF_WEEKDAY = 2
+CUTOFF_TIME = time(21, 0, 0, tzinfo=timezone.utc)
+RELEASE_WEEKDAY = 3
+RELEASE_TIME = time(2, 59, 0, tzinfo=timezone.utc)
+
+def get_monday_of_week(input_date):
+    if input_date.weekday() == 6:
+        return input_date + timedelta(days=1)
+    return input_date - timedelta(days=input_date.weekday())
+
+def legacy_windows(now_utc):
+    start_of_current_week = get_monday_of_week(now_utc.date())
+    start_of_next_week = start_of_current_week + timedelta(days=7)
+    cutoff_current = datetime.combine(start_of_current_week + timedelta(days=CUTOFF_WEEKDAY), CUTOFF_TIME)
+    release_next = datetime.combine(start_of_current_week + timedelta(days=RELEASE_WEEKDAY), RELEASE_TIME)
+    time_midnight_utc = time(0, 0, 0, tzinfo=timezone.utc)
+    time_3am_utc = time(3, 0, 0, tzinfo=timezone.utc)
+    if RELEASE_TIME < time_midnight_utc or (RELEASE_TIME >= time_midnight_utc and RELEASE_TIME < time_3am_utc):
+        release_next += timedelta(days=1)
+    cutoff_next = datetime.combine(start_of_next_week + timedelta(days=CUTOFF_WEEKDAY), CUTOFF_TIME)
+    return start_of_current_week, start_of_next_week, cutoff_current, release_next, cutoff_next
+
+def legacy_is_booking_allowed(booking_date_obj, now_utc):
+    start_of_current_week, start_of_next_week, cutoff_current, release_next, cutoff_next = legacy_windows(now_utc)
+    end_of_current_week = start_of_current_week + timedelta(days=4)
+    end_of_next_week = start_of_next_week + timedelta(days=4)
+    if booking_date_obj.weekday() >= 5:
+        return False, f"Agendamentos só permitidos de Seg-Sex. Data: {booking_date_obj.strftime('%d/%m/%Y')} é fim de semana."
+    if start_of_current_week <= booking_date_obj <= end_of_current_week:
+        if now_utc >= cutoff_current:
+            return False, f"Agendamento para semana atual ({start_of_current_week.strftime('%d/%m')}-{end_of_current_week.strftime('%d/%m')}) encerrou Qua 18:00 (Horário Local)."
+        return True, "OK"
+    elif start_of_next_week <= booking_date_obj <= end_of_next_week:
+        if now_utc < release_next:
+            return False, f"Agendamento para próxima semana ({start_of_next_week.strftime('%d/%m')}-{end_of_next_week.strftime('%d/%m')}) abre Qui 23:59 (Horário Local)."
+        elif now_utc >= cutoff_next:
+            return False, f"Agendamento para semana de {start_of_next_week.strftime('%d/%m')} já encerrou (Qua 18:00 Horário Local)."
+        return True, "OK"
+    else:
+        if booking_date_obj < start_of_current_week:
+            return True, "OK"
+        return False, f"Só é possível agendar para semana atual ou próxima. Data: {booking_date_obj.strftime('%d/%m/%Y')} fora do período permitido."
+
+def legacy_status(now_utc):
+    start_of_current_week, start_of_next_week, cutoff_current, release_next, cutoff_next = legacy_windows(now_utc)
+    return {
+        "current_week_start": start_of_current_week.isoformat(),
+        "current_week_end": (start_of_current_week + timedelta(days=4)).isoformat(),
+        "current_week_open": now_utc < cutoff_current,
+        "current_week_cutoff": cutoff_current.isoformat(),
+        "next_week_start": start_of_next_week.isoformat(),
+        "next_week_end": (start_of_next_week + timedelta(days=4)).isoformat(),
+        "next_week_open": release_next <= now_utc < cutoff_next,
+        "next_week_release": release_next.isoformat(),
+    }
+# ---
+
+def status_without_clock(status):
+    return {k: v for k, v in status.items() if k not in ("server_time_utc", "next_transition_at")}
+
+def check_instant(window, now, failures):
+    current_week = get_monday_of_week(now.date())
+    for offset in range(-7, 14):
+        booking_date = current_week + timedelta(days=offset)
+        expected = legacy_is_booking_allowed(booking_date, now)
+        got = window.check(booking_date, now=now)
+        if expected != got:
+            failures.append(f"check({booking_date}, {now.isoformat()}): esperado {expected}, obtido {got}")
+    expected_status = legacy_status(now)
+    got_status = status_without_clock(window.status(now=now))
+    if expected_status != got_status:
+        failures.append(f"status({now.isoformat()}): esperado {expected_status}, obtido {got_status}")
+
+def check_transition(window, now, failures):
+    transition = window.next_transition_at(now=now)
+    if transition <= now:
+        failures.append(f"next_transition_at({now.isoformat()}) = {transition.isoformat()} não está no futuro")
+        return
+    before = status_without_clock(window.status(now=now))
+    for instant in (now + (transition - now) / 2, transition - timedelta(microseconds=1)):
+        if status_without_clock(window.status(now=instant)) != before:
+            failures.append(f"status mudou em {instant.isoformat()}, antes de next_transition_at {transition.isoformat()}")
+    if status_without_clock(window.status(now=transition)) == before:
+        failures.append(f"status não mudou em next_transition_at {transition.isoformat()} (a partir de {now.isoformat()})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Confere o calendário da janela de agendamento contra a regra anterior")
+    parser.add_argument("--weeks", type=int, default=52, help="semanas verificadas em volta de hoje")
+    parser.add_argument("--samples", type=int, default=20000, help="instantes aleatórios")
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    window = BookingWindow(app)
+    failures = []
+
+    today = date.today()
+    first_week = get_monday_of_week(today) - timedelta(days=7 * (args.weeks // 2))
+    boundaries = []
+    for week in range(args.weeks):
+        week_start = first_week + timedelta(days=7 * week)
+        _, _, cutoff_current, release_next, _ = legacy_windows(datetime.combine(week_start, time(12, tzinfo=timezone.utc)))
+        boundaries += [cutoff_current, release_next, week_begins_at(week_start)]
+    for boundary in boundaries:
+        for delta in (timedelta(microseconds=-1), timedelta(0), timedelta(microseconds=1)):
+            check_instant(window, boundary + delta, failures)
+            check_transition(window, boundary + delta, failures)
+
+    rng = random.Random(42)
+    span_seconds = args.weeks * 7 * 86400
+    start = datetime.combine(first_week, time(0, tzinfo=timezone.utc))
+    instants = [start + timedelta(seconds=rng.uniform(0, span_seconds)) for _ in range(args.samples)]
+    for now in instants:
+        check_instant(window, now, failures)
+    for now in instants[:2000]:
+        check_transition(window, now, failures)
+
+    # Custo por chamada: cada agendamento chama is_booking_allowed uma vez por slot
+    pairs = [(get_monday_of_week(now.date()) + timedelta(days=rng.randrange(-7, 14)), now) for now in instants]
+    started = time_module.perf_counter()
+    for booking_date, now in pairs:
+        legacy_is_booking_allowed(booking_date, now)
+    legacy_us = (time_module.perf_counter() - started) / len(pairs) * 1e6
+    started = time_module.perf_counter()
+    for booking_date, now in pairs:
+        window.check(booking_date, now=now)
+    calendar_us = (time_module.perf_counter() - started) / len(pairs) * 1e6
+
+    print(f"{len(boundaries)} fronteiras (x3 instantes) e {args.samples} instantes aleatórios em {args.weeks} semanas")
+    print(f"is_booking_allowed: anterior {legacy_us:.2f}us/chamada, calendário {calendar_us:.2f}us/chamada")
+    if failures:
+        print(f"{len(failures)} divergências, primeiras:")
+        for failure in failures[:20]:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("Nenhuma divergência.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,495 @@
+# /home/ubuntu/lab_scheduler/benchmarks/run_scenarios.py
+
+# Cenários de carga reproduzíveis sobre uma escala sintética (generate_lab_data), com o
+# resultado em JSON para comparar execuções ao longo do tempo.
+#
+# Cenários (na ordem em que rodam):
+#   browsing        - navegação contínua: --browse-clients clientes abrindo semanas (a maioria
+#                     recentes): booking-status, rooms, GET /api/bookings e a grade da semana;
+#   pdf             - GET /api/generate-pdf de --pdf-weeks semanas, primeiro sem cache e depois com;
+#   release_night   - --release-bursts aberturas de semana: --release-users usuários enviam
+#                     POST /api/bookings ao mesmo tempo para a mesma semana (metade disputa as
+#                     salas Geral) e, como o frontend, reenviam o X-Queue-Token em respostas 503;
+#   clear_bookings  - POST /api/admin/clear-bookings do primeiro ano: dry-run e remoção por trimestre.
+#
+# Para cada cenário: requests, respostas por status, vazão (requests/s), latência p50/p95/p99
+# (total e por operação) e o pico de RSS da aplicação, amostrado durante o cenário (no modo
+# gunicorn, a soma do master e dos workers).
+#
+# Alvos:
+#   testclient - a aplicação no próprio processo, pelo test client do Flask (uma thread por cliente);
+#   gunicorn   - um gunicorn local como no Procfile (--workers, --threads, --preload), por HTTP.
+#
+# Os cenários alteram o banco: um banco SQLite é copiado para um arquivo temporário antes de
+# rodar (o gerado pode ser reaproveitado). Outros bancos são usados diretamente.
+# Sem --database-url, um banco é gerado com os padrões de generate_lab_data.
+#
+# Uso (a partir da pasta lab_scheduler):
+#     python -m benchmarks.generate_lab_data
+#     python -m benchmarks.run_scenarios --database-url sqlite:////tmp/lab_scheduler_bench.db --output antes.json
+#     python -m benchmarks.run_scenarios --database-url sqlite:////tmp/lab_scheduler_bench.db --target gunicorn \
+#         --output depois.json --compare antes.json
+
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("browsing", "pdf", "release_night", "clear_bookings")
+PERIODS = ("Manhã", "Tarde")
+MAX_ATTEMPTS = 20
+RSS_SAMPLE_INTERVAL_SECONDS = 0.05
+SERVER_START_TIMEOUT_SECONDS = 60
+
+# --- RSS ---
+
+def process_rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+def child_pids(pid):
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # O nome do processo (2º campo) pode ter espaços: o ppid vem depois do último ")"
+                if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                    children.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            pass
+    return children
+
+# Sem /proc (macOS), só o pico do próprio processo
+def own_peak_rss_bytes():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class RssSampler:
+    def __init__(self, measure):
+        self.measure = measure
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.measure())
+            self._stop.wait(RSS_SAMPLE_INTERVAL_SECONDS)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.measure())
+
+# --- Alvos ---
+
+def app_environment(database_url, work_dir):
+    return {
+        "DATABASE_URL": database_url,
+        "EMAIL_OUTBOX_DISPATCHER_ENABLED": "false", # Nenhum e-mail sai do benchmark
+        "PDF_CACHE_DIR": os.path.join(work_dir, "pdf_cache"), # Cache de PDF sempre vazio no início
+        "BOOKINGS_ARCHIVE_DIR": os.path.join(work_dir, "archives"),
+    }
+
+class TestClientTarget:
+    name = "testclient"
+
+    def __init__(self, database_url, work_dir, args):
+        os.environ.update(app_environment(database_url, work_dir))
+        from src.main import create_app, init_database
+        app = create_app()
+        app.logger.setLevel("ERROR")
+        # Como o init-db do deploy: aplica migrações mais novas que o banco gerado
+        with app.app_context():
+            init_database(app)
+        self.app = app
+        self.client = app.test_client()
+
+    def request(self, method, path, json_body=None, headers=None):
+        response = self.client.open(path, method=method, json=json_body, headers=headers)
+        body = response.get_data()
+        response.close()
+        return response.status_code, body, response.headers
+
+    def rss_bytes(self):
+        return process_rss_bytes(os.getpid()) or own_peak_rss_bytes()
+
+    def describe(self):
+        return {"name": self.name}
+
+    def close(self):
+        pass
+
+class GunicornTarget:
+    name = "gunicorn"
+
+    def __init__(self, database_url, work_dir, args):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        self.workers, self.threads, self.preload = args.workers, args.threads, args.preload
+        self.base_url = f"http://127.0.0.1:{port}"
+        env = dict(os.environ, **app_environment(database_url, work_dir), WEB_CONCURRENCY=str(args.workers))
+        self.log = open(os.path.join(work_dir, "gunicorn.log"), "wb")
+        # Como o Procfile: init-db uma vez e depois o gunicorn
+        subprocess.run([sys.executable, "-m", "flask", "--app", "src.main", "init-db"], cwd=PROJECT_DIR, env=env,
+                       stdout=self.log, stderr=subprocess.STDOUT, check=True)
+        self.started = time.perf_counter()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-w", str(args.workers), "-k", "gthread", "--threads", str(args.threads),
+             "--bind", f"127.0.0.1:{port}", "--log-level", "warning", *(["--preload"] if args.preload else []), args.app_module],
+            cwd=PROJECT_DIR, env=env, stdout=self.log, stderr=subprocess.STDOUT
+        )
+        self._wait_until_ready()
+        self.ready_seconds = time.perf_counter() - self.started
+
+    def _wait_until_ready(self):
+        deadline = time.time() + SERVER_START_TIMEOUT_SECONDS
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"gunicorn terminou ao iniciar (ver {self.log.name})")
+            try:
+                # Todos os workers precisam ter subido, não só o primeiro
+                if len(child_pids(self.process.pid)) >= self.workers:
+                    with urllib.request.urlopen(f"{self.base_url}/api/rooms", timeout=5):
+                        return
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f"gunicorn não respondeu em {SERVER_START_TIMEOUT_SECONDS}s")
+
+    def request(self, method, path, json_body=None, headers=None):
+        headers = dict(headers or {})
+        data = None
+        if json_body is not None:
+            data = json.dumps(json_body).encode()
+            headers["Content-Type"] = "application/json"
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                return response.status, response.read(), response.headers
+        except urllib.error.HTTPError as e:
+            return e.code, e.read(), e.headers
+        except OSError as e:
+            return f"erro ({type(e).__name__})", b"", {}
+
+    def rss_bytes(self):
+        return sum(process_rss_bytes(pid) for pid in [self.process.pid] + child_pids(self.process.pid))
+
+    def describe(self):
+        return {"name": self.name, "workers": self.workers, "threads": self.threads, "preload": self.preload,
+                "ready_seconds": round(self.ready_seconds, 3)}
+
+    def close(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
+
+TARGETS = {"testclient": TestClientTarget, "gunicorn": GunicornTarget}
+
+# --- Banco ---
+
+def dataset_info(database_url):
+    from sqlalchemy import create_engine, func, select
+    from src.models.entities import Booking, Room, User
+    engine = create_engine(database_url)
+    with engine.connect() as conn:
+        first_date, last_date, bookings = conn.execute(
+            select(func.min(Booking.booking_date), func.max(Booking.booking_date), func.count(Booking.id))
+        ).one()
+        rooms = [tuple(row) for row in conn.execute(select(Room.id, Room.name).order_by(Room.id))]
+        users = conn.execute(select(func.count(User.id))).scalar()
+    engine.dispose()
+    if not bookings:
+        raise SystemExit("Banco sem agendamentos: rode antes python -m benchmarks.generate_lab_data")
+    return {"first_date": first_date, "last_date": last_date, "bookings": bookings, "users": users, "rooms": rooms}
+
+def working_copy(database_url, work_dir):
+    if not database_url.startswith("sqlite:///"):
+        return database_url
+    from src.engine_profiles import backup_sqlite_database
+    path = os.path.join(work_dir, "scenarios.db")
+    backup_sqlite_database(database_url[len("sqlite:///"):], path)
+    return f"sqlite:///{path}"
+
+def monday_of(day):
+    return day - timedelta(days=day.weekday())
+
+# --- Cenários ---
+# Cada cenário devolve uma lista de amostras (operação, status, segundos)
+
+def run_in_threads(count, func):
+    samples, lock = [], threading.Lock()
+    barrier = threading.Barrier(count)
+    def run(index):
+        barrier.wait()
+        result = func(index)
+        with lock:
+            samples.extend(result)
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+def timed(target, operation, method, path, json_body=None, headers=None):
+    started = time.perf_counter()
+    status, body, response_headers = target.request(method, path, json_body, headers)
+    return (operation, status, time.perf_counter() - started), body, response_headers
+
+def scenario_browsing(target, dataset, args):
+    last_week = monday_of(dataset["last_date"])
+    weeks = (last_week - monday_of(dataset["first_date"])).days // 7
+    def client(index):
+        rng = random.Random(args.seed * 1000 + index)
+        samples = []
+        for _ in range(args.browse_iterations):
+            # A maioria olha as últimas semanas; alguns voltam no histórico
+            back = rng.randint(0, 8) if rng.random() < 0.7 else rng.randint(0, weeks)
+            week_start = last_week - timedelta(weeks=back)
+            week_end = week_start + timedelta(days=4)
+            for operation, path in (
+                ("GET /api/booking-status", "/api/booking-status"),
+                ("GET /api/rooms", "/api/rooms"),
+                ("GET /api/bookings", f"/api/bookings?start_date={week_start}&end_date={week_end}"),
+                ("GET /api/schedule/grid", f"/api/schedule/grid?week_start={week_start}"),
+            ):
+                samples.append(timed(target, operation, "GET", path)[0])
+        return samples
+    return run_in_threads(args.browse_clients, client)
+
+def scenario_pdf(target, dataset, args):
+    rng = random.Random(args.seed)
+    last_week = monday_of(dataset["last_date"])
+    weeks = (last_week - monday_of(dataset["first_date"])).days // 7
+    samples = []
+    for back in rng.sample(range(weeks + 1), min(args.pdf_weeks, weeks + 1)):
+        path = f"/api/generate-pdf?week_start_date={last_week - timedelta(weeks=back)}"
+        samples.append(timed(target, "GET /api/generate-pdf (sem cache)", "GET", path)[0])
+        samples.append(timed(target, "GET /api/generate-pdf (cache)", "GET", path)[0])
+    return samples
+
+# Um usuário da abertura: reenvia o pedido enquanto a fila devolver 503 com queue_token
+def release_user(target, payload, rng):
+    queue_token = None
+    started = time.perf_counter()
+    status = None
+    for _ in range(MAX_ATTEMPTS):
+        headers = {"X-Queue-Token": queue_token} if queue_token else None
+        status, body, response_headers = target.request("POST", "/api/bookings", payload, headers)
+        if status != 503:
+            break
+        try:
+            rejection = json.loads(body)
+        except ValueError:
+            rejection = {}
+        queue_token = rejection.get("queue_token")
+        if not queue_token:
+            break
+        retry_after = rejection["retry_after_ms"] / 1000 if "retry_after_ms" in rejection else float(response_headers.get("Retry-After") or 1)
+        time.sleep(retry_after * rng.uniform(0.8, 1.2))
+    return ("POST /api/bookings", status, time.perf_counter() - started)
+
+def scenario_release_night(target, dataset, args):
+    # Semanas vazias logo depois do fim dos dados. Com as datas padrão do gerador elas já
+    # passaram, e a janela de agendamento aceita datas passadas: o resultado não depende do dia
+    first_week = monday_of(dataset["last_date"]) + timedelta(weeks=1)
+    room_ids = [room_id for room_id, _ in dataset["rooms"]]
+    geral_ids = [room_id for room_id, name in dataset["rooms"] if name.startswith("Geral")] or room_ids
+    samples = []
+    for burst in range(args.release_bursts):
+        week_start = first_week + timedelta(weeks=burst)
+        def user(index):
+            rng = random.Random(args.seed * 100000 + burst * 1000 + index)
+            candidates = geral_ids if index % 2 == 0 else room_ids
+            slot_count = rng.randint(1, 3)
+            slots = set()
+            while len(slots) < slot_count:
+                slots.add((rng.choice(candidates), week_start + timedelta(days=rng.randint(0, 4)), rng.choice(PERIODS)))
+            payload = {
+                "user_name": f"Usuário Benchmark {burst}-{index}", "user_email": f"bench{burst}_{index}@example.com",
+                "coordinator_name": "Coordenador Benchmark",
+                "slots": [{"room_id": room_id, "booking_date": day.isoformat(), "period": period} for room_id, day, period in sorted(slots)]
+            }
+            return [release_user(target, payload, rng)]
+        samples += run_in_threads(args.release_users, user)
+    return samples
+
+def scenario_clear_bookings(target, dataset, args):
+    first_date = dataset["first_date"]
+    samples = []
+    password = {"password": args.admin_password}
+    year_end = first_date + timedelta(days=364)
+    samples.append(timed(target, "POST /api/admin/clear-bookings (dry-run)", "POST", "/api/admin/clear-bookings",
+                         dict(password, start_date=first_date.isoformat(), end_date=year_end.isoformat(), dry_run=True))[0])
+    for quarter in range(4):
+        start = first_date + timedelta(days=91 * quarter)
+        end = min(year_end, start + timedelta(days=90))
+        samples.append(timed(target, "POST /api/admin/clear-bookings", "POST", "/api/admin/clear-bookings",
+                             dict(password, start_date=start.isoformat(), end_date=end.isoformat()))[0])
+    return samples
+
+SCENARIO_FUNCTIONS = {
+    "browsing": scenario_browsing,
+    "pdf": scenario_pdf,
+    "release_night": scenario_release_night,
+    "clear_bookings": scenario_clear_bookings,
+}
+
+# --- Resultados ---
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+def latency_summary(latencies):
+    values = sorted(latencies)
+    return {
+        "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+def summarize(samples, elapsed, peak_rss):
+    statuses, operations = {}, {}
+    for operation, status, seconds in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        operations.setdefault(operation, []).append(seconds)
+    return {
+        "requests": len(samples),
+        "errors": sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 500),
+        "statuses": dict(sorted(statuses.items())),
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        **latency_summary([seconds for _, _, seconds in samples]),
+        "peak_rss_mb": round(peak_rss / 1024 / 1024, 1),
+        "operations": {
+            operation: dict(requests=len(latencies), **latency_summary(latencies))
+            for operation, latencies in sorted(operations.items())
+        },
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR, capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def print_comparison(result, baseline):
+    print(f"\n{'cenário':<16} {'req/s':>22} {'p50 ms':>22} {'p95 ms':>22} {'p99 ms':>22} {'RSS MB':>22}")
+    for name, current in result["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        def cell(key):
+            before, after = previous[key], current[key]
+            change = f"{(after - before) / before * 100:+.0f}%" if before else "-"
+            return f"{before:.1f}->{after:.1f} {change}"
+        print(f"{name:<16} {cell('throughput_rps'):>22} {cell('p50_ms'):>22} {cell('p95_ms'):>22} {cell('p99_ms'):>22} {cell('peak_rss_mb'):>22}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Cenários de carga sobre uma escala sintética, com resultado em JSON")
+    parser.add_argument("--database-url", default=None, help="banco gerado por generate_lab_data (padrão: gera um novo)")
+    parser.add_argument("--target", choices=tuple(TARGETS), default="testclient")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"lista separada por vírgulas ({', '.join(SCENARIOS)})")
+    parser.add_argument("--output", default=None, help="arquivo JSON do resultado (padrão: só imprime)")
+    parser.add_argument("--compare", default=None, help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--browse-clients", type=int, default=8)
+    parser.add_argument("--browse-iterations", type=int, default=25, help="semanas abertas por cliente")
+    parser.add_argument("--pdf-weeks", type=int, default=5)
+    parser.add_argument("--release-users", type=int, default=100)
+    parser.add_argument("--release-bursts", type=int, default=3)
+    parser.add_argument("--admin-password", default=os.getenv("ADMIN_PASSWORD", "lab_scheduler_admin"))
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn -w")
+    parser.add_argument("--threads", type=int, default=64, help="gunicorn --threads")
+    parser.add_argument("--preload", action="store_true", help="gunicorn --preload")
+    parser.add_argument("--app-module", default="src.main:create_app()", help="aplicação WSGI para o gunicorn")
+    args = parser.parse_args()
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"cenários desconhecidos: {', '.join(sorted(unknown))}")
+
+    work_dir = tempfile.mkdtemp(prefix="lab_scheduler_scenarios_")
+    database_url = args.database_url
+    if not database_url:
+        from benchmarks.generate_lab_data import generate
+        database_url = f"sqlite:///{os.path.join(work_dir, 'generated.db')}"
+        generate(database_url, seed=args.seed)
+    dataset = dataset_info(database_url)
+    target = TARGETS[args.target](working_copy(database_url, work_dir), work_dir, args)
+    result = {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "target": target.describe(),
+        "dataset": {
+            "database": database_url.split("://", 1)[0],
+            "bookings": dataset["bookings"], "users": dataset["users"], "rooms": len(dataset["rooms"]),
+            "first_date": dataset["first_date"].isoformat(), "last_date": dataset["last_date"].isoformat(),
+        },
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "admin_password")},
+        "scenarios": {},
+    }
+    try:
+        for name in scenarios:
+            with RssSampler(target.rss_bytes) as sampler:
+                started = time.perf_counter()
+                samples = SCENARIO_FUNCTIONS[name](target, dataset, args)
+                elapsed = time.perf_counter() - started
+            result["scenarios"][name] = summary = summarize(samples, elapsed, sampler.peak)
+            print(
+                f"{name:<16} {summary['requests']:>5} req  {summary['throughput_rps']:>8.1f} req/s  "
+                f"p50 {summary['p50_ms']:>8.1f} ms  p95 {summary['p95_ms']:>8.1f} ms  p99 {summary['p99_ms']:>8.1f} ms  "
+                f"RSS {summary['peak_rss_mb']:>7.1f} MB  {summary['statuses']}",
+                file=sys.stderr
+            )
+    finally:
+        target.close()
+
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(result, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# /home/ubuntu/lab_scheduler/benchmarks/startup_time.py
+
+# Custo de boot da aplicação: antes (tudo na importação de src.main, em cada worker) e
+# depois (create_app sem acesso ao banco; init_database uma vez por deploy no init-db).
+#
+# Modos, cada um medido em um interpretador novo (como um worker do gunicorn sem --preload):
+#   antes       - o que cada worker fazia ao importar src.main: create_app + Flask-Mail +
+#                 init_database (create_all, migrações, salas, grupos, backfill, catálogo);
+#   create_app  - o que cada worker faz agora.
+# Para cada modo: mediana de --runs execuções do tempo de importação, de criação, do banco e
+# do processo inteiro (com a inicialização do Python), e o RSS ao final.
+#
+# Com --gunicorn, também sobe um gunicorn local (--workers) em três formas: antes (init em
+# cada worker), create_app e create_app com --preload; mede o tempo até a primeira resposta
+# (com todos os workers já criados) e a memória somada do master e dos workers (PSS: páginas
+# compartilhadas depois do fork contam uma vez só).
+#
+# Sem --database-url, usa um SQLite temporário já inicializado (o caso de um restart/deploy).
+#
+# Uso (a partir da pasta lab_scheduler):
+#     python -m benchmarks.startup_time --runs 5
+#     python -m benchmarks.startup_time --gunicorn --workers 4
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ("antes", "create_app")
+
+# Aplicação como era antes da fábrica: o banco é preparado em cada processo que a importa
+def create_legacy_app():
+    from flask_mail import Mail
+    from src.main import create_app, init_database
+    app = create_app()
+    Mail(app)
+    with app.app_context():
+        init_database(app)
+    return app
+
+def rss_mb(pid="self"):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+def pss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return rss_mb(pid)
+
+def run_child(mode):
+    started = time.perf_counter()
+    import src.main
+    imported = time.perf_counter()
+    if mode == "antes":
+        from flask_mail import Mail
+        app = src.main.create_app()
+        Mail(app)
+    else:
+        app = src.main.create_app()
+    created = time.perf_counter()
+    if mode == "antes":
+        with app.app_context():
+            src.main.init_database(app)
+    finished = time.perf_counter()
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "create_ms": (created - imported) * 1000,
+        "database_ms": (finished - created) * 1000,
+        "rss_mb": rss_mb(),
+    }))
+
+def measure_mode(mode, env, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup_time", "--child", mode],
+            cwd=PROJECT_DIR, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        wall_ms = (time.perf_counter() - started) * 1000
+        samples.append(dict(json.loads(output.strip().splitlines()[-1]), process_ms=wall_ms))
+    return {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+
+def measure_gunicorn(database_url, work_dir, workers, threads):
+    from argparse import Namespace
+    from benchmarks.run_scenarios import GunicornTarget, child_pids
+    results = {}
+    for label, app_module, preload in (
+        ("antes", "benchmarks.startup_time:create_legacy_app()", False),
+        ("create_app", "src.main:create_app()", False),
+        ("create_app --preload", "src.main:create_app()", True),
+    ):
+        target = GunicornTarget(database_url, work_dir, Namespace(workers=workers, threads=threads, preload=preload, app_module=app_module))
+        try:
+            pids = [target.process.pid] + child_pids(target.process.pid)
+            results[label] = {
+                "ready_s": target.ready_seconds,
+                "pss_mb": sum(pss_mb(pid) for pid in pids),
+                "rss_mb": sum(rss_mb(pid) for pid in pids),
+            }
+        finally:
+            target.close()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Custo de boot da aplicação, antes e depois de create_app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--database-url", default=None, help="banco já inicializado (padrão: SQLite temporário)")
+    parser.add_argument("--gunicorn", action="store_true", help="mede também o boot de um gunicorn local")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args.child)
+        return
+
+    work_dir = tempfile.mkdtemp(prefix="lab_scheduler_startup_")
+    database_url = args.database_url or f"sqlite:///{os.path.join(work_dir, 'startup.db')}"
+    env = dict(os.environ, DATABASE_URL=database_url, EMAIL_OUTBOX_DISPATCHER_ENABLED="false",
+               PDF_CACHE_DIR=os.path.join(work_dir, "pdf_cache"))
+    subprocess.run([sys.executable, "-m", "flask", "--app", "src.main", "init-db"], cwd=PROJECT_DIR, env=env,
+                   capture_output=True, check=True)
+
+    print(f"Boot de um processo (mediana de {args.runs} execuções)")
+    print(f"{'modo':<12} {'import ms':>10} {'criação ms':>11} {'banco ms':>9} {'processo ms':>12} {'RSS MB':>8}")
+    for mode in MODES:
+        r = measure_mode(mode, env, args.runs)
+        print(f"{mode:<12} {r['import_ms']:>10.1f} {r['create_ms']:>11.1f} {r['database_ms']:>9.1f} {r['process_ms']:>12.1f} {r['rss_mb']:>8.1f}")
+
+    if args.gunicorn:
+        print(f"\ngunicorn -w {args.workers} -k gthread --threads {args.threads}: até a primeira resposta")
+        print(f"{'modo':<22} {'pronto s':>9} {'PSS MB':>8} {'RSS MB':>8}")
+        os.environ.update(env)
+        for label, r in measure_gunicorn(database_url, work_dir, args.workers, args.threads).items():
+            print(f"{label:<22} {r['ready_s']:>9.2f} {r['pss_mb']:>8.1f} {r['rss_mb']:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# /home/ubuntu/lab_scheduler/benchmarks/weekday_filter_benchmark.py
+
+# Compara a latência da consulta semanal de agendamentos com o filtro antigo
+# (func.extract('dow', booking_date) na coluna) e o filtro atual (somente intervalo
+# de booking_date, que usa ix_bookings_date_room_period).
+#
+# Uso (a partir da pasta lab_scheduler):
+#     python -m benchmarks.weekday_filter_benchmark --rows 500000 --repeat 200
+# Por padrão usa um SQLite temporário; passe --database-url para testar no PostgreSQL
+# (as tabelas rooms/bookings desse banco serão apagadas e recriadas).
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import joinedload
+from src.extensions import db
+from src.models.entities import Room, Booking
+from src.migrations.runner import run_migrations
+from src.services.booking_queries import bookings_between_query, exclude_weekend_bookings
+
+SLOTS_PER_DAY_PERIODS = ["Manhã", "Tarde"]
+
+def create_benchmark_app(database_url):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    return app
+
+def populate(rows, rooms_count=25, start=date(1990, 1, 1), batch_size=20000):
+    rooms = [{"id": i, "name": f"Sala {i}"} for i in range(1, rooms_count + 1)]
+    db.session.execute(insert(Room), rooms)
+    batch = []
+    inserted = 0
+    current = start
+    rng = random.Random(42)
+    while inserted < rows:
+        if current.weekday() < 5:
+            for room in rooms:
+                for period in SLOTS_PER_DAY_PERIODS:
+                    if inserted >= rows:
+                        break
+                    user_id = rng.randint(1, 400)
+                    batch.append({
+                        "user_name": f"Usuário {user_id}", "user_email": f"usuario{user_id}@example.com",
+                        "coordinator_name": "Coordenador", "room_id": room["id"],
+                        "booking_date": current, "period": period
+                    })
+                    inserted += 1
+            if len(batch) >= batch_size:
+                db.session.execute(insert(Booking), batch)
+                batch = []
+        current += timedelta(days=1)
+    if batch:
+        db.session.execute(insert(Booking), batch)
+    db.session.commit()
+    return start, current
+
+def legacy_week_query(start_date, end_date):
+    return Booking.query.options(joinedload(Booking.room)).filter(
+        Booking.booking_date.between(start_date, end_date),
+        func.extract('dow', Booking.booking_date).notin_([0, 6])
+    ).order_by(Booking.booking_date, Booking.room_id, Booking.period)
+
+def current_week_query(start_date, end_date):
+    return exclude_weekend_bookings(bookings_between_query(start_date, end_date).all())
+
+# Mesmas condições em nível de SQL (sem montar objetos ORM), para isolar o custo da consulta
+def legacy_week_ids(start_date, end_date):
+    return db.session.execute(select(Booking.id).where(
+        Booking.booking_date.between(start_date, end_date),
+        func.extract('dow', Booking.booking_date).notin_([0, 6])
+    )).all()
+
+def current_week_ids(start_date, end_date):
+    return db.session.execute(select(Booking.id).where(
+        Booking.booking_date.between(start_date, end_date)
+    )).all()
+
+def time_queries(label, run_query, mondays):
+    latencies = []
+    for monday in mondays:
+        started = time.perf_counter()
+        run_query(monday, monday + timedelta(days=4))
+        latencies.append((time.perf_counter() - started) * 1000)
+        db.session.expunge_all()
+    latencies.sort()
+    return {
+        "label": label,
+        "p50_ms": round(latencies[len(latencies) // 2], 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do filtro de dias úteis na consulta semanal")
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'weekday_benchmark.db')}"
+    app = create_benchmark_app(database_url)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        run_migrations(db.engine)
+        started = time.perf_counter()
+        first_day, last_day = populate(args.rows)
+        print(f"{args.rows} agendamentos inseridos em {time.perf_counter() - started:.1f}s ({first_day} a {last_day})")
+
+        rng = random.Random(7)
+        first_monday = first_day + timedelta(days=(7 - first_day.weekday()) % 7)
+        weeks = (last_day - first_monday).days // 7
+        mondays = [first_monday + timedelta(weeks=rng.randrange(weeks)) for _ in range(args.repeat)]
+
+        for label, run_query in [
+            ("extract('dow') (antigo)", lambda s, e: legacy_week_query(s, e).all()),
+            ("intervalo de datas (atual)", current_week_query),
+            ("SQL extract('dow') (antigo)", legacy_week_ids),
+            ("SQL intervalo (atual)", current_week_ids),
+        ]:
+            result = time_queries(label, run_query, mondays)
+            print(f"{result['label']:<30} p50={result['p50_ms']}ms p95={result['p95_ms']}ms média={result['mean_ms']}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+# /home/ubuntu/lab_scheduler/gunicorn.conf.py
+
+# Lido automaticamente pelo gunicorn quando ele roda a partir da pasta lab_scheduler.
+# Workers, threads e --preload continuam na linha de comando (Procfile, render.yaml) ou em
+# GUNICORN_CMD_ARGS; aqui fica só o que precisa acontecer dentro de cada worker.
+#
+# Com --preload, create_app() roda uma vez no master e os workers nascem por fork: threads
+# não sobrevivem ao fork e conexões abertas no master não podem ser compartilhadas. Por isso
+# a thread da outbox de e-mail começa aqui, já no worker, e o pool de conexões herdado é
+# descartado (sem fechar as conexões, que pertencem ao master).
+
+def post_worker_init(worker):
+    from src.extensions import db
+    from src.services.email_outbox import email_dispatcher
+    with worker.wsgi.app_context():
+        db.engine.dispose(close=False)
+    # Envia e-mails pendentes (inclusive de antes de um restart) sem esperar um novo agendamento
+    email_dispatcher.start()
@@ -0,0 +1,120 @@
+# /home/ubuntu/lab_scheduler/src/engine_profiles.py
+
+# Perfis do engine do SQLAlchemy, escolhidos pelo DATABASE_URL.
+#
+# SQLite: os workers do gunicorn escrevem no mesmo arquivo.
+#   - journal_mode=WAL: leituras não bloqueiam a escrita (nem o contrário);
+#   - busy_timeout: quem encontra o banco ocupado espera até SQLITE_BUSY_TIMEOUT_MS em vez
+#     de falhar na hora com "database is locked";
+#   - synchronous=NORMAL: com WAL o banco continua consistente; só uma queda de energia
+#     pode perder os últimos commits;
+#   - BEGIN IMMEDIATE nas escritas de agendamentos (begin_write_transaction): o lock de
+#     escrita é pego (esperando pelo busy_timeout) antes das leituras de validação. Uma
+#     transação que leu e depois tenta escrever falha sem esperar se outro worker escreveu
+#     nesse meio tempo. Fora disso o pysqlite continua como antes: leituras sem transação
+#     e BEGIN só antes do primeiro INSERT/UPDATE/DELETE.
+#
+# PostgreSQL: pool por worker de forma que workers x (pool_size + max_overflow) caiba em
+# DATABASE_MAX_CONNECTIONS, com pool_pre_ping (conexões derrubadas pelo servidor ou por
+# um restart são descartadas antes do uso) e pool_recycle.
+#
+# Comparação dos perfis sob escrita concorrente: python -m benchmarks.db_write_contention
+
+import sqlite3
+import threading
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from src.instrumentation import request_metrics
+
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_SYNCHRONOUS = "NORMAL"
+DATABASE_MAX_CONNECTIONS = 90 # Render PostgreSQL aceita ~97; o resto fica para psql e manutenção
+POSTGRES_POOL_RECYCLE_SECONDS = 1800
+POSTGRES_POOL_TIMEOUT_SECONDS = 10
+
+def get_backend(database_url):
+    if database_url.startswith("sqlite"):
+        return "sqlite"
+    if database_url.startswith("postgresql"):
+        return "postgresql"
+    return "other"
+
+# SQLALCHEMY_ENGINE_OPTIONS para o banco; o SQLite é configurado por apply_engine_profile
+def engine_options_for(database_url, workers=4, max_connections=DATABASE_MAX_CONNECTIONS):
+    if get_backend(database_url) != "postgresql":
+        return {}
+    per_worker = max(2, max_connections // max(1, workers))
+    pool_size = max(1, per_worker * 2 // 3)
+    return {
+        "pool_size": pool_size,
+        "max_overflow": per_worker - pool_size,
+        "pool_pre_ping": True,
+        "pool_recycle": POSTGRES_POOL_RECYCLE_SECONDS,
+        "pool_timeout": POSTGRES_POOL_TIMEOUT_SECONDS,
+    }
+
+# Chamar antes da primeira conexão do engine
+def apply_engine_profile(engine, busy_timeout_ms=SQLITE_BUSY_TIMEOUT_MS, synchronous=SQLITE_SYNCHRONOUS):
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _configure_sqlite_connection(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute(f"PRAGMA synchronous = {synchronous}")
+        cursor.close()
+
+# Uma escrita por vez dentro do processo: as threads do worker esperam num lock do Python
+# (em ordem, sem disputar o GIL) e só uma por processo fica no busy handler do SQLite,
+# que acorda em intervalos crescentes e deixa escritores esperando além do busy_timeout.
+_sqlite_write_lock = threading.Lock()
+
+# O lock de escrita não veio dentro de busy_timeout (do processo ou do SQLite); as rotas
+# respondem 503 com Retry-After
+class DatabaseBusy(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+# Abre a transação da sessão já como escrita: BEGIN IMMEDIATE no SQLite (se ainda não há
+# uma transação aberta na conexão); sem efeito nos outros bancos. O lock do processo é
+# liberado quando a transação termina (commit, rollback ou close da sessão).
+# Levanta DatabaseBusy se o lock não vier em busy_timeout_ms (contado em
+# lab_scheduler_events_total{event="database_busy"}).
+def begin_write_transaction(session, busy_timeout_ms=SQLITE_BUSY_TIMEOUT_MS):
+    if session.get_bind().dialect.name != "sqlite":
+        return
+    retry_after = max(1, busy_timeout_ms // 1000)
+    if not session.info.get("sqlite_write_lock"):
+        if not _sqlite_write_lock.acquire(timeout=busy_timeout_ms / 1000):
+            request_metrics.count("database_busy")
+            raise DatabaseBusy(f"Lock de escrita do processo ocupado há mais de {busy_timeout_ms} ms", retry_after)
+        session.info["sqlite_write_lock"] = True
+    connection = session.connection()
+    if not connection.connection.dbapi_connection.in_transaction:
+        try:
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+        except OperationalError as e:
+            if "database is locked" not in str(e.orig):
+                raise
+            request_metrics.count("database_busy")
+            raise DatabaseBusy(f"Banco SQLite bloqueado por outro processo há mais de {busy_timeout_ms} ms", retry_after) from e
+
+@event.listens_for(Session, "after_transaction_end")
+def _release_sqlite_write_lock(session, transaction):
+    if transaction.parent is None and session.info.pop("sqlite_write_lock", False):
+        _sqlite_write_lock.release()
+
+# Cópia consistente de um banco SQLite em WAL (o arquivo principal sozinho pode não ter os
+# últimos commits, que ficam no -wal até o checkpoint)
+def backup_sqlite_database(db_path, target_path):
+    source = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True) # Não cria o arquivo se não existir
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
@@ -1,6 +1,8 @@
 # /home/ubuntu/lab_scheduler/src/extensions.py
 
 from flask_sqlalchemy import SQLAlchemy
+from src.services.schedule_cache import ScheduleCache
 
 db = SQLAlchemy()
+schedule_cache = ScheduleCache()
 
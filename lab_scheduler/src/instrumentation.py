@@ -0,0 +1,236 @@
+# /home/ubuntu/lab_scheduler/src/instrumentation.py
+
+# Instrumentação por request e métricas no formato de texto do Prometheus (GET /metrics).
+#
+# Para cada request (qualquer blueprint ou rota do app) são medidos o tempo total, o número
+# e o tempo das queries SQL (eventos do SQLAlchemy), o tempo de WeasyPrint e de SMTP e o
+# tamanho da resposta. Respostas em streaming são medidas até o último byte enviado.
+# Os valores são somados por endpoint em histogramas de latência e contadores.
+#
+# PDF e SMTP também rodam fora de requests (pré-renderização, dispatcher da outbox): por isso
+# têm histogramas próprios, além de entrarem no request quando acontecem dentro dele.
+#
+# Com SLOW_REQUEST_THRESHOLD_MS > 0, as queries de cada request são guardadas (até
+# SLOW_REQUEST_MAX_STATEMENTS) e os requests acima do limite vão para o log com elas.
+#
+# Cada worker do gunicorn tem as suas métricas; a label pid separa as séries de cada um
+# (no Prometheus, some por endpoint: sum by (endpoint) (...)).
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SLOW_REQUEST_MAX_STATEMENTS = 50
+SLOW_REQUEST_STATEMENT_CHARS = 300
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+# Medidas de um request, guardadas em g.request_stats
+class RequestStats:
+    __slots__ = ("started", "sql_count", "sql_seconds", "pdf_seconds", "smtp_seconds", "response_bytes", "statements")
+
+    def __init__(self, collect_statements=False):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.pdf_seconds = 0.0
+        self.smtp_seconds = 0.0
+        self.response_bytes = 0
+        self.statements = [] if collect_statements else None
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(**labels):
+    return ",".join(f'{name}="{_escape_label(value)}"' for name, value in labels.items())
+
+class RequestMetrics:
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._durations = defaultdict(Histogram) # (endpoint, método) -> histograma
+        self._requests = defaultdict(int) # (endpoint, método, status) -> total
+        self._sql_queries = defaultdict(int) # endpoint -> total
+        self._sql_seconds = defaultdict(float)
+        self._pdf_seconds = defaultdict(float)
+        self._smtp_seconds = defaultdict(float)
+        self._response_bytes = defaultdict(int)
+        self._slow_requests = defaultdict(int)
+        self._operations = defaultdict(Histogram) # "pdf_render" / "smtp_send" -> histograma
+        self._events = defaultdict(int) # "database_busy" etc. -> total
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("METRICS_ENABLED", True)
+        app.config.setdefault("SLOW_REQUEST_THRESHOLD_MS", 0) # 0 = log de requests lentos desligado
+        self.app = app
+        app.extensions["request_metrics"] = self
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _before_request(self):
+        if self.app.config["METRICS_ENABLED"]:
+            g.request_stats = RequestStats(collect_statements=self.app.config["SLOW_REQUEST_THRESHOLD_MS"] > 0)
+
+    def _after_request(self, response):
+        stats = g.get("request_stats")
+        if stats is None:
+            return response
+        endpoint = request.endpoint or "unmatched"
+        method = request.method
+        path = request.full_path.rstrip("?")
+        if response.content_length is not None:
+            stats.response_bytes = response.content_length
+        elif response.is_streamed:
+            response.response = _count_bytes(response.response, stats)
+        status = response.status_code
+        if response.direct_passthrough:
+            # Arquivos (send_file) vão direto ao servidor WSGI, que não chama response.close():
+            # o tempo vai até aqui, sem o envio
+            self._finish(endpoint, method, path, status, stats)
+        else:
+            response.call_on_close(lambda: self._finish(endpoint, method, path, status, stats))
+        return response
+
+    def _finish(self, endpoint, method, path, status, stats):
+        elapsed = time.perf_counter() - stats.started
+        threshold_ms = self.app.config["SLOW_REQUEST_THRESHOLD_MS"]
+        slow = threshold_ms > 0 and elapsed * 1000 >= threshold_ms
+        with self._lock:
+            self._durations[(endpoint, method)].observe(elapsed)
+            self._requests[(endpoint, method, status)] += 1
+            self._sql_queries[endpoint] += stats.sql_count
+            self._sql_seconds[endpoint] += stats.sql_seconds
+            self._pdf_seconds[endpoint] += stats.pdf_seconds
+            self._smtp_seconds[endpoint] += stats.smtp_seconds
+            self._response_bytes[endpoint] += stats.response_bytes
+            if slow:
+                self._slow_requests[endpoint] += 1
+        if slow:
+            lines = [
+                f"Slow request {method} {path} ({endpoint}) -> {status}: {elapsed * 1000:.0f} ms, "
+                f"{stats.sql_count} queries ({stats.sql_seconds * 1000:.0f} ms), "
+                f"pdf {stats.pdf_seconds * 1000:.0f} ms, smtp {stats.smtp_seconds * 1000:.0f} ms, {stats.response_bytes} bytes"
+            ]
+            lines += [f"  [{ms:.1f} ms] {statement}" for ms, statement in stats.statements or []]
+            if stats.statements is not None and stats.sql_count > len(stats.statements):
+                lines.append(f"  ... {stats.sql_count - len(stats.statements)} queries omitidas")
+            self.app.logger.warning("\n".join(lines))
+
+    # Operações fora do SQL (pdf_render, smtp_send): histograma próprio e, dentro de um
+    # request, soma no tempo do request
+    def observe(self, operation, seconds):
+        with self._lock:
+            self._operations[operation].observe(seconds)
+        stats = g.get("request_stats") if has_request_context() else None
+        if stats is not None:
+            if operation == "pdf_render":
+                stats.pdf_seconds += seconds
+            elif operation == "smtp_send":
+                stats.smtp_seconds += seconds
+
+    # Eventos pontuais (ex.: database_busy, escrita recusada por lock ocupado)
+    def count(self, event_name):
+        with self._lock:
+            self._events[event_name] += 1
+
+    def render_prometheus(self):
+        pid = os.getpid()
+        out = []
+
+        def histogram(name, help_text, series):
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} histogram")
+            for labels, hist in series:
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    out.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                out.append(f'{name}_bucket{{{labels},le="+Inf"}} {hist.count}')
+                out.append(f"{name}_sum{{{labels}}} {hist.sum:.6f}")
+                out.append(f"{name}_count{{{labels}}} {hist.count}")
+
+        def counter(name, help_text, series):
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} counter")
+            for labels, value in series:
+                out.append(f"{name}{{{labels}}} {value:.6f}" if isinstance(value, float) else f"{name}{{{labels}}} {value}")
+
+        with self._lock:
+            histogram("lab_scheduler_request_duration_seconds", "Tempo total do request, por endpoint.", [
+                (_labels(pid=pid, endpoint=endpoint, method=method), hist)
+                for (endpoint, method), hist in sorted(self._durations.items())
+            ])
+            counter("lab_scheduler_requests_total", "Requests por endpoint e status.", [
+                (_labels(pid=pid, endpoint=endpoint, method=method, status=status), value)
+                for (endpoint, method, status), value in sorted(self._requests.items())
+            ])
+            for name, help_text, values in (
+                ("lab_scheduler_request_sql_queries_total", "Queries SQL emitidas pelos requests.", self._sql_queries),
+                ("lab_scheduler_request_sql_seconds_total", "Tempo em queries SQL dentro dos requests.", self._sql_seconds),
+                ("lab_scheduler_request_pdf_render_seconds_total", "Tempo de WeasyPrint dentro dos requests.", self._pdf_seconds),
+                ("lab_scheduler_request_smtp_seconds_total", "Tempo de SMTP dentro dos requests.", self._smtp_seconds),
+                ("lab_scheduler_response_bytes_total", "Bytes enviados nas respostas.", self._response_bytes),
+                ("lab_scheduler_slow_requests_total", "Requests acima de SLOW_REQUEST_THRESHOLD_MS.", self._slow_requests),
+            ):
+                counter(name, help_text, [(_labels(pid=pid, endpoint=endpoint), value) for endpoint, value in sorted(values.items())])
+            histogram("lab_scheduler_operation_duration_seconds", "Renderização de PDF e envio de SMTP (dentro e fora de requests).", [
+                (_labels(pid=pid, operation=operation), hist) for operation, hist in sorted(self._operations.items())
+            ])
+            counter("lab_scheduler_events_total", "Eventos contados pela aplicação (ex.: database_busy).", [
+                (_labels(pid=pid, event=event_name), value) for event_name, value in sorted(self._events.items())
+            ])
+        return "\n".join(out) + "\n"
+
+request_metrics = RequestMetrics()
+
+# Respostas em streaming: conta os bytes à medida que são enviados
+def _count_bytes(chunks, stats):
+    for chunk in chunks:
+        stats.response_bytes += len(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+        yield chunk
+
+# Contador e tempo das queries SQL por request. Os listeners são registrados na classe
+# Engine, então valem para qualquer engine criado pelo Flask-SQLAlchemy (SQLite ou PostgreSQL).
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get("query_count", 0) + 1
+        if context is not None and g.get("request_stats") is not None:
+            context._request_query_started = time.perf_counter()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _time_query(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_request_query_started", None)
+    if started is None or not has_request_context():
+        return
+    stats = g.get("request_stats")
+    if stats is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats.sql_count += 1
+    stats.sql_seconds += elapsed
+    if stats.statements is not None and len(stats.statements) < SLOW_REQUEST_MAX_STATEMENTS:
+        stats.statements.append((elapsed * 1000, " ".join(statement.split())[:SLOW_REQUEST_STATEMENT_CHARS]))
+
+def get_query_count():
+    if not has_request_context():
+        return 0
+    return g.get("query_count", 0)
@@ -1,71 +1,304 @@
 import os
 import sys
+import time
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory, send_file, jsonify, request
-from src.extensions import db
-from src.models.entities import Room, Booking
+# Fábrica da aplicação: create_app() só configura a aplicação e registra extensões, rotas e
+# comandos. Nada acessa o banco na importação nem na criação da aplicação: o schema, as
+# migrações, o seed das salas e o backfill de usuários ficam em init_database (comando
+# "flask --app src.main init-db", rodado uma vez por deploy antes do gunicorn). Bibliotecas
+# pesadas (WeasyPrint, Flask-Mail/smtplib) são importadas no primeiro uso.
+#
+# gunicorn: "src.main:create_app()". Com --preload (opcional, ex: GUNICORN_CMD_ARGS="--preload")
+# a aplicação é criada uma vez no master e compartilhada (copy-on-write) pelos workers;
+# threads e conexões só começam depois do fork (ver gunicorn.conf.py).
+# Custo de boot antes e depois: python -m benchmarks.startup_time
+
+from flask import Flask, send_file, jsonify, request, current_app
+from flask.cli import with_appcontext
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+from src.extensions import db, schedule_cache
+from src.models.entities import Room
 from src.routes.booking_routes import bookings_bp
-from flask_mail import Mail # Import Flask-Mail
+from src.routes.metrics_routes import metrics_bp
+from src.instrumentation import request_metrics
+from src.static_assets import static_assets, build_static_assets
+from src.services.email_outbox import email_dispatcher, dispatch_pending_emails
+from src.services.pdf_cache import pdf_cache
+from src.services.pdf_renderer import pdf_render_pool
+from src.services.schedule_events import schedule_events
+from src.services.booking_admission import booking_admission
+from src.services.booking_window import booking_window
+from src.services.room_registry import room_registry, assign_default_room_groups, DEFAULT_ROOM_NAMES
+from src.services.booking_users import backfill_booking_users, BACKFILL_BATCH_SIZE
+from src.services.booking_cleanup import (
+    find_duplicate_slots, duplicate_bookings_conditions, iter_clear_bookings, BOOKINGS_ARCHIVE_DIR
+)
+from src.engine_profiles import (
+    engine_options_for, apply_engine_profile, backup_sqlite_database,
+    DATABASE_MAX_CONNECTIONS, SQLITE_BUSY_TIMEOUT_MS, SQLITE_SYNCHRONOUS
+)
+from src.migrations.runner import run_migrations, get_pending_migrations
+from src.migrations.explain import check_query_plans
+import click
 import datetime
-import shutil
-
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', 'a_very_strong_random_secret_key_dev_123!@#')
+import json
 
 # Configuração do banco de dados com suporte a PostgreSQL para produção
-project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-db_path = os.path.join(project_root, 'lab_scheduler.db')
-
-# Usar variável de ambiente DATABASE_URL se disponível, caso contrário usar SQLite local
-database_url = os.getenv('DATABASE_URL', f"sqlite:///{db_path}")
-
-# Ajustar URL do PostgreSQL se necessário (Render fornece URLs começando com postgres://)
-if database_url.startswith("postgres://"):
-    database_url = database_url.replace("postgres://", "postgresql://", 1)
-
-app.config['SQLALCHEMY_DATABASE_URI'] = database_url
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Flask-Mail configuration - Replace with your actual SMTP server details in production
-# For development, you might use a local SMTP debugging server or a service like Mailtrap
-# IMPORTANT: Use environment variables for sensitive information in production!
-app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
-app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
-app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'true').lower() in ['true', '1', 't']
-app.config['MAIL_USE_SSL'] = os.getenv('MAIL_USE_SSL', 'false').lower() in ['true', '1', 't']
-app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME', 'itvdslab@gmail.com')
-app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD', 'dsfv gkwr qcal fqev')
-app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER', ('LAB.ITV', 'noreply@gmail.com'))
-
-# For local testing without a real SMTP server, you can suppress sending or use a console mail server.
-# app.config['MAIL_SUPPRESS_SEND'] = True # Uncomment to suppress emails during testing if no SMTP server is configured
-#app.config['MAIL_SUPPRESS_SEND'] = True # Suppress emails for current testing phase
-
-mail = Mail(app) # Initialize Flask-Mail
-db.init_app(app)
-
-# Exemplo de modificação em src/main.py
-# ... (outras importações e configurações) ...
-from src.models.entities import Room, Booking # Certifique-se que Room está importado
-# ...
-with app.app_context():
-    db.create_all()
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(PROJECT_ROOT, 'lab_scheduler.db')
+
+def get_database_url():
+    # Usar variável de ambiente DATABASE_URL se disponível, caso contrário usar SQLite local
+    database_url = os.getenv('DATABASE_URL', f"sqlite:///{DB_PATH}")
+    # Ajustar URL do PostgreSQL se necessário (Render fornece URLs começando com postgres://)
+    if database_url.startswith("postgres://"):
+        database_url = database_url.replace("postgres://", "postgresql://", 1)
+    return database_url
+
+def configure_app(app):
+    app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', 'a_very_strong_random_secret_key_dev_123!@#')
+
+    database_url = get_database_url()
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # Perfil do engine conforme o banco (src/engine_profiles.py): pool do PostgreSQL dividido entre
+    # os workers do gunicorn (WEB_CONCURRENCY) e, no SQLite, WAL + busy_timeout + BEGIN IMMEDIATE
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options_for(
+        database_url,
+        workers=int(os.getenv('WEB_CONCURRENCY', 4)),
+        max_connections=int(os.getenv('DATABASE_MAX_CONNECTIONS', DATABASE_MAX_CONNECTIONS))
+    )
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', SQLITE_BUSY_TIMEOUT_MS))
+    app.config['SQLITE_SYNCHRONOUS'] = os.getenv('SQLITE_SYNCHRONOUS', SQLITE_SYNCHRONOUS)
+
+    # Flask-Mail configuration - Replace with your actual SMTP server details in production
+    # For development, you might use a local SMTP debugging server or a service like Mailtrap
+    # IMPORTANT: Use environment variables for sensitive information in production!
+    app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
+    app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
+    app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'true').lower() in ['true', '1', 't']
+    app.config['MAIL_USE_SSL'] = os.getenv('MAIL_USE_SSL', 'false').lower() in ['true', '1', 't']
+    app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME', 'itvdslab@gmail.com')
+    app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD', 'dsfv gkwr qcal fqev')
+    app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER', ('LAB.ITV', 'noreply@gmail.com'))
+
+    # For local testing without a real SMTP server, you can suppress sending or use a console mail server.
+    # app.config['MAIL_SUPPRESS_SEND'] = True # Uncomment to suppress emails during testing if no SMTP server is configured
+    #app.config['MAIL_SUPPRESS_SEND'] = True # Suppress emails for current testing phase
+
+    # Cache da escala semanal (GET /api/bookings). Para que os 4 workers do gunicorn vejam as
+    # invalidações uns dos outros, aponte SCHEDULE_CACHE_SHARED_DB para um arquivo SQLite comum.
+    app.config['SCHEDULE_CACHE_SHARED_DB'] = os.getenv('SCHEDULE_CACHE_SHARED_DB')
+    app.config['SCHEDULE_CACHE_TTL_SECONDS'] = int(os.getenv('SCHEDULE_CACHE_TTL_SECONDS', 30))
+
+    # PDFs da escala ficam em cache em disco; use um diretório persistente/compartilhado em produção
+    if os.getenv('PDF_CACHE_DIR'):
+        app.config['PDF_CACHE_DIR'] = os.getenv('PDF_CACHE_DIR')
+
+    # Arquivos (CSV gzip) dos agendamentos removidos por /api/admin/clear-bookings
+    if os.getenv('BOOKINGS_ARCHIVE_DIR'):
+        app.config['BOOKINGS_ARCHIVE_DIR'] = os.getenv('BOOKINGS_ARCHIVE_DIR')
+
+    # Geração de PDF em processos separados (WeasyPrint); 0 = gerar no próprio processo
+    app.config['PDF_RENDER_WORKERS'] = int(os.getenv('PDF_RENDER_WORKERS', 1))
+    app.config['PDF_RENDER_QUEUE_SIZE'] = int(os.getenv('PDF_RENDER_QUEUE_SIZE', 4))
+    app.config['PDF_RENDER_TIMEOUT_SECONDS'] = int(os.getenv('PDF_RENDER_TIMEOUT_SECONDS', 60))
+    app.config['PDF_RENDER_QUEUE_TIMEOUT_SECONDS'] = int(os.getenv('PDF_RENDER_QUEUE_TIMEOUT_SECONDS', 60))
+    app.config['PDF_RENDER_MEMORY_LIMIT_MB'] = int(os.getenv('PDF_RENDER_MEMORY_LIMIT_MB', 1024))
+
+    # Push da grade em tempo real (SSE). Cada conexão ocupa uma thread: o gunicorn roda com
+    # workers gthread (ver Procfile) e SCHEDULE_EVENTS_MAX_SUBSCRIBERS deve ficar abaixo de --threads
+    app.config['SCHEDULE_EVENTS_ENABLED'] = os.getenv('SCHEDULE_EVENTS_ENABLED', 'true').lower() in ['true', '1', 't']
+    app.config['SCHEDULE_EVENTS_MAX_SUBSCRIBERS'] = int(os.getenv('SCHEDULE_EVENTS_MAX_SUBSCRIBERS', 24))
+
+    # Controle de admissão do POST /api/bookings (por worker): pedidos simultâneos, fila e limite por usuário
+    app.config['BOOKING_ADMISSION_MAX_IN_FLIGHT'] = int(os.getenv('BOOKING_ADMISSION_MAX_IN_FLIGHT', 4))
+    app.config['BOOKING_ADMISSION_QUEUE_SIZE'] = int(os.getenv('BOOKING_ADMISSION_QUEUE_SIZE', 32))
+    # Agendamentos criados por usuário (nome normalizado) e por minuto; BOOKING_RATE_LIMIT_PER_EMAIL é o nome antigo
+    app.config['BOOKING_RATE_LIMIT_PER_USER'] = int(os.getenv('BOOKING_RATE_LIMIT_PER_USER', os.getenv('BOOKING_RATE_LIMIT_PER_EMAIL', 5)))
+
+    # Janela de agendamento e cotas por grupo de salas (JSON), ver src/services/booking_window.py
+    # e src/services/booking_quotas.py
+    app.config['BOOKING_WINDOW_GROUP_RULES'] = json.loads(os.getenv('BOOKING_WINDOW_GROUP_RULES', '{}'))
+    if os.getenv('BOOKING_QUOTA_RULES'):
+        app.config['BOOKING_QUOTA_RULES'] = json.loads(os.getenv('BOOKING_QUOTA_RULES'))
+
+    # Os e-mails de confirmação vão para a tabela email_outbox e são enviados em segundo plano
+    app.config['EMAIL_OUTBOX_DISPATCHER_ENABLED'] = os.getenv('EMAIL_OUTBOX_DISPATCHER_ENABLED', 'true').lower() in ['true', '1', 't']
+
+    # Métricas por request em GET /metrics (admin); com SLOW_REQUEST_THRESHOLD_MS > 0, requests
+    # acima do limite vão para o log com as queries SQL executadas
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', 'true').lower() in ['true', '1', 't']
+    app.config['SLOW_REQUEST_THRESHOLD_MS'] = int(os.getenv('SLOW_REQUEST_THRESHOLD_MS', 0))
+
+    # Assets da página com hash no nome e versões .gz/.br (flask --app src.main build-assets);
+    # sem o build, os arquivos de src/static são servidos como estão
+    if os.getenv('STATIC_BUILD_DIR'):
+        app.config['STATIC_BUILD_DIR'] = os.getenv('STATIC_BUILD_DIR')
+
+# config: valores que substituem os do ambiente (benchmarks, scripts)
+def create_app(config=None):
+    started = time.perf_counter()
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    configure_app(app)
+    if config:
+        app.config.update(config)
+
+    db.init_app(app)
+    schedule_cache.init_app(app)
+    email_dispatcher.init_app(app)
+    pdf_cache.init_app(app)
+    pdf_render_pool.init_app(app)
+    schedule_events.init_app(app)
+    booking_admission.init_app(app)
+    booking_window.init_app(app)
+    room_registry.init_app(app)
+    request_metrics.init_app(app)
+    static_assets.init_app(app)
+    with app.app_context():
+        # Só registra o listener de conexão; nenhuma conexão é aberta aqui
+        apply_engine_profile(db.engine, app.config['SQLITE_BUSY_TIMEOUT_MS'], app.config['SQLITE_SYNCHRONOUS'])
+
+    app.register_blueprint(bookings_bp, url_prefix='/api')
+    app.register_blueprint(metrics_bp)
+    app.add_url_rule('/admin/download-database', view_func=download_database)
+    app.add_url_rule('/', defaults={'path': ''}, view_func=serve)
+    app.add_url_rule('/<path:path>', view_func=serve)
+    for command in (init_db_command, build_assets_command, db_upgrade_command, explain_queries_command, backfill_users_command, dedupe_bookings_command, dispatch_emails_command):
+        app.cli.add_command(command)
+
+    app.logger.info("App created in %.1f ms", (time.perf_counter() - started) * 1000)
+    return app
+
+# Schema, migrações, seed das salas, grupos e backfill de usuários. Idempotente: pode rodar
+# a cada deploy (e por vários processos ao mesmo tempo). Chamar dentro de um app_context.
+def init_database(app):
+    # Outro processo pode criar uma tabela entre a verificação e o CREATE TABLE: cada falha
+    # assim significa uma tabela a mais já existente, e a próxima passada a pula
+    for attempt in range(len(db.metadata.tables)):
+        try:
+            db.create_all()
+            break
+        except (OperationalError, ProgrammingError):
+            db.session.rollback()
+            if attempt == len(db.metadata.tables) - 1:
+                raise
+    # create_all não altera tabelas já existentes: índices e mudanças de schema vêm das migrações.
+    # Uma migração que falha interrompe o init-db (e o deploy, encadeado com && no Procfile)
+    try:
+        run_migrations(db.engine, app.logger)
+    except Exception as e:
+        app.logger.error(f"Error applying database migrations: {str(e)}", exc_info=True)
+        raise
     if not Room.query.first():
-        room_names = ["Geral 1", "Geral 2", "Geral 3", "Geral 4", "Geral 5","Geral 6","Geral 7","Geral 8","Citometria - Bancada", "Sala Clara - Lupa esquerda", "Sala Clara - Lupa direita","Sala Clara - Lupa com Câmera","Sala Clara - Microscópio","Sala Escura - Axio Imager.M2", "Sala Escura - Axio Scope.A1","Sala Escura - Microscópio CONFOCAL-LMSN","Microbiologia - Capela de Fluxo Laminar","Microbiologia - Lupa", "Microbiologia - Equipamento","Geologia 1", "Geologia Micrótomo", "Cultivo A1","Cultivo A2","Cultivo B1","Cultivo B2"]
-        # Certifique-se de ter 10 nomes se o range(1,11) for mantido, ou ajuste o loop
-        for name in room_names: # Ou use um loop com índice se preferir
+        # Lista em room_registry.DEFAULT_ROOM_NAMES (também usada pelo gerador de dados dos benchmarks)
+        for name in DEFAULT_ROOM_NAMES:
             room = Room(name=name)
             db.session.add(room)
-        db.session.commit()
-        print("Database initialized and custom rooms created.")
+        try:
+            db.session.commit()
+            print("Database initialized and custom rooms created.")
+        except IntegrityError:
+            db.session.rollback() # Outro processo criou as salas ao mesmo tempo
+    assign_default_room_groups(app.logger)
+    # Agendamentos ainda sem user_id (registros antigos); depois do primeiro deploy é uma query só
+    try:
+        backfill_booking_users(logger=app.logger)
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error backfilling booking users: {str(e)}", exc_info=True)
+    # Outros workers já rodando recarregam o catálogo de salas pelo TTL
+    room_registry.refresh()
 
+# Comandos de manutenção do banco (ex: flask --app src.main db-upgrade)
+@click.command("init-db")
+@with_appcontext
+def init_db_command():
+    """Cria o schema, aplica as migrações e cria as salas (rodar antes de iniciar o gunicorn)."""
+    started = time.perf_counter()
+    init_database(current_app)
+    print(f"Banco pronto em {(time.perf_counter() - started) * 1000:.0f} ms.")
 
-app.register_blueprint(bookings_bp, url_prefix='/api')
+@click.command("build-assets")
+@with_appcontext
+def build_assets_command():
+    """Gera os assets de src/static com hash no nome e versões .gz/.br (rodar a cada deploy)."""
+    output_dir = current_app.config['STATIC_BUILD_DIR']
+    manifest = build_static_assets(current_app.static_folder, output_dir, current_app.logger)
+    for name, output_name in sorted(manifest.items()):
+        print(f"{name} -> {output_name}")
+    print(f"Assets gerados em {output_dir}.")
+
+@click.command("db-upgrade")
+@with_appcontext
+def db_upgrade_command():
+    """Aplica as migrações de schema pendentes."""
+    pending = get_pending_migrations(db.engine)
+    if not pending:
+        print("Nenhuma migração pendente.")
+        return
+    for name in run_migrations(db.engine, current_app.logger):
+        print(f"Migração aplicada: {name}")
+
+@click.command("explain-queries")
+@with_appcontext
+def explain_queries_command():
+    """Verifica com EXPLAIN se as queries das rotas usam os índices de bookings."""
+    all_ok = True
+    for label, uses_index, plan in check_query_plans(db.engine):
+        all_ok = all_ok and uses_index
+        print(f"[{'OK' if uses_index else 'FALHOU'}] {label}")
+        for line in plan:
+            print(f"    {line}")
+    if not all_ok:
+        raise SystemExit(1)
+
+@click.command("backfill-users")
+@click.option("--batch-size", default=BACKFILL_BATCH_SIZE, show_default=True, help="Agendamentos por transação.")
+@with_appcontext
+def backfill_users_command(batch_size):
+    """Liga os agendamentos sem user_id aos usuários normalizados, em lotes."""
+    total = backfill_booking_users(batch_size, current_app.logger)
+    print(f"Agendamentos ligados a usuários: {total}")
+
+@click.command("dedupe-bookings")
+@click.option("--apply", is_flag=True, help="Remove os excedentes (sem a opção, só lista os slots).")
+@with_appcontext
+def dedupe_bookings_command(apply):
+    """Lista ou remove agendamentos duplicados no mesmo slot (necessário antes da migração 0001)."""
+    duplicates = find_duplicate_slots()
+    if not duplicates:
+        print("Nenhum slot com agendamentos duplicados.")
+        return
+    for room_id, booking_date, period, count, kept_id in duplicates:
+        print(f"Sala {room_id} em {booking_date.isoformat()} ({period}): {count} agendamentos, mantido o id {kept_id}")
+    if not apply:
+        print(f"{len(duplicates)} slots duplicados. Rode com --apply para arquivar e remover os excedentes.")
+        return
+    archive_dir = current_app.config.get('BOOKINGS_ARCHIVE_DIR', BOOKINGS_ARCHIVE_DIR)
+    progress = {"deleted": 0, "archive": None}
+    for progress in iter_clear_bookings(duplicate_bookings_conditions(), archive_dir, archive_prefix="bookings_duplicates", free_slots=False):
+        pass
+    print(f"Agendamentos removidos: {progress['deleted']} (arquivo {progress['archive']} em {archive_dir}).")
+
+@click.command("dispatch-emails")
+@with_appcontext
+def dispatch_emails_command():
+    """Envia os e-mails pendentes da outbox (um lote por vez, até esvaziar)."""
+    app = current_app._get_current_object()
+    total_sent = total_failed = 0
+    while True:
+        sent, failed = dispatch_pending_emails(app)
+        total_sent += sent
+        total_failed += failed
+        if sent + failed < app.config["EMAIL_OUTBOX_BATCH_SIZE"]:
+            break
+    print(f"E-mails enviados: {total_sent}, falhas: {total_failed}")
 
 # Rota para download do banco de dados
-@app.route('/admin/download-database')
 def download_database():
     # Verificar senha de administrador (básica para demonstração)
     admin_password = os.getenv('ADMIN_PASSWORD', 'admin123')
@@ -75,14 +308,14 @@ def download_database():
         return jsonify({"error": "Acesso não autorizado"}), 401
     
     # Se estiver usando SQLite
-    if database_url.startswith('sqlite'):
+    if current_app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
         # Criar uma cópia do banco para download
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         download_filename = f"lab_scheduler_backup_{timestamp}.db"
-        download_path = os.path.join(project_root, download_filename)
+        download_path = os.path.join(PROJECT_ROOT, download_filename)
         
-        # Copiar o arquivo do banco de dados
-        shutil.copy2(db_path, download_path)
+        # Copiar o banco pela API de backup do SQLite (inclui os commits ainda no arquivo -wal)
+        backup_sqlite_database(DB_PATH, download_path)
         
         # Enviar o arquivo para download
         return send_file(
@@ -98,23 +331,22 @@ def download_database():
             "message": "Para PostgreSQL, use ferramentas como pg_dump para backup"
         }), 400
 
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
+# Assets pelo índice em memória de src/static_assets.py; qualquer outro caminho recebe a página
 def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
+    asset = static_assets.get(path) if path != "" else None
+    if asset is None:
+        asset = static_assets.get('index.html')
+        if asset is None:
             return "index.html not found in static folder. Please create it.", 404
+    return static_assets.send(asset)
 
 if __name__ == '__main__':
     # For local testing, you might want to set MAIL_SUPPRESS_SEND to True if SMTP is not set up
     # Example: app.config['MAIL_SUPPRESS_SEND'] = True
+    # Rodando "python src/main.py", processos spawn reimportariam este arquivo: gerar PDF no próprio processo
+    app = create_app({'PDF_RENDER_WORKERS': 0})
+    # Em desenvolvimento o banco é preparado a cada início, como antes
+    with app.app_context():
+        init_database(app)
+    email_dispatcher.start()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,139 @@
+# /home/ubuntu/lab_scheduler/src/migrations/runner.py
+
+# Migrações de schema versionadas.
+# Cada versão é um script SQL em versions/ com o nome NNNN_descricao.<dialeto>.sql,
+# com um arquivo por dialeto suportado (sqlite e postgresql). As versões aplicadas
+# ficam registradas na tabela schema_migrations.
+# Uma versão pode ter também NNNN_descricao.check.sql (para todos os dialetos): uma consulta
+# executada antes do script; se ela devolver linhas, a migração não é aplicada e o erro traz
+# essas linhas e os comentários do arquivo (ex.: slots duplicados antes do índice único).
+# O SQLite não tem ALTER TABLE ... ADD COLUMN IF NOT EXISTS: o runner aceita essa forma nos
+# scripts sqlite e pula a instrução quando a coluna já existe (ex.: criada por db.create_all).
+
+import os
+import re
+from sqlalchemy import text
+
+VERSIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "versions")
+SUPPORTED_DIALECTS = ("sqlite", "postgresql")
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d{4})_(\w+)\.(\w+)\.sql$")
+ADD_COLUMN_IF_NOT_EXISTS_PATTERN = re.compile(r"^ALTER TABLE (\w+) ADD COLUMN IF NOT EXISTS (\w+)", re.IGNORECASE | re.MULTILINE)
+CHECK_REPORT_MAX_ROWS = 20
+MIGRATIONS_LOCK_KEY = 7410301 # pg_advisory_xact_lock das migrações
+
+class MigrationError(RuntimeError):
+    pass
+
+# Outro processo registrou a versão primeiro: a transação é desfeita sem erro
+class MigrationAlreadyApplied(Exception):
+    pass
+
+def get_dialect_name(engine):
+    dialect_name = engine.dialect.name
+    if dialect_name not in SUPPORTED_DIALECTS:
+        raise RuntimeError(f"Migrações não disponíveis para o banco '{dialect_name}'")
+    return dialect_name
+
+def list_migrations(dialect_name):
+    migrations = []
+    for filename in os.listdir(VERSIONS_DIR):
+        match = MIGRATION_FILE_PATTERN.match(filename)
+        if match and match.group(3) == dialect_name:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(VERSIONS_DIR, filename)))
+    return sorted(migrations)
+
+def ensure_migrations_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, "
+            "name VARCHAR(200) NOT NULL, "
+            "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        ))
+
+def get_applied_versions(engine):
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+def get_pending_migrations(engine):
+    ensure_migrations_table(engine)
+    applied = get_applied_versions(engine)
+    return [m for m in list_migrations(get_dialect_name(engine)) if m[0] not in applied]
+
+def get_check_path(path):
+    check_path = re.sub(r"\.\w+\.sql$", ".check.sql", path)
+    return check_path if os.path.exists(check_path) else None
+
+# Linhas que bloqueiam a migração; levanta MigrationError com o relatório
+def run_check(conn, version, name, check_path):
+    with open(check_path, encoding="utf-8") as f:
+        check_sql = f.read()
+    result = conn.execute(text(check_sql))
+    columns = list(result.keys())
+    rows = result.all()
+    if not rows:
+        return
+    hint = "\n".join(line[2:].strip() for line in check_sql.splitlines() if line.startswith("--"))
+    lines = [f"Migration {version:04d}_{name} blocked: {len(rows)} rows returned by its check", hint, "  " + " | ".join(columns)]
+    lines += ["  " + " | ".join(str(value) for value in row) for row in rows[:CHECK_REPORT_MAX_ROWS]]
+    if len(rows) > CHECK_REPORT_MAX_ROWS:
+        lines.append(f"  ... {len(rows) - CHECK_REPORT_MAX_ROWS} more")
+    raise MigrationError("\n".join(lines))
+
+def split_statements(sql):
+    return [statement.strip() for statement in sql.split(";") if statement.strip()]
+
+# Instrução a executar, ou None se for um ADD COLUMN IF NOT EXISTS de coluna já existente (SQLite)
+def prepare_statement(conn, dialect_name, statement):
+    match = ADD_COLUMN_IF_NOT_EXISTS_PATTERN.search(statement)
+    if dialect_name != "sqlite" or not match:
+        return statement
+    table_name, column_name = match.groups()
+    columns = {row[1] for row in conn.execute(text(f"PRAGMA table_info({table_name})"))}
+    if column_name in columns:
+        return None
+    clause = statement[match.start():match.start(2)].replace(" IF NOT EXISTS", "")
+    return statement[:match.start()] + clause + statement[match.start(2):]
+
+# Aplica as migrações pendentes, cada uma em sua própria transação, e retorna as aplicadas.
+# Vários processos podem chamar ao mesmo tempo: no PostgreSQL um advisory lock da transação
+# serializa as migrações; no SQLite os scripts são idempotentes (IF NOT EXISTS) e a versão é
+# registrada com ON CONFLICT DO NOTHING. Só a versão já registrada por outro processo conta
+# como "já aplicada"; qualquer erro dos scripts desfaz a migração e é propagado.
+def run_migrations(engine, logger=None):
+    applied_now = []
+    dialect_name = get_dialect_name(engine)
+    for version, name, path in get_pending_migrations(engine):
+        with open(path, encoding="utf-8") as f:
+            statements = split_statements(f.read())
+        check_path = get_check_path(path)
+        try:
+            with engine.begin() as conn:
+                if dialect_name == "postgresql":
+                    conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+                    if conn.execute(text("SELECT 1 FROM schema_migrations WHERE version = :version"), {"version": version}).first():
+                        raise MigrationAlreadyApplied()
+                if check_path:
+                    run_check(conn, version, name, check_path)
+                for statement in statements:
+                    statement = prepare_statement(conn, dialect_name, statement)
+                    if statement:
+                        conn.execute(text(statement))
+                result = conn.execute(
+                    text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name) ON CONFLICT (version) DO NOTHING"),
+                    {"version": version, "name": name}
+                )
+                if result.rowcount == 0:
+                    raise MigrationAlreadyApplied()
+        except MigrationAlreadyApplied:
+            if logger:
+                logger.info(f"Migration {version:04d}_{name} already applied by another worker")
+            continue
+        except MigrationError:
+            raise
+        except Exception as e:
+            raise MigrationError(f"Migration {version:04d}_{name} failed: {e}") from e
+        applied_now.append(f"{version:04d}_{name}")
+        if logger:
+            logger.info(f"Applied migration {version:04d}_{name}")
+    return applied_now
@@ -0,0 +1,9 @@
+-- Slots com mais de um agendamento impedem o índice único uq_bookings_slot.
+-- Para ver e remover os excedentes (arquivados em CSV, fica o agendamento mais antigo de cada slot):
+--     flask --app src.main dedupe-bookings            (só lista)
+--     flask --app src.main dedupe-bookings --apply
+SELECT room_id, booking_date, period, COUNT(*) AS bookings, MIN(id) AS kept_id
+FROM bookings
+GROUP BY room_id, booking_date, period
+HAVING COUNT(*) > 1
+ORDER BY booking_date, room_id, period
@@ -0,0 +1,2 @@
+-- Um agendamento por slot (sala, data, período)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_bookings_slot ON bookings (room_id, booking_date, period);
@@ -0,0 +1,2 @@
+-- Listagem semanal, PDF e limpeza administrativa filtram por intervalo de booking_date
+CREATE INDEX IF NOT EXISTS ix_bookings_date_room_period ON bookings (booking_date, room_id, period);
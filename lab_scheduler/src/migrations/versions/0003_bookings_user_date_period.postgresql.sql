@@ -0,0 +1,3 @@
+-- Regras por usuário (limite de salas Geral) filtram por user_name, data e período
+CREATE INDEX IF NOT EXISTS ix_bookings_user_date_period ON bookings (user_name, booking_date, period);
+ANALYZE bookings;
@@ -0,0 +1,16 @@
+-- Fila de e-mails de confirmação (enviados em segundo plano)
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id INTEGER NOT NULL PRIMARY KEY,
+    recipient VARCHAR(120) NOT NULL,
+    subject VARCHAR(200) NOT NULL,
+    html_body TEXT NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    attempts INTEGER NOT NULL,
+    next_attempt_at DATETIME NOT NULL,
+    claim_token VARCHAR(32),
+    claimed_at DATETIME,
+    last_error TEXT,
+    created_at DATETIME NOT NULL,
+    sent_at DATETIME
+);
+CREATE INDEX IF NOT EXISTS ix_email_outbox_status_next_attempt ON email_outbox (status, next_attempt_at);
@@ -0,0 +1,12 @@
+-- Alterações de slots enviadas aos navegadores via Server-Sent Events
+CREATE TABLE IF NOT EXISTS schedule_events (
+    id SERIAL PRIMARY KEY,
+    week_start DATE NOT NULL,
+    kind VARCHAR(10) NOT NULL,
+    room_id INTEGER,
+    booking_date DATE,
+    period VARCHAR(20),
+    user_name VARCHAR(120),
+    created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_schedule_events_week_id ON schedule_events (week_start, id);
@@ -0,0 +1,11 @@
+-- Grupos de salas e a associação sala <-> grupo (preenchida no startup a partir do nome da sala)
+CREATE TABLE IF NOT EXISTS room_groups (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(80) NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS room_group_members (
+    group_id INTEGER NOT NULL REFERENCES room_groups (id),
+    room_id INTEGER NOT NULL REFERENCES rooms (id),
+    PRIMARY KEY (group_id, room_id)
+);
+CREATE INDEX IF NOT EXISTS ix_room_group_members_room ON room_group_members (room_id);
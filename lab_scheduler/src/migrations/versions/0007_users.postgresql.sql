@@ -0,0 +1,10 @@
+-- Usuários normalizados e o vínculo bookings.user_id (preenchido por backfill_booking_users)
+CREATE TABLE IF NOT EXISTS users (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(120) NOT NULL,
+    email VARCHAR(120),
+    name_key VARCHAR(120) NOT NULL UNIQUE,
+    created_at TIMESTAMP NOT NULL
+);
+ALTER TABLE bookings ADD COLUMN IF NOT EXISTS user_id INTEGER REFERENCES users (id);
+CREATE INDEX IF NOT EXISTS ix_bookings_user_id_date_period ON bookings (user_id, booking_date, period);
@@ -0,0 +1,6 @@
+-- Nome e e-mail de quem agenda passam a ser lidos de users (bookings.user_id): user_name e
+-- user_email deixam de ser gravados nos agendamentos novos e ficam só nos antigos.
+-- O índice por user_name (0003) sai: as cotas filtram por ix_bookings_user_id_date_period.
+DROP INDEX IF EXISTS ix_bookings_user_date_period;
+ALTER TABLE bookings ALTER COLUMN user_name DROP NOT NULL;
+ALTER TABLE bookings ALTER COLUMN user_email DROP NOT NULL;
@@ -0,0 +1,24 @@
+-- Nome e e-mail de quem agenda passam a ser lidos de users (bookings.user_id): user_name e
+-- user_email deixam de ser gravados nos agendamentos novos e ficam só nos antigos.
+-- O SQLite não remove NOT NULL de uma coluna: a tabela é recriada com os mesmos dados e índices.
+-- O índice por user_name (0003) sai: as cotas filtram por ix_bookings_user_id_date_period.
+DROP INDEX IF EXISTS ix_bookings_user_date_period;
+CREATE TABLE bookings_new (
+    id INTEGER NOT NULL PRIMARY KEY,
+    user_name VARCHAR(120),
+    user_email VARCHAR(120),
+    coordinator_name VARCHAR(120),
+    user_id INTEGER REFERENCES users (id),
+    room_id INTEGER NOT NULL REFERENCES rooms (id),
+    booking_date DATE NOT NULL,
+    period VARCHAR(20) NOT NULL,
+    created_at DATETIME DEFAULT (CURRENT_TIMESTAMP)
+);
+INSERT INTO bookings_new (id, user_name, user_email, coordinator_name, user_id, room_id, booking_date, period, created_at)
+SELECT id, user_name, user_email, coordinator_name, user_id, room_id, booking_date, period, created_at FROM bookings;
+DROP TABLE bookings;
+ALTER TABLE bookings_new RENAME TO bookings;
+CREATE UNIQUE INDEX uq_bookings_slot ON bookings (room_id, booking_date, period);
+CREATE INDEX ix_bookings_date_room_period ON bookings (booking_date, room_id, period);
+CREATE INDEX ix_bookings_user_id_date_period ON bookings (user_id, booking_date, period);
+ANALYZE bookings;
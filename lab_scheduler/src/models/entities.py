@@ -4,6 +4,26 @@ from ..extensions import db
 from sqlalchemy.sql import func
 import datetime
 
+# Grupos de salas (Geral, Sala Escura, Microbiologia, ...), usados pelas regras de cota
+# (src/services/booking_quotas.py) e pela janela de agendamento. Uma sala pode estar em
+# mais de um grupo (ex.: família da sala e um grupo de equipamentos).
+room_group_members = db.Table(
+    "room_group_members",
+    db.Column("group_id", db.Integer, db.ForeignKey("room_groups.id"), primary_key=True),
+    db.Column("room_id", db.Integer, db.ForeignKey("rooms.id"), primary_key=True),
+    db.Index("ix_room_group_members_room", "room_id")
+)
+
+class RoomGroup(db.Model):
+    __tablename__ = "room_groups"
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(80), unique=True, nullable=False)
+
+    rooms = db.relationship("Room", secondary=room_group_members, backref="groups", lazy=True)
+
+    def __repr__(self):
+        return f"<RoomGroup {self.name}>"
+
 class Room(db.Model):
     __tablename__ = "rooms"
     id = db.Column(db.Integer, primary_key=True)
@@ -14,17 +34,88 @@ class Room(db.Model):
     def __repr__(self):
         return f"<Room {self.name}>"
 
+# Identidade de quem agenda. name_key é o nome sem acentos, em minúsculas e com espaços
+# simples (src/services/booking_users.py): "José  Silva" e "jose silva" são o mesmo usuário.
+class User(db.Model):
+    __tablename__ = "users"
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False) # Última grafia usada
+    email = db.Column(db.String(120), nullable=True) # Último e-mail usado
+    name_key = db.Column(db.String(120), unique=True, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    bookings = db.relationship("Booking", backref="user", lazy=True)
+
+    def __repr__(self):
+        return f"<User {self.name} ({self.name_key})>"
+
 class Booking(db.Model):
     __tablename__ = "bookings"
     id = db.Column(db.Integer, primary_key=True)
-    user_name = db.Column(db.String(120), nullable=False)
-    user_email = db.Column(db.String(120), nullable=False) # Novo campo
+    # Nome e e-mail de quem agendou ficam em users (user_id). Estas colunas só têm valor nos
+    # agendamentos anteriores ao vínculo, lidos como reserva enquanto user_id é nulo
+    user_name = db.Column(db.String(120), nullable=True)
+    user_email = db.Column(db.String(120), nullable=True)
     coordinator_name = db.Column(db.String(120), nullable=True) # Novo campo, pode ser opcional
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True) # Nulo até o backfill nos registros antigos
     room_id = db.Column(db.Integer, db.ForeignKey("rooms.id"), nullable=False)
     booking_date = db.Column(db.Date, nullable=False)
     period = db.Column(db.String(20), nullable=False)  # "Manhã" ou "Tarde"
     created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
 
+    # Um slot (sala, data, período) só pode ter um agendamento; o banco garante isso
+    # mesmo quando dois workers processam o mesmo slot ao mesmo tempo.
+    # Os índices também são criados em bancos existentes pelas migrações (src/migrations/versions).
+    __table_args__ = (
+        db.Index("uq_bookings_slot", "room_id", "booking_date", "period", unique=True),
+        db.Index("ix_bookings_date_room_period", "booking_date", "room_id", "period"),
+        db.Index("ix_bookings_user_id_date_period", "user_id", "booking_date", "period"),
+    )
+
     def __repr__(self):
-        return f"<Booking {self.user_name} ({self.user_email}) - Room: {self.room.name} on {self.booking_date} ({self.period}) - Coord: {self.coordinator_name}>"
+        return f"<Booking user {self.user_id} - Room: {self.room.name} on {self.booking_date} ({self.period}) - Coord: {self.coordinator_name}>"
+
+
+# Fila (outbox) de e-mails: gravada na mesma transação dos agendamentos e enviada
+# em segundo plano pelo EmailDispatcher (src/services/email_outbox.py)
+class EmailOutbox(db.Model):
+    __tablename__ = "email_outbox"
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    html_body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="pending") # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    claim_token = db.Column(db.String(32), nullable=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
 
+    def __repr__(self):
+        return f"<EmailOutbox {self.id} to {self.recipient} ({self.status}, {self.attempts} attempts)>"
+
+# Alterações de slots para o push em tempo real (SSE). Gravadas na mesma transação dos
+# agendamentos; cada worker lê as novas pelo id (ver src/services/schedule_events.py).
+class ScheduleEvent(db.Model):
+    __tablename__ = "schedule_events"
+    id = db.Column(db.Integer, primary_key=True)
+    week_start = db.Column(db.Date, nullable=False)
+    kind = db.Column(db.String(10), nullable=False) # taken, freed, reload
+    room_id = db.Column(db.Integer, nullable=True)
+    booking_date = db.Column(db.Date, nullable=True)
+    period = db.Column(db.String(20), nullable=True)
+    user_name = db.Column(db.String(120), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        db.Index("ix_schedule_events_week_id", "week_start", "id"),
+    )
+
+    def __repr__(self):
+        return f"<ScheduleEvent {self.id} {self.kind} week {self.week_start}>"
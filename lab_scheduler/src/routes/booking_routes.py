@@ -1,38 +1,69 @@
 # /home/ubuntu/lab_scheduler/src/routes/booking_routes.py
 
-from flask import Blueprint, request, jsonify, current_app, Response, make_response
-from src.extensions import db
-from src.models.entities import Room, Booking
+from flask import Blueprint, request, jsonify, current_app, Response, send_file, stream_with_context, make_response
+from src.extensions import db, schedule_cache
+from src.models.entities import Booking
 from datetime import datetime, date, time, timedelta, timezone
-from collections import defaultdict
-from flask_mail import Message # Import Message for Flask-Mail
-# PDF Generation
-from weasyprint import HTML, CSS
-from jinja2 import Environment, FileSystemLoader
+from src.services.email_outbox import enqueue_email, email_dispatcher
+from src.services.pdf_cache import pdf_cache
+from src.services.pdf_renderer import PdfRenderUnavailable
+from src.services.schedule_export import (
+    iter_bookings_csv, get_week_starts, render_range_pdf, EXPORT_CSV_BATCH_SIZE, EXPORT_PDF_MAX_WEEKS
+)
+import io
 import os
-# *** ADDED: Import joinedload for eager loading ***
-from sqlalchemy.orm import joinedload
-# *** ADDED: Import func for SQL functions ***
-from sqlalchemy import func
+import tempfile
+import json
+import math
+import time as time_module
+from functools import wraps
+from urllib.parse import urlencode
+from sqlalchemy.exc import IntegrityError
+from src.instrumentation import get_query_count
+from src.engine_profiles import begin_write_transaction, backup_sqlite_database, DatabaseBusy
+from src.services.booking_queries import (
+    slot_conflicts_query, bookings_listing_query, week_grid_rows_query, week_data_tag
+)
+from src.services.schedule_grid import build_week_grid
+from src.services.booking_admission import booking_admission, AdmissionRejected
+from src.services.booking_window import booking_window
+from src.services.room_registry import room_registry
+from src.services.booking_quotas import check_quotas, parse_quota_rules, DEFAULT_QUOTA_RULES
+from src.services.booking_users import find_user, get_or_create_user, normalize_user_key
+from src.services.booking_cleanup import (
+    clear_bookings_conditions, count_bookings, iter_clear_bookings, CLEAR_BOOKINGS_CHUNK_SIZE, BOOKINGS_ARCHIVE_DIR
+)
+from src.services.schedule_events import schedule_events, record_slot_events, record_week_reloads, get_last_event_id, TooManySubscribers
+from src.services.booking_listing import (
+    iter_json_array, iter_ndjson, encode_cursor, decode_cursor, BOOKINGS_PAGE_MAX_LIMIT, BOOKINGS_STREAM_BATCH_SIZE
+)
 
 bookings_bp = Blueprint("bookings_bp", __name__)
 
-# --- MODIFICADO: Limite de 3 períodos por dia ---
-MAX_BOOKINGS_PER_DAY = 3
-
-# --- Booking Window Configuration (Ajustado para os horários corretos) ---
-CUTOFF_WEEKDAY = 2 # Wednesday
-# Use 21:00 UTC to represent 18:00 Brazil Time (UTC-3)
-CUTOFF_TIME = time(21, 0, 0, tzinfo=timezone.utc)
-RELEASE_WEEKDAY = 3 # Thursday (alterado de 4/Friday para 3/Thursday)
-# Use 02:59 UTC (Friday) to represent 23:59 Brazil Time (Thursday UTC-3)
-RELEASE_TIME = time(2, 59, 0, tzinfo=timezone.utc) # Alterado de 2:00 para 2:59
-# ----------------------------------
+# Reporta o número de queries SQL emitidas por cada request da API
+@bookings_bp.after_request
+def add_query_count_header(response):
+    response.headers["X-Query-Count"] = str(get_query_count())
+    return response
 
 # --- Admin Configuration ---
 ADMIN_PASSWORD = "lab_scheduler_admin" # Default password, should be overridden in config
 # ----------------------------------
 
+# --- Conditional GET (ETag) ---
+# Responde 304 quando o cliente já tem a versão atual (If-None-Match), sem montar a resposta
+def not_modified_response(etag):
+    if etag and request.if_none_match.contains(etag):
+        response = Response(status=304)
+        return set_etag_headers(response, etag)
+    return None
+
+def set_etag_headers(response, etag):
+    response.set_etag(etag)
+    # no-cache: o navegador/proxy pode guardar, mas deve revalidar com o ETag a cada uso
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
 # Helper function to get Monday of a week containing the given date
 def get_monday_of_week(input_date):
     # weekday() returns 0 for Monday, 1 for Tuesday, etc.
@@ -43,19 +74,13 @@ def get_monday_of_week(input_date):
         # For all other days, go back to Monday of the same week
         return input_date - timedelta(days=input_date.weekday())
 
-# Helper function to send confirmation email
-def send_booking_confirmation_email(user_email, user_name, coordinator_name, booked_slots_details):
-    mail = current_app.extensions.get("mail")
-    if not mail:
-        current_app.logger.error("Flask-Mail not found. Email not sent.")
-        return False
+# Helper function to queue the confirmation email (enviado em segundo plano pela outbox)
+def queue_booking_confirmation_email(user_email, user_name, coordinator_name, booked_slots_details):
     if not booked_slots_details:
         current_app.logger.info("No booking details for email.")
         return False
 
     subject = "Confirmação de Agendamento de Laboratório"
-    sender = current_app.config.get("MAIL_DEFAULT_SENDER", "noreply@example.com")
-    recipients = [user_email]
 
     # Using single quotes for the main f-string to allow double quotes inside HTML easily
     html_body = f'''<p>Olá {user_name},</p><p>Seu agendamento foi confirmado:</p><ul>'''
@@ -69,103 +94,91 @@ def send_booking_confirmation_email(user_email, user_name, coordinator_name, boo
         html_body += f'''<li>Sala: {slot["room_name"]} - Data: {booking_date_formatted} - Período: {slot["period"]}</li>'''
     html_body += f'''</ul><p>Coordenador: {coordinator_name}</p><p>Obrigado!</p>'''
 
-    msg = Message(subject, sender=sender, recipients=recipients)
-    msg.html = html_body
-
-    try:
-        mail.send(msg)
-        current_app.logger.info(f"Confirmation email sent to {user_email}")
-        return True
-    except Exception as e:
-        current_app.logger.error(f"Failed to send email to {user_email}: {str(e)}")
-        return False
-
-# Helper function to check for conflicts
-def check_booking_conflict(room_id, booking_date_obj, period):
-    return Booking.query.filter_by(room_id=room_id, booking_date=booking_date_obj, period=period).first() is not None
-
-# Helper function to check booking window rules (Reverted to block weekends)
-def is_booking_allowed(booking_date_obj):
-    now_utc = datetime.now(timezone.utc)
-    today_utc = now_utc.date()
-    
-    # CORREÇÃO: Garantir que a semana sempre comece na segunda-feira
-    start_of_current_week = get_monday_of_week(today_utc)
-    start_of_next_week = start_of_current_week + timedelta(days=7) # Monday of next week
-    end_of_current_week = start_of_current_week + timedelta(days=4) # Friday of current week
-    end_of_next_week = start_of_next_week + timedelta(days=4) # Friday of next week
-
-    # Cutoff for the *current* week is Wednesday 18:00 Brazil Time (21:00 UTC)
-    cutoff_datetime_current_week = datetime.combine(start_of_current_week + timedelta(days=CUTOFF_WEEKDAY), CUTOFF_TIME)
-    
-    # Release for the *next* week is Thursday 23:59 Brazil Time (Friday 02:59 UTC)
-    thursday_current_week = start_of_current_week + timedelta(days=RELEASE_WEEKDAY)
-    release_datetime_for_next_week = datetime.combine(thursday_current_week, RELEASE_TIME)
-    
-    # Make time objects timezone-aware for comparison
-    time_midnight_utc = time(0, 0, 0, tzinfo=timezone.utc)
-    time_3am_utc = time(3, 0, 0, tzinfo=timezone.utc)
-    # Compare RELEASE_TIME (aware) with aware time objects
-    if RELEASE_TIME < time_midnight_utc or (RELEASE_TIME >= time_midnight_utc and RELEASE_TIME < time_3am_utc):
-         release_datetime_for_next_week += timedelta(days=1)
-
-    # Cutoff for the *next* week is Wednesday 18:00 Brazil Time (21:00 UTC) of that next week
-    cutoff_datetime_next_week = datetime.combine(start_of_next_week + timedelta(days=CUTOFF_WEEKDAY), CUTOFF_TIME)
-
-    # Re-enable weekend check
-    if booking_date_obj.weekday() >= 5:
-        # Use double quotes for f-string, single quotes inside
-        return False, f"Agendamentos só permitidos de Seg-Sex. Data: {booking_date_obj.strftime('%d/%m/%Y')} é fim de semana."
-    
-    # Removed past date check as requested by user
-    # if booking_date_obj < today_utc:
-    #     return False, f"Data de agendamento {booking_date_obj.strftime('%d/%m/%Y')} no passado."
-
-    # Check booking date against windows (using Friday as end of week)
-    if start_of_current_week <= booking_date_obj <= end_of_current_week: # Booking for current week (Mon-Fri)
-        if now_utc >= cutoff_datetime_current_week:
-            # Use double quotes for f-string, single quotes inside
-            return False, f"Agendamento para semana atual ({start_of_current_week.strftime('%d/%m')}-{end_of_current_week.strftime('%d/%m')}) encerrou Qua 18:00 (Horário Local)."
-        else:
-            return True, "OK"
-            
-    elif start_of_next_week <= booking_date_obj <= end_of_next_week: # Booking for next week (Mon-Fri)
-        if now_utc < release_datetime_for_next_week:
-             # Use double quotes for f-string, single quotes inside
-             return False, f"Agendamento para próxima semana ({start_of_next_week.strftime('%d/%m')}-{end_of_next_week.strftime('%d/%m')}) abre Qui 23:59 (Horário Local)."
-        elif now_utc >= cutoff_datetime_next_week:
-             # Use double quotes for f-string, single quotes inside
-             return False, f"Agendamento para semana de {start_of_next_week.strftime('%d/%m')} já encerrou (Qua 18:00 Horário Local)."
-        else:
-             # It's after release time and before next week's cutoff
-             return True, "OK"
-             
-    else: # Booking for weeks beyond the next one, or past weeks
-        # Allow booking past dates based on previous user request
-        if booking_date_obj < start_of_current_week:
-             # Still need to check if the past date is a weekend
-             if booking_date_obj.weekday() >= 5:
-                 # Use double quotes for f-string, single quotes inside
-                 return False, f"Agendamentos só permitidos de Seg-Sex. Data: {booking_date_obj.strftime('%d/%m/%Y')} é fim de semana."
-             else:
-                 return True, "OK" 
-        else: # Booking for week after next or later
-            # Use double quotes for f-string, single quotes inside
-            return False, f"Só é possível agendar para semana atual ou próxima. Data: {booking_date_obj.strftime('%d/%m/%Y')} fora do período permitido."
+    # Sem commit aqui: a mensagem é gravada na mesma transação dos agendamentos
+    enqueue_email(user_email, subject, html_body)
+    return True
+
+# --- Validação em lote (uma query por etapa, independente do número de slots) ---
+def find_booking_conflicts(processed_slots):
+    # Busca de uma vez todos os slots já reservados entre os solicitados
+    # (antes do INSERT e para mapear uma violação do índice único de volta ao slot).
+    # O filtro IN por coluna traz um superconjunto; a interseção exata é feita em Python.
+    if not processed_slots:
+        return set()
+    requested = {(s["room_id"], s["booking_date_obj"], s["period"]) for s in processed_slots}
+    rows = slot_conflicts_query(
+        {key[0] for key in requested}, {key[1] for key in requested}, {key[2] for key in requested}
+    ).all()
+    return {tuple(row) for row in rows} & requested
+
+# Helper function to check booking window rules (calendário pré-calculado em booking_window)
+def is_booking_allowed(booking_date_obj, group=None):
+    return booking_window.check(booking_date_obj, group=group)
 
 @bookings_bp.route("/rooms", methods=["GET"])
 def get_rooms():
     try:
         current_app.logger.debug("Fetching rooms...")
-        rooms = Room.query.order_by(Room.id).all()
-        room_list = [{"id": room.id, "name": room.name} for room in rooms]
-        current_app.logger.debug(f"Rooms fetched: {len(room_list)}")
-        return jsonify(room_list)
+        rooms = room_registry.get()
+        payload, etag = rooms.payload, rooms.etag
+        not_modified = not_modified_response(etag)
+        if not_modified:
+            return not_modified
+        return set_etag_headers(Response(payload, mimetype="application/json"), etag)
     except Exception as e:
         current_app.logger.error(f"Error fetching rooms: {str(e)}", exc_info=True)
         return jsonify({"error": "Erro ao buscar salas"}), 500
 
+# --- Controle de admissão do POST /api/bookings (pico da abertura semanal) ---
+# Fila por ordem de chegada, limite de pedidos simultâneos por worker e limite por usuário;
+# ver src/services/booking_admission.py
+def admission_controlled(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_app.config["BOOKING_ADMISSION_ENABLED"]:
+            return view(*args, **kwargs)
+        data = request.get_json(silent=True) or {}
+        user_key = normalize_user_key(str(data.get("user_name") or ""))
+        # Nova tentativa com X-Queue-Token mantém a prioridade da primeira chegada
+        arrived_at = booking_admission.read_token(request.headers.get("X-Queue-Token")) or time_module.time()
+        reservation = None
+        created = False
+        try:
+            if user_key:
+                reservation = booking_admission.check_rate_limit(user_key)
+            with booking_admission.admit(arrived_at) as waited_seconds:
+                response = make_response(view(*args, **kwargs))
+            created = response.status_code == 200
+        except AdmissionRejected as e:
+            current_app.logger.warning(f"Booking request rejected by admission control ({e.reason}, position={e.position})")
+            return admission_rejected_response(e)
+        finally:
+            # Só agendamentos criados contam no limite do usuário
+            if reservation is not None and not created:
+                booking_admission.release_booking(user_key, reservation)
+        response.headers["X-Queue-Wait-Ms"] = str(int(waited_seconds * 1000))
+        return response
+    return wrapper
+
+# Retry-After só aceita segundos inteiros; retry_after_ms no corpo permite tentar antes
+def admission_rejected_response(error):
+    retry_after_ms = int(error.retry_after * 1000)
+    if error.reason == "rate_limited":
+        response = jsonify({"error": "Muitos agendamentos seguidos para este nome. Aguarde alguns instantes.", "retry_after_ms": retry_after_ms})
+        response.status_code = 429
+    else:
+        response = jsonify({
+            "error": "Muitos agendamentos sendo processados agora. Seu pedido mantém o lugar na fila.",
+            "queue_position": error.position,
+            "queue_token": booking_admission.issue_token(error.arrived_at),
+            "retry_after_ms": retry_after_ms
+        })
+        response.status_code = 503
+    response.headers["Retry-After"] = str(math.ceil(error.retry_after))
+    return response
+
 @bookings_bp.route("/bookings", methods=["POST"])
+@admission_controlled
 def create_booking():
     current_app.logger.debug("Received booking request")
     data = request.get_json()
@@ -177,7 +190,7 @@ def create_booking():
     user_email = data.get("user_email")
     coordinator_name = data.get("coordinator_name")
     slots_data = data.get("slots")
-    current_app.logger.debug(f"Booking request data: User={user_name}, Email={user_email}, Slots={len(slots_data) if slots_data else 0}")
+    current_app.logger.debug("Booking request data: User=%s, Email=%s, Slots=%s", user_name, user_email, len(slots_data) if slots_data else 0)
 
     if not all([user_name, user_email, slots_data]):
         current_app.logger.warning("Missing required fields for booking")
@@ -192,11 +205,13 @@ def create_booking():
     processed_slots = []
 
     try: # Wrap slot processing in try/except
+        # Salas do pedido pelo registro em memória (sem query)
+        rooms = room_registry.get()
         for slot_input in slots_data:
             room_id = slot_input.get("room_id")
             booking_date_str = slot_input.get("booking_date")
             period = slot_input.get("period")
-            current_app.logger.debug(f"Processing slot: Room={room_id}, Date={booking_date_str}, Period={period}")
+            current_app.logger.debug("Processing slot: Room=%s, Date=%s, Period=%s", room_id, booking_date_str, period)
 
             if not all([room_id, booking_date_str, period]):
                 current_app.logger.warning(f"Invalid slot data: {slot_input}")
@@ -211,93 +226,91 @@ def create_booking():
                 current_app.logger.warning(f"Invalid date format: {booking_date_str}")
                 # Simplified f-string: double quotes outside, single quotes inside
                 return jsonify({"error": f"Formato de data inválido '{booking_date_str}'. Use YYYY-MM-DD"}), 400
-            
-            # Check booking window rules first
-            current_app.logger.debug(f"Checking booking window for {booking_date_obj}")
-            allowed, message = is_booking_allowed(booking_date_obj)
+
+            try:
+                room = rooms.get(int(room_id))
+            except (TypeError, ValueError):
+                room = None
+
+            # Check booking window rules first (cada grupo de salas pode ter a sua janela; uma
+            # sala desconhecida usa a janela padrão e recebe o 404 logo abaixo)
+            group = booking_window.group_for_room(room) if room else None
+            allowed, message = is_booking_allowed(booking_date_obj, group)
             if not allowed:
                 current_app.logger.info(f"Booking denied for {booking_date_obj}: {message}")
                 return jsonify({"error": message}), 400
-            current_app.logger.debug(f"Booking window check passed for {booking_date_obj}")
 
-            room = Room.query.get(room_id)
             if not room:
                 current_app.logger.warning(f"Room ID not found: {room_id}")
                 return jsonify({"error": f"Sala ID {room_id} não encontrada"}), 404
-            
+
             processed_slots.append({
-                "room_id": room_id, "room_name": room.name,
+                "room_id": room.id, "room_name": room.name,
                 "booking_date_obj": booking_date_obj, "booking_date_str": booking_date_str,
                 "period": period
             })
+        current_app.logger.debug("Booking window check passed")
 
-        # --- MODIFICADO: Validação de salas Geral para permitir períodos diferentes no mesmo dia ---
-        current_app.logger.debug("Validating Geral room limits - MODIFIED to allow different periods")
-        # Agrupar slots de salas Geral por dia e período
-        geral_slots_by_day_and_period = defaultdict(lambda: defaultdict(list))
-        
+        # Slots repetidos no mesmo pedido violariam o índice único de bookings
+        seen_slots = set()
         for slot in processed_slots:
-            if slot["room_name"].startswith("Geral "):
-                # Agrupar por dia e período
-                geral_slots_by_day_and_period[slot["booking_date_obj"]][slot["period"]].append({
-                    "room_id": slot["room_id"], 
-                    "room_name": slot["room_name"]
-                })
-        
-        # Verificar agendamentos existentes de salas Geral
-        for booking_date_obj, periods_data in geral_slots_by_day_and_period.items():
-            date_str = booking_date_obj.strftime('%Y-%m-%d')
-            
-            # Verificar agendamentos existentes para cada período
-            for period, slots in periods_data.items():
-                # Verificar se o usuário já tem agendamento para este período em outra sala Geral
-                existing_geral_bookings = Booking.query.join(Room).filter(
-                    Booking.user_name == user_name,
-                    Booking.booking_date == booking_date_obj,
-                    Booking.period == period,
-                    Room.name.startswith("Geral ")
-                ).all()
-                
-                # Se já existe agendamento para este período e estamos tentando agendar outra sala Geral
-                if existing_geral_bookings and len(slots) > 0:
-                    existing_room_names = [b.room.name for b in existing_geral_bookings]
-                    current_app.logger.info(f"User {user_name} already has Geral room booking for {date_str}, {period}: {existing_room_names}")
-                    return jsonify({"error": f"Você já possui agendamento para sala '{existing_room_names[0]}' no período da '{period}' em {date_str}."}), 409
-                
-                # Verificar se estamos tentando agendar mais de uma sala Geral no mesmo período
-                if len(slots) > 1:
-                    room_names = [s["room_name"] for s in slots]
-                    current_app.logger.info(f"User {user_name} trying to book multiple Geral rooms in same period: {room_names}")
-                    return jsonify({"error": f"Não é possível agendar mais de uma sala 'Geral' no mesmo período ('{period}') em {date_str}."}), 409
-        
-        current_app.logger.debug("Geral room validation passed")
-        # --- Fim da validação modificada de salas Geral ---
+            slot_key = (slot["room_id"], slot["booking_date_obj"], slot["period"])
+            if slot_key in seen_slots:
+                current_app.logger.warning(f"Duplicate slot in booking request: {slot_key}")
+                return jsonify({"error": f"Slot duplicado no pedido: sala '{slot['room_name']}' em {slot['booking_date_str']} ('{slot['period']}')."}), 400
+            seen_slots.add(slot_key)
+
+        # Daqui em diante a transação lê e grava: no SQLite já começa com o lock de escrita.
+        # As validações acima não acessam o banco; as recusas abaixo desfazem a transação para
+        # liberar o lock na hora. Sem o lock dentro de SQLITE_BUSY_TIMEOUT_MS: 503 + Retry-After
+        try:
+            begin_write_transaction(db.session, current_app.config["SQLITE_BUSY_TIMEOUT_MS"])
+        except DatabaseBusy as e:
+            db.session.rollback()
+            current_app.logger.warning(f"Booking rejected, database write lock busy: {str(e)}")
+            response = jsonify({"error": "Muitos agendamentos sendo gravados agora. Tente novamente em instantes.", "retry_after_ms": e.retry_after * 1000})
+            response.status_code = 503
+            response.headers["Retry-After"] = str(e.retry_after)
+            return response
+
+        # Cotas por grupo de salas (ex.: uma sala Geral por período, MAX_BOOKINGS_PER_DAY por dia),
+        # com uma única query para todas as regras; um usuário novo ainda não tem agendamentos
+        user = find_user(user_name)
+        quota_error = check_quotas(
+            user.id if user else None, processed_slots, rooms,
+            parse_quota_rules(current_app.config.get("BOOKING_QUOTA_RULES", DEFAULT_QUOTA_RULES))
+        )
+        if quota_error:
+            current_app.logger.info(f"Booking quota exceeded for {user_name}: {quota_error}")
+            db.session.rollback()
+            return jsonify({"error": quota_error}), 409
+        current_app.logger.debug("Booking quota check passed")
 
-        # Validation: Slot already taken (Keep this check)
-        current_app.logger.debug("Checking for booking conflicts")
+        # Slots já reservados. O índice único uq_bookings_slot barra no commit a corrida entre
+        # workers; esta verificação também protege um banco em que a migração 0001 não pôde
+        # criar o índice (duplicados antigos, ver flask --app src.main dedupe-bookings)
+        conflicts = find_booking_conflicts(processed_slots)
         for slot in processed_slots:
-            # Use double quotes for dictionary keys inside single-quoted f-string
-            if check_booking_conflict(slot["room_id"], slot["booking_date_obj"], slot["period"]):
+            if (slot["room_id"], slot["booking_date_obj"], slot["period"]) in conflicts:
                 current_app.logger.info(f"Booking conflict found: Room {slot['room_id']}, Date {slot['booking_date_str']}, Period {slot['period']}")
-                # Simplified f-string: double quotes outside, single quotes inside
+                db.session.rollback()
                 return jsonify({"error": f"Sala '{slot['room_name']}' já reservada para '{slot['period']}' em {slot['booking_date_str']}."}), 409
-        current_app.logger.debug("Conflict check passed")
-        
+        current_app.logger.debug("Slot conflict check passed")
+
         # All validations passed, create bookings
         current_app.logger.debug("All validations passed, creating bookings")
+        user, renamed_dates = get_or_create_user(user_name, user_email, user)
         new_bookings = []
         booked_slots_details = []
         for slot in processed_slots:
             # Use double quotes for dictionary keys inside single-quoted f-string
             new_booking = Booking(
-                user_name=user_name,
-                user_email=user_email,
                 coordinator_name=coordinator_name,
+                user=user,
                 room_id=slot["room_id"],
                 booking_date=slot["booking_date_obj"],
                 period=slot["period"]
             )
-            db.session.add(new_booking)
             new_bookings.append(new_booking)
             booked_slots_details.append({
                 "room_name": slot["room_name"],
@@ -305,23 +318,44 @@ def create_booking():
                 "period": slot["period"]
             })
         
-        # Commit to database
+        # Commit to database: todos os slots do pedido e o e-mail de confirmação em uma única transação
         try:
+            db.session.add_all(new_bookings)
+            record_slot_events("taken", new_bookings)
+            record_week_reloads(renamed_dates)
+            email_queued = queue_booking_confirmation_email(user_email, user_name, coordinator_name, booked_slots_details)
             db.session.commit()
-            current_app.logger.info(f"Successfully created {len(new_bookings)} bookings for {user_name}")
+            changed_dates = [slot["booking_date_obj"] for slot in processed_slots] + sorted(renamed_dates)
+            schedule_cache.invalidate(changed_dates)
+            pdf_cache.invalidate(changed_dates)
+            schedule_events.wake()
+            current_app.logger.info(f"Successfully created {len(new_bookings)} bookings for {user_name} ({get_query_count()} queries)")
             
-            # Send confirmation email
-            email_sent = send_booking_confirmation_email(user_email, user_name, coordinator_name, booked_slots_details)
-            if not email_sent:
-                current_app.logger.warning(f"Booking created but email not sent to {user_email}")
+            # O envio acontece fora do request, pelo dispatcher da outbox
+            if email_queued:
+                email_dispatcher.wake()
+            else:
+                current_app.logger.warning(f"Booking created but email not queued for {user_email}")
             
-            return jsonify({"message": "Agendamento(s) criado(s) com sucesso", "email_sent": email_sent})
+            return jsonify({"message": "Agendamento(s) criado(s) com sucesso", "email_sent": "queued" if email_queued else False})
+        except IntegrityError as e:
+            db.session.rollback()
+            # Outro worker reservou um dos slots entre a validação e o commit:
+            # identificar qual slot violou o índice único para devolver o 409 correto
+            conflicts = find_booking_conflicts(processed_slots)
+            for slot in processed_slots:
+                if (slot["room_id"], slot["booking_date_obj"], slot["period"]) in conflicts:
+                    current_app.logger.info(f"Booking conflict found: Room {slot['room_id']}, Date {slot['booking_date_str']}, Period {slot['period']}")
+                    return jsonify({"error": f"Sala '{slot['room_name']}' já reservada para '{slot['period']}' em {slot['booking_date_str']}."}), 409
+            current_app.logger.error(f"Integrity error during booking commit: {str(e)}", exc_info=True)
+            return jsonify({"error": "Erro ao salvar agendamento(s) no banco de dados"}), 500
         except Exception as e:
             db.session.rollback()
             current_app.logger.error(f"Database error during booking commit: {str(e)}", exc_info=True)
             return jsonify({"error": "Erro ao salvar agendamento(s) no banco de dados"}), 500
             
     except Exception as e:
+        db.session.rollback()
         current_app.logger.error(f"Unexpected error during booking processing: {str(e)}", exc_info=True)
         return jsonify({"error": "Falha ao processar ou criar agendamento(s) no servidor.", "details": str(e)}), 500
 
@@ -329,10 +363,17 @@ def create_booking():
 def get_bookings():
     start_date_str = request.args.get("start_date")
     end_date_str = request.args.get("end_date")
-    current_app.logger.debug(f"Fetching bookings from {start_date_str} to {end_date_str}")
+    # Opcionais: format=ndjson (uma linha JSON por agendamento) e paginação por keyset
+    # (limit + cursor; o cursor da próxima página vem no header X-Next-Cursor)
+    response_format = request.args.get("format", "json").lower()
+    limit_str = request.args.get("limit")
+    cursor = request.args.get("cursor")
+    current_app.logger.debug("Fetching bookings from %s to %s", start_date_str, end_date_str)
     if not start_date_str or not end_date_str:
          current_app.logger.warning("Missing start_date or end_date for fetching bookings")
          return jsonify({"error": "Parâmetros start_date e end_date são obrigatórios"}), 400
+    if response_format not in ("json", "ndjson"):
+        return jsonify({"error": "Parâmetro format deve ser json ou ndjson"}), 400
     try:
         start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
         end_date = datetime.strptime(end_date_str, "%Y-%m-%d").date()
@@ -341,113 +382,180 @@ def get_bookings():
         if start_date.weekday() != 0:  # Se não for segunda-feira
             start_date = get_monday_of_week(start_date)
             start_date_str = start_date.strftime("%Y-%m-%d")
-            current_app.logger.debug(f"Adjusted start_date to Monday: {start_date_str}")
-        
-        current_app.logger.debug(f"Querying bookings between {start_date} and {end_date}")
-        # *** CORRECTED: Use func.extract('dow', ...) for PostgreSQL compatibility ***
-        query = Booking.query.options(joinedload(Booking.room)).filter(
-            Booking.booking_date.between(start_date, end_date),
-            func.extract('dow', Booking.booking_date).notin_([0, 6]) # Exclude Sunday (0) and Saturday (6)
-        ).order_by(Booking.booking_date, Booking.room_id, Booking.period)
+            current_app.logger.debug("Adjusted start_date to Monday: %s", start_date_str)
     except ValueError:
         current_app.logger.warning(f"Invalid date format for fetching bookings: {start_date_str} or {end_date_str}")
         return jsonify({"error": "Formato de data inválido para start_date ou end_date. Use YYYY-MM-DD"}), 400
-    except Exception as e:
-        current_app.logger.error(f"Error during booking query setup: {str(e)}", exc_info=True)
-        return jsonify({"error": "Erro ao preparar consulta de agendamentos"}), 500
-    
+
+    paginated = limit_str is not None or cursor is not None
     try:
-        # Execute query and get all results at once
-        bookings = query.all()
-        current_app.logger.debug(f"Found {len(bookings)} bookings for the period")
-        result = []
-        # Access related data *before* the session might close implicitly
-        for booking in bookings:
-            # Check if room was loaded correctly
-            room_name = booking.room.name if booking.room else "Sala Desconhecida"
-            if not booking.room:
-                 current_app.logger.warning(f"Booking ID {booking.id} has no associated room!")
-                 
-            result.append({
-                "id": booking.id, "user_name": booking.user_name, "user_email": booking.user_email,
-                "coordinator_name": booking.coordinator_name, "room_id": booking.room_id,
-                "room_name": room_name, # Use the loaded room name
-                "booking_date": booking.booking_date.isoformat(),
-                "period": booking.period, "created_at": booking.created_at.isoformat() if booking.created_at else None
-            })
-        current_app.logger.debug("Successfully processed booking results")
-        return jsonify(result)
+        limit = min(int(limit_str), BOOKINGS_PAGE_MAX_LIMIT) if limit_str is not None else BOOKINGS_PAGE_MAX_LIMIT
+        if limit < 1:
+            raise ValueError("limit deve ser positivo")
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        current_app.logger.warning(f"Invalid pagination parameters: limit={limit_str}, cursor={cursor}")
+        return jsonify({"error": "Parâmetros de paginação inválidos (limit deve ser um inteiro positivo; use o cursor retornado em X-Next-Cursor)"}), 400
+
+    current_app.logger.debug("Querying bookings between %s and %s", start_date, end_date)
+    query = bookings_listing_query(start_date, end_date, after)
+    rooms = room_registry.get()
+    mimetype = "application/x-ndjson" if response_format == "ndjson" else "application/json"
+    serialize = iter_ndjson if response_format == "ndjson" else iter_json_array
+
+    # Pedidos de uma semana inteira (Seg a Sex/Dom), como os do frontend, usam o cache por semana
+    # e um ETag derivado dos dados de Seg a Sex (igual em todos os workers; a query só roda
+    # quando a versão da semana muda). Como na grade, o intervalo fica em Seg a Sex: o domingo
+    # pertence à semana seguinte para get_week_start e faria os agendamentos dela mudarem o ETag.
+    cached_week_start = None
+    etag = None
+    if not paginated and response_format == "json" and start_date + timedelta(days=4) <= end_date <= start_date + timedelta(days=6):
+        cached_week_start = start_date
+        query = bookings_listing_query(start_date, start_date + timedelta(days=4))
+        store_version, week_tag = schedule_cache.week_tag(start_date, lambda: week_data_tag(start_date, start_date + timedelta(days=4)))
+        data_tag = f"{week_tag}-{rooms.etag}"
+        payload, week_version = schedule_cache.get(cached_week_start, data_tag=data_tag, store_version=store_version)
+        etag = f"bookings-{start_date_str}-{data_tag}"
+        not_modified = not_modified_response(etag)
+        if not_modified:
+            return not_modified
+        if payload is not None:
+            current_app.logger.debug("Schedule cache hit for week %s", start_date_str)
+            return set_etag_headers(Response(payload, mimetype="application/json"), etag)
+
+    try:
+        if cached_week_start:
+            # Uma semana é pequena: serializa de uma vez para guardar no cache
+            payload = "".join(iter_json_array(query.all(), rooms)).encode()
+            schedule_cache.put(cached_week_start, week_version, payload)
+            return set_etag_headers(Response(payload, mimetype=mimetype), etag)
+
+        if paginated:
+            rows = query.limit(limit).all()
+            response = Response("".join(serialize(rows, rooms)), mimetype=mimetype)
+            if len(rows) == limit:
+                next_cursor = encode_cursor(rows[-1])
+                response.headers["X-Next-Cursor"] = next_cursor
+                next_args = request.args.to_dict()
+                next_args["cursor"] = next_cursor
+                response.headers["Link"] = f'<{request.base_url}?{urlencode(next_args)}>; rel="next"'
+            return response
+
+        # Intervalos arbitrários (ex.: auditoria anual): lidos em lotes e enviados em streaming,
+        # sem montar a lista inteira em memória
+        batch_size = current_app.config.get("BOOKINGS_STREAM_BATCH_SIZE", BOOKINGS_STREAM_BATCH_SIZE)
+        return Response(stream_with_context(serialize(query.yield_per(batch_size), rooms, batch_size)), mimetype=mimetype)
     except Exception as e:
-        # Log the specific error, which might be the DetachedInstanceError (f405)
-        current_app.logger.error(f"Error processing booking results (potentially accessing detached instance): {str(e)}", exc_info=True)
+        current_app.logger.error(f"Error fetching or serializing bookings: {str(e)}", exc_info=True)
         return jsonify({"error": "Erro ao buscar ou processar agendamentos"}), 500
 
+# Grade compacta da semana (sala x dia x período), usada pelo frontend no lugar da lista
+# completa de GET /api/bookings. Segue o mesmo cache por semana e ETag da listagem.
+@bookings_bp.route("/schedule/grid", methods=["GET"])
+def get_schedule_grid():
+    week_start_str = request.args.get("week_start")
+    if not week_start_str:
+        return jsonify({"error": "Parâmetro week_start é obrigatório"}), 400
+    try:
+        week_start = get_monday_of_week(datetime.strptime(week_start_str, "%Y-%m-%d").date())
+    except ValueError:
+        current_app.logger.warning(f"Invalid date format for schedule grid: {week_start_str}")
+        return jsonify({"error": "Formato de data inválido para week_start. Use YYYY-MM-DD"}), 400
+
+    try:
+        rooms = room_registry.get()
+        # O ETag das salas entra no da grade: a ordem das linhas depende delas
+        store_version, week_tag = schedule_cache.week_tag(week_start, lambda: week_data_tag(week_start, week_start + timedelta(days=4)))
+        data_tag = f"{week_tag}-{rooms.etag}"
+        payload, week_version = schedule_cache.get(week_start, variant="grid", data_tag=data_tag, store_version=store_version)
+        etag = f"grid-{week_start.isoformat()}-{data_tag}"
+        not_modified = not_modified_response(etag)
+        if not_modified:
+            return not_modified
+        if payload is None:
+            # Lido antes da grade: o stream SSE reenvia tudo depois desse id, nada se perde
+            last_event_id = get_last_event_id()
+            rows = week_grid_rows_query(week_start, week_start + timedelta(days=4)).all()
+            grid = build_week_grid(week_start, list(rooms.room_ids), rooms.room_index, rows)
+            grid["last_event_id"] = last_event_id
+            payload = jsonify(grid).get_data()
+            schedule_cache.put(week_start, week_version, payload, variant="grid")
+        return set_etag_headers(Response(payload, mimetype="application/json"), etag)
+    except Exception as e:
+        current_app.logger.error(f"Error building schedule grid for week {week_start}: {str(e)}", exc_info=True)
+        return jsonify({"error": "Erro ao montar a grade da semana"}), 500
+
+# Alterações da grade em tempo real (Server-Sent Events) para uma semana. O cliente passa
+# since=last_event_id da grade; ao reconectar o navegador envia Last-Event-ID.
+@bookings_bp.route("/schedule/stream", methods=["GET"])
+def stream_schedule_events():
+    if not current_app.config["SCHEDULE_EVENTS_ENABLED"]:
+        return jsonify({"error": "Atualizações em tempo real desativadas"}), 404
+    week_start_str = request.args.get("week_start")
+    if not week_start_str:
+        return jsonify({"error": "Parâmetro week_start é obrigatório"}), 400
+    try:
+        week_start = get_monday_of_week(datetime.strptime(week_start_str, "%Y-%m-%d").date())
+        since_id = int(request.headers.get("Last-Event-ID") or request.args.get("since") or 0)
+    except ValueError:
+        return jsonify({"error": "Parâmetros inválidos: use week_start=YYYY-MM-DD e since numérico"}), 400
+
+    try:
+        # Inscreve antes de ler o histórico: um evento pode chegar duas vezes, mas nunca se perde
+        subscriber = schedule_events.subscribe(week_start)
+    except TooManySubscribers:
+        current_app.logger.warning("Schedule stream rejected: too many subscribers in this worker")
+        response = jsonify({"error": "Muitas conexões em tempo real. Tente novamente em instantes."})
+        response.status_code = 503
+        response.headers["Retry-After"] = "30"
+        return response
+    try:
+        backlog = schedule_events.get_backlog(week_start, since_id)
+    except Exception as e:
+        schedule_events.unsubscribe(week_start, subscriber)
+        current_app.logger.error(f"Error loading schedule events backlog: {str(e)}", exc_info=True)
+        return jsonify({"error": "Erro ao abrir atualizações em tempo real"}), 500
+
+    # Sem stream_with_context: a conexão com o banco volta para o pool antes do streaming
+    response = Response(schedule_events.stream(week_start, subscriber, backlog), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no" # Proxies (nginx) não devem acumular o stream
+    return response
+
 # Adjusted booking status endpoint (Reverted end dates to Friday) with Logging
 @bookings_bp.route("/booking-status", methods=["GET"])
 def get_booking_status():
     current_app.logger.debug("--- Entering get_booking_status --- ")
     try:
-        now_utc = datetime.now(timezone.utc)
-        today_utc = now_utc.date()
-        current_app.logger.debug(f"Current UTC time: {now_utc}, Today UTC: {today_utc}")
-
-        # CORREÇÃO: Garantir que a semana sempre comece na segunda-feira
-        start_of_current_week = get_monday_of_week(today_utc)
-        start_of_next_week = start_of_current_week + timedelta(days=7)
-        end_of_current_week = start_of_current_week + timedelta(days=4) # Friday
-        end_of_next_week = start_of_next_week + timedelta(days=4) # Friday
-        
-        current_app.logger.debug(f"Current week: {start_of_current_week} to {end_of_current_week}")
-        current_app.logger.debug(f"Next week: {start_of_next_week} to {end_of_next_week}")
-
-        cutoff_datetime_current_week = datetime.combine(start_of_current_week + timedelta(days=CUTOFF_WEEKDAY), CUTOFF_TIME)
-        current_app.logger.debug(f"Current week cutoff UTC: {cutoff_datetime_current_week}")
-        
-        thursday_current_week = start_of_current_week + timedelta(days=RELEASE_WEEKDAY)
-        release_datetime_for_next_week = datetime.combine(thursday_current_week, RELEASE_TIME)
-        
-        # Make time objects timezone-aware for comparison
-        time_midnight_utc = time(0, 0, 0, tzinfo=timezone.utc)
-        time_3am_utc = time(3, 0, 0, tzinfo=timezone.utc)
-        # Compare RELEASE_TIME (aware) with aware time objects
-        if RELEASE_TIME < time_midnight_utc or (RELEASE_TIME >= time_midnight_utc and RELEASE_TIME < time_3am_utc):
-             release_datetime_for_next_week += timedelta(days=1)
-        current_app.logger.debug(f"Next week release UTC (adjusted if needed): {release_datetime_for_next_week}")
-             
-        cutoff_datetime_next_week = datetime.combine(start_of_next_week + timedelta(days=CUTOFF_WEEKDAY), CUTOFF_TIME)
-        current_app.logger.debug(f"Next week cutoff UTC: {cutoff_datetime_next_week}")
-
-        current_week_open = now_utc < cutoff_datetime_current_week
-        next_week_open = now_utc >= release_datetime_for_next_week and now_utc < cutoff_datetime_next_week
-        current_app.logger.debug(f"Calculated status: current_week_open={current_week_open}, next_week_open={next_week_open}")
-            
-        response_data = {
-            "current_week_start": start_of_current_week.isoformat(),
-            "current_week_end": end_of_current_week.isoformat(), # Now ends on Friday
-            "current_week_open": current_week_open,
-            "current_week_cutoff": cutoff_datetime_current_week.isoformat(),
-            "next_week_start": start_of_next_week.isoformat(),
-            "next_week_end": end_of_next_week.isoformat(), # Now ends on Friday
-            "next_week_open": next_week_open,
-            "next_week_release": release_datetime_for_next_week.isoformat(), # New release time
-            "server_time_utc": now_utc.isoformat()
-        }
-        
-        # Verificar parâmetro de override para testes
+        group = request.args.get("group")
+        # Verificar parâmetro de override para testes (resposta individual, nunca em cache)
         override = request.args.get('admin_override')
-        if override == 'open_all' and request.args.get('password') == ADMIN_PASSWORD:
-            current_app.logger.info("Admin override: Forçando abertura de ambas as semanas")
-            response_data["current_week_open"] = True
-            response_data["next_week_open"] = True
-        elif override == 'open_current' and request.args.get('password') == ADMIN_PASSWORD:
-            current_app.logger.info("Admin override: Forçando abertura da semana atual")
-            response_data["current_week_open"] = True
-        elif override == 'open_next' and request.args.get('password') == ADMIN_PASSWORD:
-            current_app.logger.info("Admin override: Forçando abertura da próxima semana")
-            response_data["next_week_open"] = True
-        
-        current_app.logger.debug(f"--- Exiting get_booking_status with data: {response_data} --- ")
-        return jsonify(response_data)
+        if override in ('open_all', 'open_current', 'open_next') and request.args.get('password') == ADMIN_PASSWORD:
+            response_data = booking_window.status(group=group)
+            if override == 'open_all':
+                current_app.logger.info("Admin override: Forçando abertura de ambas as semanas")
+                response_data["current_week_open"] = True
+                response_data["next_week_open"] = True
+            elif override == 'open_current':
+                current_app.logger.info("Admin override: Forçando abertura da semana atual")
+                response_data["current_week_open"] = True
+            elif override == 'open_next':
+                current_app.logger.info("Admin override: Forçando abertura da próxima semana")
+                response_data["next_week_open"] = True
+            response = jsonify(response_data)
+            response.headers["Cache-Control"] = "no-store"
+            return response
+
+        # O status só muda em next_transition_at: o JSON fica memorizado até lá e navegadores
+        # e proxies podem guardá-lo pelo mesmo tempo (Cache-Control/Expires)
+        body, etag, valid_until = booking_window.status_payload(group=group)
+        current_app.logger.debug("--- Exiting get_booking_status, valid until %s --- ", valid_until)
+        response = not_modified_response(etag) or Response(body, mimetype="application/json")
+        response.set_etag(etag)
+        max_age = max(0, int((valid_until - datetime.now(timezone.utc)).total_seconds()))
+        response.headers["Cache-Control"] = f"public, max-age={max_age}"
+        response.expires = valid_until
+        return response
         
     except Exception as e:
         current_app.logger.error(f"!!! Error in get_booking_status: {str(e)} !!!", exc_info=True)
@@ -457,7 +565,7 @@ def get_booking_status():
 @bookings_bp.route("/generate-pdf", methods=["GET"])
 def generate_schedule_pdf():
     week_start_date_str = request.args.get("week_start_date")
-    current_app.logger.debug(f"Generating PDF for week starting: {week_start_date_str}")
+    current_app.logger.debug("Generating PDF for week starting: %s", week_start_date_str)
     if not week_start_date_str:
         current_app.logger.warning("Missing week_start_date for PDF generation")
         return jsonify({"error": "Parâmetro week_start_date é obrigatório"}), 400
@@ -469,11 +577,11 @@ def generate_schedule_pdf():
         if week_start_date.weekday() != 0:  # Se não for segunda-feira
             week_start_date = get_monday_of_week(week_start_date)
             week_start_date_str = week_start_date.isoformat()
-            current_app.logger.debug(f"Adjusted PDF start date to Monday: {week_start_date_str}")
+            current_app.logger.debug("Adjusted PDF start date to Monday: %s", week_start_date_str)
              
         week_end_date = week_start_date + timedelta(days=4) # Changed back to 4 for Friday
         week_end_date_str = week_end_date.isoformat()
-        current_app.logger.debug(f"PDF date range: {week_start_date_str} to {week_end_date_str}")
+        current_app.logger.debug("PDF date range: %s to %s", week_start_date_str, week_end_date_str)
     except ValueError:
         current_app.logger.warning(f"Invalid date format for PDF generation: {week_start_date_str}")
         return jsonify({"error": "Formato de data inválido para week_start_date. Use YYYY-MM-DD"}), 400
@@ -482,69 +590,102 @@ def generate_schedule_pdf():
         return jsonify({"error": "Erro ao processar datas para PDF"}), 500
 
     try:
-        # Fetch data for the specified week (Mon-Fri)
-        current_app.logger.debug("Fetching rooms and bookings for PDF")
-        rooms = Room.query.order_by(Room.id).all()
-        # *** CORRECTED: Use func.extract('dow', ...) for PostgreSQL compatibility ***
-        bookings_query = Booking.query.options(joinedload(Booking.room)).filter(
-            Booking.booking_date.between(week_start_date, week_end_date),
-            func.extract('dow', Booking.booking_date).notin_([0, 6]) # Exclude Sunday (0) and Saturday (6)
-        ).order_by(Booking.booking_date, Booking.room_id, Booking.period)
-        bookings = bookings_query.all()
-        current_app.logger.debug(f"Found {len(bookings)} bookings for PDF week")
-        
-        # Prepare data for template
-        schedule_data = defaultdict(lambda: defaultdict(lambda: {"Manhã": None, "Tarde": None}))
-        for booking in bookings:
-            # Check if room was loaded correctly
-            room_name = booking.room.name if booking.room else "Sala Desconhecida"
-            if not booking.room:
-                 current_app.logger.warning(f"Booking ID {booking.id} has no associated room for PDF!")
-            schedule_data[booking.room_id][booking.booking_date.isoformat()][booking.period] = booking.user_name
-            
-        dates_of_week = [(week_start_date + timedelta(days=i)).isoformat() for i in range(5)] # Changed back to 5 days
-        days_locale = ["Segunda", "Terça", "Quarta", "Quinta", "Sexta"] # Reverted to 5 days
-        
-        # Setup Jinja2 environment
-        template_dir = os.path.join(current_app.root_path, current_app.template_folder or "templates")
-        env = Environment(loader=FileSystemLoader(template_dir), autoescape=True)
-        
-        # Add a date formatting filter
-        def format_date_filter(date_str, fmt="%d/%m"):
-            try:
-                return datetime.strptime(date_str, "%Y-%m-%d").strftime(fmt)
-            except:
-                return date_str
-        env.filters["format_date"] = format_date_filter
-        
-        # Render HTML template (Template itself needs update for 5 days)
-        current_app.logger.debug("Rendering PDF HTML template")
-        template = env.get_template("schedule_pdf_template.html") 
-        html_string = template.render(
-            rooms=rooms,
-            dates_of_week=dates_of_week,
-            days_locale=days_locale,
-            schedule_data=schedule_data,
-            week_start_date_formatted=week_start_date.strftime("%d/%m/%Y"),
-            week_end_date_formatted=week_end_date.strftime("%d/%m/%Y")
+        # PDF em cache por (semana, versão da semana); só é gerado com WeasyPrint em cache miss
+        pdf_path, cache_hit = pdf_cache.get_pdf(week_start_date)
+        current_app.logger.debug("PDF for week %s: %s", week_start_date_str, "cache hit" if cache_hit else "rendered")
+        response = send_file(
+            pdf_path,
+            mimetype="application/pdf",
+            as_attachment=True,
+            download_name=f"escala_semana_{week_start_date_str}.pdf"
         )
-        
-        # Generate PDF
-        current_app.logger.debug("Generating PDF bytes using WeasyPrint")
-        pdf_bytes = HTML(string=html_string).write_pdf() # Removed explicit CSS, assuming it's in template or default
-        current_app.logger.debug("PDF generated successfully")
-        
-        # Create response
-        response = make_response(pdf_bytes)
-        response.headers["Content-Type"] = "application/pdf"
-        response.headers["Content-Disposition"] = f"attachment; filename=escala_semana_{week_start_date_str}.pdf"
-        
+        response.headers["X-PDF-Cache"] = "hit" if cache_hit else "miss"
         return response
 
+    except PdfRenderUnavailable as e:
+        current_app.logger.warning(f"PDF render unavailable for week {week_start_date_str}: {str(e)}")
+        return pdf_unavailable_response(e)
     except Exception as e:
         current_app.logger.error(f"Erro ao gerar PDF para semana {week_start_date_str}: {str(e)}", exc_info=True)
         return jsonify({"error": "Falha ao gerar PDF no servidor", "details": str(e)}), 500
 
+# Pool de renderização de PDF cheio ou lento: o cliente deve tentar de novo mais tarde
+def pdf_unavailable_response(error):
+    response = jsonify({"error": "Servidor ocupado gerando outros PDFs. Tente novamente em instantes.", "details": str(error)})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
+# --- Exportação de um intervalo de datas (várias semanas) ---
+# format=pdf: um único PDF com uma página por semana; format=csv: planilha em streaming
+@bookings_bp.route("/export", methods=["GET"])
+def export_schedule():
+    start_date_str = request.args.get("start_date")
+    end_date_str = request.args.get("end_date")
+    export_format = request.args.get("format", "pdf").lower()
+    if not start_date_str or not end_date_str:
+        return jsonify({"error": "Parâmetros start_date e end_date são obrigatórios"}), 400
+    if export_format not in ("pdf", "csv"):
+        return jsonify({"error": "Parâmetro format deve ser pdf ou csv"}), 400
+    try:
+        start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
+        end_date = datetime.strptime(end_date_str, "%Y-%m-%d").date()
+    except ValueError:
+        current_app.logger.warning(f"Invalid date format for export: {start_date_str} or {end_date_str}")
+        return jsonify({"error": "Formato de data inválido para start_date ou end_date. Use YYYY-MM-DD"}), 400
+    if end_date < start_date:
+        return jsonify({"error": "end_date deve ser igual ou posterior a start_date"}), 400
+
+    if export_format == "csv":
+        current_app.logger.info(f"Streaming CSV export from {start_date} to {end_date}")
+        batch_size = current_app.config.get("EXPORT_CSV_BATCH_SIZE", EXPORT_CSV_BATCH_SIZE)
+        response = Response(
+            stream_with_context(iter_bookings_csv(start_date, end_date, batch_size)),
+            mimetype="text/csv"
+        )
+        response.headers["Content-Disposition"] = f"attachment;filename=agendamentos_{start_date.isoformat()}_{end_date.isoformat()}.csv"
+        return response
+
+    week_starts = get_week_starts(get_monday_of_week(start_date), get_monday_of_week(end_date))
+    max_weeks = current_app.config.get("EXPORT_PDF_MAX_WEEKS", EXPORT_PDF_MAX_WEEKS)
+    if len(week_starts) > max_weeks:
+        return jsonify({"error": f"O PDF aceita no máximo {max_weeks} semanas; use format=csv para intervalos maiores"}), 400
+    try:
+        current_app.logger.info(f"Rendering PDF export for {len(week_starts)} weeks starting {week_starts[0]}")
+        pdf_bytes = render_range_pdf(week_starts)
+        return send_file(
+            io.BytesIO(pdf_bytes),
+            mimetype="application/pdf",
+            as_attachment=True,
+            download_name=f"escala_{week_starts[0].isoformat()}_a_{(week_starts[-1] + timedelta(days=4)).isoformat()}.pdf"
+        )
+    except PdfRenderUnavailable as e:
+        current_app.logger.warning(f"PDF render unavailable for export starting {week_starts[0]}: {str(e)}")
+        return pdf_unavailable_response(e)
+    except Exception as e:
+        current_app.logger.error(f"Erro ao gerar PDF do intervalo {start_date} a {end_date}: {str(e)}", exc_info=True)
+        return jsonify({"error": "Falha ao gerar PDF no servidor", "details": str(e)}), 500
+
+# Estatísticas do cache de PDF deste worker (hits, misses, pré-renderizações)
+@bookings_bp.route("/admin/pdf-cache-stats", methods=["GET"])
+def get_pdf_cache_stats():
+    password = request.args.get("password")
+    correct_password = current_app.config.get("ADMIN_PASSWORD", ADMIN_PASSWORD) # Get from env or use default
+    if password != correct_password:
+        current_app.logger.warning("Unauthorized attempt to read PDF cache stats")
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(pdf_cache.stats())
+
+# Estatísticas do controle de admissão deste worker (admitidos, em fila, recusados)
+@bookings_bp.route("/admin/booking-admission-stats", methods=["GET"])
+def get_booking_admission_stats():
+    password = request.args.get("password")
+    correct_password = current_app.config.get("ADMIN_PASSWORD", ADMIN_PASSWORD) # Get from env or use default
+    if password != correct_password:
+        current_app.logger.warning("Unauthorized attempt to read booking admission stats")
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(booking_admission.stats())
+
 # --- Admin Route to Download Database --- 
 @bookings_bp.route("/admin/download-database", methods=["GET"])
 def download_database():
@@ -568,8 +709,14 @@ def download_database():
         
     try:
         current_app.logger.info(f"Admin download of database file: {db_path}")
+        # Cópia pela API de backup do SQLite (inclui os commits ainda no arquivo -wal)
+        fd, backup_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        backup_sqlite_database(db_path, backup_path)
+        backup_file = open(backup_path, "rb")
+        os.unlink(backup_path)
         return Response(
-            open(db_path, "rb"),
+            backup_file,
             mimetype="application/vnd.sqlite3",
             headers={"Content-Disposition": "attachment;filename=lab_scheduler.db"}
         )
@@ -590,6 +737,7 @@ def clear_bookings():
     end_date_str = data.get("end_date")
     room_id = data.get("room_id")
     period = data.get("period")
+    dry_run = data.get("dry_run")
     
     # Verificar senha
     correct_password = current_app.config.get("ADMIN_PASSWORD", ADMIN_PASSWORD) # Get from env or use default
@@ -597,71 +745,53 @@ def clear_bookings():
         current_app.logger.warning("Unauthorized attempt to clear bookings")
         return jsonify({"error": "Senha administrativa incorreta"}), 401
     
+    start_date = end_date = None
+    if start_date_str:
+        try:
+            start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
+            end_date = datetime.strptime(end_date_str, "%Y-%m-%d").date() if end_date_str else None
+        except ValueError:
+            current_app.logger.warning(f"Invalid date format for clear bookings: {start_date_str} or {end_date_str}")
+            return jsonify({"error": "Formato de data inválido. Use YYYY-MM-DD"}), 400
+    if period not in ["Manhã", "Tarde"]:
+        period = None
+    current_app.logger.info(f"Clearing bookings: dates {start_date} to {end_date}, room_id {room_id}, period {period}, dry_run {bool(dry_run)}")
+    conditions = clear_bookings_conditions(start_date, end_date, room_id, period)
+
     try:
-        # Construir a query base
-        query = Booking.query
-        
-        # Aplicar filtros se fornecidos
-        if start_date_str and end_date_str:
-            try:
-                start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
-                end_date = datetime.strptime(end_date_str, "%Y-%m-%d").date()
-                query = query.filter(Booking.booking_date.between(start_date, end_date))
-                current_app.logger.info(f"Filtering bookings to clear by date range: {start_date} to {end_date}")
-            except ValueError:
-                current_app.logger.warning(f"Invalid date format for clear bookings: {start_date_str} or {end_date_str}")
-                return jsonify({"error": "Formato de data inválido. Use YYYY-MM-DD"}), 400
-        elif start_date_str:
-            try:
-                single_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
-                query = query.filter(Booking.booking_date == single_date)
-                current_app.logger.info(f"Filtering bookings to clear by single date: {single_date}")
-            except ValueError:
-                current_app.logger.warning(f"Invalid date format for clear bookings: {start_date_str}")
-                return jsonify({"error": "Formato de data inválido. Use YYYY-MM-DD"}), 400
-                
-        if room_id:
-            query = query.filter(Booking.room_id == room_id)
-            current_app.logger.info(f"Filtering bookings to clear by room_id: {room_id}")
-            
-        if period and period in ["Manhã", "Tarde"]:
-            query = query.filter(Booking.period == period)
-            current_app.logger.info(f"Filtering bookings to clear by period: {period}")
-            
-        # Contar e obter os agendamentos a serem excluídos
-        bookings_to_delete = query.all()
-        count = len(bookings_to_delete)
-        
-        if count == 0:
-            current_app.logger.info("No bookings found matching criteria for deletion")
-            return jsonify({"message": "Nenhum agendamento encontrado com os critérios especificados", "count": 0}), 200
-            
-        # Registrar detalhes dos agendamentos a serem excluídos (para log)
-        booking_details = []
-        for booking in bookings_to_delete:
-            booking_details.append({
-                "id": booking.id,
-                "user_name": booking.user_name,
-                "room_id": booking.room_id,
-                "booking_date": booking.booking_date.isoformat(),
-                "period": booking.period
-            })
-            
-        # Excluir os agendamentos
-        for booking in bookings_to_delete:
-            db.session.delete(booking)
-            
-        db.session.commit()
-        current_app.logger.info(f"Successfully deleted {count} bookings")
-        
-        return jsonify({
-            "message": f"{count} agendamento(s) removido(s) com sucesso",
-            "count": count,
-            "details": booking_details
-        })
-        
+        count, first_date, last_date = count_bookings(conditions)
     except Exception as e:
         db.session.rollback()
-        current_app.logger.error(f"Error clearing bookings: {str(e)}", exc_info=True)
+        current_app.logger.error(f"Error counting bookings to clear: {str(e)}", exc_info=True)
         return jsonify({"error": f"Erro ao limpar agendamentos: {str(e)}"}), 500
+    if count == 0:
+        current_app.logger.info("No bookings found matching criteria for deletion")
+        return jsonify({"message": "Nenhum agendamento encontrado com os critérios especificados", "count": 0}), 200
+    summary = {
+        "count": count,
+        "first_date": first_date.isoformat() if first_date else None,
+        "last_date": last_date.isoformat() if last_date else None
+    }
+    if dry_run:
+        return jsonify(dict(summary, dry_run=True, message=f"{count} agendamento(s) seriam removido(s)"))
+
+    # Remoção em lotes; a resposta é NDJSON: uma linha de progresso por lote e o resumo no fim
+    archive_dir = current_app.config.get("BOOKINGS_ARCHIVE_DIR", BOOKINGS_ARCHIVE_DIR)
+    chunk_size = current_app.config.get("CLEAR_BOOKINGS_CHUNK_SIZE", CLEAR_BOOKINGS_CHUNK_SIZE)
+    def generate():
+        progress = {"deleted": 0, "archive": None}
+        try:
+            for progress in iter_clear_bookings(conditions, archive_dir, chunk_size):
+                yield json.dumps(progress) + "\n"
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error clearing bookings after {progress['deleted']} deleted: {str(e)}", exc_info=True)
+            yield json.dumps({"error": f"Erro ao limpar agendamentos: {str(e)}", "count": progress["deleted"], "archive": progress["archive"]}) + "\n"
+            return
+        current_app.logger.info(f"Successfully deleted {progress['deleted']} bookings (archive {progress['archive']})")
+        yield json.dumps(dict(
+            summary, count=progress["deleted"], archive=progress["archive"],
+            message=f"{progress['deleted']} agendamento(s) removido(s) com sucesso"
+        )) + "\n"
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
 # --- Fim da Nova Rota ---
@@ -0,0 +1,24 @@
+# /home/ubuntu/lab_scheduler/src/routes/metrics_routes.py
+
+from flask import Blueprint, request, jsonify, current_app, Response
+from src.instrumentation import request_metrics
+from src.routes.booking_routes import ADMIN_PASSWORD
+
+metrics_bp = Blueprint("metrics_bp", __name__)
+
+# Métricas deste worker no formato de texto do Prometheus (ver src/instrumentation.py).
+# A senha de admin vem em ?password= ou no header "Authorization: Bearer <senha>"
+# (bearer_token na configuração de scrape do Prometheus).
+@metrics_bp.route("/metrics", methods=["GET"])
+def get_metrics():
+    password = request.args.get("password")
+    authorization = request.headers.get("Authorization", "")
+    if authorization.startswith("Bearer "):
+        password = authorization[len("Bearer "):]
+    correct_password = current_app.config.get("ADMIN_PASSWORD", ADMIN_PASSWORD) # Get from env or use default
+    if password != correct_password:
+        current_app.logger.warning("Unauthorized attempt to read metrics")
+        return jsonify({"error": "Unauthorized"}), 401
+    if not current_app.config["METRICS_ENABLED"]:
+        return jsonify({"error": "Metrics disabled"}), 404
+    return Response(request_metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,190 @@
+# /home/ubuntu/lab_scheduler/src/services/booking_admission.py
+
+# Controle de admissão de POST /api/bookings para o pico da abertura semanal.
+#
+# Em cada worker do gunicorn:
+#   - no máximo BOOKING_ADMISSION_MAX_IN_FLIGHT agendamentos são processados ao mesmo
+#     tempo (mais do que isso só aumenta a disputa pelo lock de escrita do banco);
+#   - os demais esperam numa fila por ordem de chegada, com até BOOKING_ADMISSION_QUEUE_SIZE
+#     lugares e espera máxima de BOOKING_ADMISSION_MAX_WAIT_SECONDS;
+#   - se a fila está cheia, ou a espera estimada (fila x tempo médio de atendimento)
+#     passa do limite, o pedido é recusado na hora (AdmissionRejected -> 503 + Retry-After).
+# Quem é recusado recebe um queue_token assinado com o horário da primeira chegada. Ao
+# tentar de novo com o token o pedido entra na fila com a prioridade original: com a fila
+# cheia, ele toma o lugar do pedido mais recente da fila (que é recusado com o próprio
+# token). Assim quem chegou depois nunca passa na frente de quem chegou antes.
+#
+# Além disso cada usuário pode fazer BOOKING_RATE_LIMIT_PER_USER agendamentos por
+# BOOKING_RATE_LIMIT_WINDOW_SECONDS (por worker: o limite efetivo é workers x limite).
+# A chave é o nome normalizado (booking_users.normalize_user_key), não o e-mail: vários
+# pesquisadores usam o mesmo e-mail do laboratório. Só agendamentos criados contam; quem
+# perde slots para outros (409) ou erra o pedido pode tentar de novo na hora. O lugar no
+# limite é reservado na verificação (check_rate_limit), sob o mesmo lock, e devolvido com
+# release_booking se o agendamento não for criado: pedidos simultâneos do mesmo usuário não
+# passam todos pela verificação.
+
+import heapq
+import itertools
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason, retry_after, position=None, arrived_at=None):
+        super().__init__(reason)
+        self.reason = reason # overloaded, timeout, rate_limited
+        self.retry_after = retry_after
+        self.position = position
+        self.arrived_at = arrived_at
+
+class BookingAdmission:
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._waiting = [] # heap de (chegada, sequência)
+        self._waiters = {} # ticket -> Condition; só o primeiro da fila é acordado
+        self._evicted = set() # tickets retirados da fila por pedidos mais antigos
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._service_seconds = 0.2 # média móvel do tempo de atendimento
+        self._user_bookings = defaultdict(deque)
+        self._user_lock = threading.Lock()
+        self._stats = {"admitted": 0, "queued": 0, "rejected_overloaded": 0, "rejected_timeout": 0, "rate_limited": 0}
+        self._serializer = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("BOOKING_ADMISSION_ENABLED", True)
+        app.config.setdefault("BOOKING_ADMISSION_MAX_IN_FLIGHT", 4)
+        app.config.setdefault("BOOKING_ADMISSION_QUEUE_SIZE", 32)
+        app.config.setdefault("BOOKING_ADMISSION_MAX_WAIT_SECONDS", 10)
+        app.config.setdefault("BOOKING_ADMISSION_TOKEN_MAX_AGE_SECONDS", 300)
+        app.config.setdefault("BOOKING_RATE_LIMIT_PER_USER", 5)
+        app.config.setdefault("BOOKING_RATE_LIMIT_WINDOW_SECONDS", 60)
+        self.app = app
+        # Os limites por usuário valem para esta aplicação (uma nova create_app começa do zero)
+        with self._user_lock:
+            self._user_bookings = defaultdict(deque)
+        self._serializer = URLSafeTimedSerializer(app.config["SECRET_KEY"], salt="booking-admission")
+        app.extensions["booking_admission"] = self
+
+    def issue_token(self, arrived_at):
+        return self._serializer.dumps({"arrived_at": arrived_at})
+
+    # Horário da primeira chegada guardado no token, ou None se ausente/inválido/expirado
+    def read_token(self, token):
+        if not token:
+            return None
+        try:
+            data = self._serializer.loads(token, max_age=self.app.config["BOOKING_ADMISSION_TOKEN_MAX_AGE_SECONDS"])
+            return float(data["arrived_at"])
+        except (BadSignature, KeyError, TypeError, ValueError):
+            return None
+
+    # Verifica o limite e já reserva o lugar; devolve a reserva (para release_booking)
+    def check_rate_limit(self, user_key):
+        window = self.app.config["BOOKING_RATE_LIMIT_WINDOW_SECONDS"]
+        now = time.monotonic()
+        with self._user_lock:
+            bookings = self._user_bookings[user_key]
+            while bookings and now - bookings[0] > window:
+                bookings.popleft()
+            if len(bookings) >= self.app.config["BOOKING_RATE_LIMIT_PER_USER"]:
+                self._stats["rate_limited"] += 1
+                raise AdmissionRejected("rate_limited", window - (now - bookings[0]))
+            bookings.append(now)
+            # Sem isso o dicionário cresceria com todo usuário já visto
+            if len(self._user_bookings) > 10000:
+                self._user_bookings = defaultdict(deque, {k: v for k, v in self._user_bookings.items() if v})
+            return now
+
+    # Chamado quando o agendamento não foi criado (erro, 409, pedido recusado na fila)
+    def release_booking(self, user_key, reservation):
+        with self._user_lock:
+            bookings = self._user_bookings.get(user_key)
+            if bookings and reservation in bookings:
+                bookings.remove(reservation)
+
+    # Context manager: bloqueia até o pedido ser admitido e libera a vaga na saída.
+    # Retorna quanto tempo o pedido esperou na fila (segundos).
+    @contextmanager
+    def admit(self, arrived_at):
+        max_in_flight = self.app.config["BOOKING_ADMISSION_MAX_IN_FLIGHT"]
+        max_wait = self.app.config["BOOKING_ADMISSION_MAX_WAIT_SECONDS"]
+        started = time.monotonic()
+        with self._lock:
+            if self._in_flight < max_in_flight and not self._waiting:
+                self._in_flight += 1
+            else:
+                ticket = (arrived_at, next(self._sequence))
+                position = sum(1 for waiting in self._waiting if waiting < ticket) + 1
+                estimated_wait = position * self._service_seconds / max_in_flight
+                if len(self._waiting) >= self.app.config["BOOKING_ADMISSION_QUEUE_SIZE"]:
+                    newest = max(self._waiting, default=None)
+                    if newest is None or newest < ticket:
+                        self._stats["rejected_overloaded"] += 1
+                        raise AdmissionRejected("overloaded", self._retry_after(position), position, arrived_at)
+                    self._waiting.remove(newest)
+                    heapq.heapify(self._waiting)
+                    self._evicted.add(newest)
+                    self._waiters[newest].notify()
+                elif estimated_wait > max_wait:
+                    self._stats["rejected_overloaded"] += 1
+                    raise AdmissionRejected("overloaded", self._retry_after(position), position, arrived_at)
+                heapq.heappush(self._waiting, ticket)
+                condition = self._waiters[ticket] = threading.Condition(self._lock)
+                self._stats["queued"] += 1
+                deadline = started + max_wait
+                try:
+                    while True:
+                        if ticket in self._evicted:
+                            self._evicted.discard(ticket)
+                            self._stats["rejected_overloaded"] += 1
+                            position = len(self._waiting) + 1
+                            raise AdmissionRejected("overloaded", self._retry_after(position), position, arrived_at)
+                        if self._waiting[0] == ticket and self._in_flight < max_in_flight:
+                            break
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            position = sorted(self._waiting).index(ticket) + 1
+                            self._waiting.remove(ticket)
+                            heapq.heapify(self._waiting)
+                            self._wake_next(max_in_flight)
+                            self._stats["rejected_timeout"] += 1
+                            raise AdmissionRejected("timeout", self._retry_after(position), position, arrived_at)
+                        condition.wait(remaining)
+                finally:
+                    del self._waiters[ticket]
+                heapq.heappop(self._waiting)
+                self._in_flight += 1
+                # O próximo da fila pode entrar se ainda houver vaga
+                self._wake_next(max_in_flight)
+            self._stats["admitted"] += 1
+        admitted_at = time.monotonic()
+        try:
+            yield admitted_at - started
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._service_seconds = 0.8 * self._service_seconds + 0.2 * (time.monotonic() - admitted_at)
+                self._wake_next(max_in_flight)
+
+    # Chamado com self._lock: acorda só o primeiro da fila, se ele já pode entrar
+    def _wake_next(self, max_in_flight):
+        if self._waiting and self._in_flight < max_in_flight:
+            self._waiters[self._waiting[0]].notify()
+
+    # Tempo estimado até a vaga, em segundos (fração: o header Retry-After arredonda para cima)
+    def _retry_after(self, position):
+        max_in_flight = self.app.config["BOOKING_ADMISSION_MAX_IN_FLIGHT"]
+        return max(0.05, position * self._service_seconds / max_in_flight)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, in_flight=self._in_flight, waiting=len(self._waiting),
+                        avg_service_ms=round(self._service_seconds * 1000, 1))
+
+booking_admission = BookingAdmission()
@@ -0,0 +1,144 @@
+# /home/ubuntu/lab_scheduler/src/services/booking_cleanup.py
+
+# Limpeza administrativa de agendamentos (POST /api/admin/clear-bookings) sem carregar
+# entidades no ORM.
+#
+# Cada lote é um único DELETE ... WHERE id IN (SELECT id ... LIMIT n) RETURNING com as
+# colunas necessárias para o arquivo de auditoria e para os eventos da grade, em sua
+# própria transação. Bancos sem RETURNING (SQLite < 3.35) leem o lote antes e apagam por id.
+#
+# As linhas removidas vão para um CSV compactado (gzip) em BOOKINGS_ARCHIVE_DIR. O lote é
+# gravado no arquivo antes do commit: se o commit falhar, o arquivo pode ter linhas que
+# continuam no banco, mas nunca falta uma linha apagada.
+#
+# O mesmo caminho remove os agendamentos duplicados de bancos antigos (flask --app src.main
+# dedupe-bookings), que impedem a migração 0001 (índice único uq_bookings_slot): em cada slot
+# fica o agendamento mais antigo (menor id) e os demais vão para o arquivo.
+
+import csv
+import gzip
+import os
+from datetime import datetime, timezone
+from sqlalchemy import delete, func, select
+from src.extensions import db, schedule_cache
+from src.engine_profiles import begin_write_transaction
+from src.models.entities import Booking, User
+from src.services.pdf_cache import pdf_cache
+from src.services.room_registry import room_registry
+from src.services.schedule_events import schedule_events, record_slot_events
+
+CLEAR_BOOKINGS_CHUNK_SIZE = 1000
+# Padrão: lab_scheduler/archives (ao lado do lab_scheduler.db); em produção, um diretório persistente
+BOOKINGS_ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "archives")
+
+ARCHIVE_COLUMNS = (
+    Booking.id, Booking.user_id, Booking.user_name, Booking.user_email, Booking.coordinator_name,
+    Booking.room_id, Booking.booking_date, Booking.period, Booking.created_at
+)
+ARCHIVE_HEADER = [column.key for column in ARCHIVE_COLUMNS] + ["room_name"]
+
+# Linha do arquivo de auditoria: nome e e-mail vêm de users (agendamentos antigos sem user_id
+# mantêm os das próprias colunas)
+def archive_values(row, users, rooms):
+    values = row._asdict()
+    if row.user_id in users:
+        values["user_name"], values["user_email"] = users[row.user_id]
+    return [values[column.key] for column in ARCHIVE_COLUMNS] + [rooms.name_of(row.room_id)]
+
+def chunk_users(rows):
+    user_ids = {row.user_id for row in rows if row.user_id is not None}
+    if not user_ids:
+        return {}
+    return {user_id: (name, email) for user_id, name, email in db.session.query(User.id, User.name, User.email).filter(User.id.in_(user_ids))}
+
+# Filtros do pedido como condições sobre bookings; todos opcionais, como antes
+def clear_bookings_conditions(start_date=None, end_date=None, room_id=None, period=None):
+    conditions = []
+    if start_date and end_date:
+        conditions.append(Booking.booking_date.between(start_date, end_date))
+    elif start_date:
+        conditions.append(Booking.booking_date == start_date)
+    if room_id:
+        conditions.append(Booking.room_id == room_id)
+    if period:
+        conditions.append(Booking.period == period)
+    return conditions
+
+# Dry-run e resumo: (quantidade, primeira data, última data) em uma única query
+def count_bookings_query(conditions):
+    return select(func.count(Booking.id), func.min(Booking.booking_date), func.max(Booking.booking_date)).where(*conditions)
+
+def count_bookings(conditions):
+    return db.session.execute(count_bookings_query(conditions)).one()
+
+# Slots com mais de um agendamento: (room_id, booking_date, period, quantidade, id mantido)
+def find_duplicate_slots():
+    return db.session.execute(
+        select(Booking.room_id, Booking.booking_date, Booking.period, func.count(Booking.id), func.min(Booking.id))
+        .group_by(Booking.room_id, Booking.booking_date, Booking.period)
+        .having(func.count(Booking.id) > 1)
+        .order_by(Booking.booking_date, Booking.room_id, Booking.period)
+    ).all()
+
+# Todos os agendamentos menos o mais antigo de cada slot (para iter_clear_bookings)
+def duplicate_bookings_conditions():
+    kept_ids = select(func.min(Booking.id)).group_by(Booking.room_id, Booking.booking_date, Booking.period)
+    return [Booking.id.not_in(kept_ids.scalar_subquery())]
+
+def archive_path(archive_dir, now=None, prefix="bookings_cleared"):
+    now = now or datetime.now(timezone.utc)
+    return os.path.join(archive_dir, f"{prefix}_{now.strftime('%Y%m%d_%H%M%S_%f')}.csv.gz")
+
+# Ids do próximo lote. Sem ORDER BY: ordenar por id levaria o banco a percorrer a chave
+# primária em vez do índice de datas (ver explain-queries)
+def chunk_ids_query(conditions, chunk_size):
+    return select(Booking.id).where(*conditions).limit(chunk_size)
+
+def delete_chunk(conditions, chunk_size):
+    begin_write_transaction(db.session)
+    chunk_ids = chunk_ids_query(conditions, chunk_size)
+    if db.session.get_bind().dialect.delete_returning:
+        return db.session.execute(
+            delete(Booking).where(Booking.id.in_(chunk_ids.scalar_subquery())).returning(*ARCHIVE_COLUMNS),
+            execution_options={"synchronize_session": False}
+        ).all()
+    rows = db.session.execute(select(*ARCHIVE_COLUMNS).where(Booking.id.in_(chunk_ids.scalar_subquery()))).all()
+    if rows:
+        db.session.execute(
+            delete(Booking).where(Booking.id.in_([row.id for row in rows])),
+            execution_options={"synchronize_session": False}
+        )
+    return rows
+
+# Apaga em lotes e produz um dicionário de progresso por lote: {"deleted", "archive"}.
+# Caches, PDFs e a grade em tempo real são avisados a cada lote já confirmado.
+# free_slots=False (duplicados): o slot continua ocupado pelo agendamento mantido, então não há
+# evento "freed" para a grade.
+def iter_clear_bookings(conditions, archive_dir, chunk_size=CLEAR_BOOKINGS_CHUNK_SIZE, archive_prefix="bookings_cleared", free_slots=True):
+    os.makedirs(archive_dir, exist_ok=True)
+    path = archive_path(archive_dir, prefix=archive_prefix)
+    rooms = room_registry.get()
+    deleted = 0
+    with gzip.open(path, "wt", encoding="utf-8", newline="") as archive:
+        writer = csv.writer(archive)
+        writer.writerow(ARCHIVE_HEADER)
+        while True:
+            rows = delete_chunk(conditions, chunk_size)
+            if not rows:
+                db.session.rollback()
+                break
+            users = chunk_users(rows)
+            for row in rows:
+                writer.writerow(archive_values(row, users, rooms))
+            archive.flush()
+            if free_slots:
+                record_slot_events("freed", rows)
+            db.session.commit()
+            booking_dates = {row.booking_date for row in rows}
+            schedule_cache.invalidate(booking_dates)
+            pdf_cache.invalidate(booking_dates)
+            schedule_events.wake()
+            deleted += len(rows)
+            yield {"deleted": deleted, "archive": os.path.basename(path)}
+            if len(rows) < chunk_size:
+                break
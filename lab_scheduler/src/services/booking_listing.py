@@ -0,0 +1,67 @@
+# /home/ubuntu/lab_scheduler/src/services/booking_listing.py
+
+# Serialização da listagem de GET /api/bookings a partir das tuplas de
+# bookings_listing_query, sem montar a lista inteira em memória:
+#   - iter_json_array / iter_ndjson geram a resposta em blocos de batch_size itens;
+#   - encode_cursor / decode_cursor fazem o cursor opaco da paginação por keyset.
+# rooms é o snapshot de room_registry (nome da sala pelo room_id).
+
+import base64
+import json
+from datetime import date
+
+BOOKINGS_STREAM_BATCH_SIZE = 500
+BOOKINGS_PAGE_MAX_LIMIT = 1000
+
+# Mesmo formato que get_bookings sempre retornou
+def booking_row_to_dict(row, rooms):
+    return {
+        "id": row.id, "user_name": row.user_name, "user_email": row.user_email,
+        "coordinator_name": row.coordinator_name, "room_id": row.room_id,
+        "room_name": rooms.name_of(row.room_id),
+        "booking_date": row.booking_date.isoformat(),
+        "period": row.period, "created_at": row.created_at.isoformat() if row.created_at else None
+    }
+
+# Mesmas opções do jsonify (chaves ordenadas, sem espaços)
+def dump_booking(row, rooms):
+    return json.dumps(booking_row_to_dict(row, rooms), sort_keys=True, separators=(",", ":"))
+
+# is_booking_allowed já bloqueia fins de semana na escrita; igual a exclude_weekend_bookings
+def skip_weekends(rows):
+    return (row for row in rows if row.booking_date.weekday() < 5)
+
+def iter_json_array(rows, rooms, batch_size=BOOKINGS_STREAM_BATCH_SIZE):
+    chunk = ["["]
+    separator = ""
+    for row in skip_weekends(rows):
+        chunk.append(separator + dump_booking(row, rooms))
+        separator = ","
+        if len(chunk) >= batch_size:
+            yield "".join(chunk)
+            chunk = []
+    chunk.append("]\n")
+    yield "".join(chunk)
+
+def iter_ndjson(rows, rooms, batch_size=BOOKINGS_STREAM_BATCH_SIZE):
+    chunk = []
+    for row in skip_weekends(rows):
+        chunk.append(dump_booking(row, rooms) + "\n")
+        if len(chunk) >= batch_size:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+def encode_cursor(row):
+    key = [row.booking_date.isoformat(), row.room_id, row.period, row.id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+# Levanta ValueError para cursores inválidos
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        booking_date, room_id, period, booking_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return date.fromisoformat(booking_date), int(room_id), str(period), int(booking_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
@@ -0,0 +1,97 @@
+# /home/ubuntu/lab_scheduler/src/services/booking_queries.py
+
+# Queries de agendamentos usadas pelas rotas, pelo cache de PDF e pela verificação
+# de EXPLAIN (src/migrations/explain.py), que confere se elas usam os índices.
+# Nomes e grupos de salas vêm de room_registry, sem join com a tabela rooms.
+# Nome e e-mail de quem agendou vêm de users (join pela chave primária); bookings.user_name e
+# user_email só valem para agendamentos antigos ainda sem user_id.
+
+from sqlalchemy import tuple_, func
+from sqlalchemy.orm import joinedload
+from src.extensions import db
+from src.models.entities import Booking, ScheduleEvent, User
+from src.services.schedule_cache import get_week_start
+
+booking_user_name = func.coalesce(User.name, Booking.user_name).label("user_name")
+booking_user_email = func.coalesce(User.email, Booking.user_email).label("user_email")
+
+# Impressão digital dos agendamentos de um intervalo, igual em todos os workers: quantidade,
+# soma e maior id (índice de booking_date) e o último evento das semanas em schedule_events
+# (índice week_start, id). O evento cobre uma remoção seguida de inserção que repetisse
+# quantidade e ids (o SQLite reaproveita o maior id).
+def week_version_query(start_date, end_date):
+    last_event_id = db.session.query(func.max(ScheduleEvent.id)).filter(
+        ScheduleEvent.week_start.between(get_week_start(start_date), get_week_start(end_date))
+    ).scalar_subquery()
+    return db.session.query(
+        func.count(Booking.id), func.coalesce(func.sum(Booking.id), 0), func.coalesce(func.max(Booking.id), 0),
+        func.coalesce(last_event_id, 0)
+    ).filter(Booking.booking_date.between(start_date, end_date))
+
+def week_data_tag(start_date, end_date):
+    return "-".join(str(value) for value in week_version_query(start_date, end_date).one())
+
+def slot_conflicts_query(room_ids, booking_dates, periods):
+    return db.session.query(Booking.room_id, Booking.booking_date, Booking.period).filter(
+        Booking.room_id.in_(room_ids),
+        Booking.booking_date.in_(booking_dates),
+        Booking.period.in_(periods)
+    )
+
+# Agendamentos do usuário nas datas do pedido, para as regras de cota (booking_quotas).
+# Sem filtro de sala: são poucas linhas por usuário e data, e filtrar room_id levava o
+# planner do SQLite a trocar ix_bookings_user_id_date_period pelo índice de slots.
+def quota_bookings_query(user_id, booking_dates):
+    return db.session.query(Booking.booking_date, Booking.period, Booking.room_id).filter(
+        Booking.user_id == user_id,
+        Booking.booking_date.in_(booking_dates)
+    ).order_by(Booking.id)
+
+# Agendamentos de um intervalo de datas como entidades (benchmarks/weekday_filter_benchmark.py)
+# Filtra apenas pelo intervalo de booking_date para o banco usar o índice (range scan);
+# func.extract('dow', ...) na coluna impedia o uso do índice. Fins de semana são
+# removidos em Python por exclude_weekend_bookings.
+def bookings_between_query(start_date, end_date):
+    return Booking.query.options(joinedload(Booking.room)).filter(
+        Booking.booking_date.between(start_date, end_date)
+    ).order_by(Booking.booking_date, Booking.room_id, Booking.period)
+
+# Listagem de GET /api/bookings como tuplas de colunas (sem entidades nem joinedload), em
+# ordem estável para paginação por keyset: after = (booking_date, room_id, period, id)
+# do último item da página anterior.
+def bookings_listing_query(start_date, end_date, after=None):
+    query = db.session.query(
+        Booking.id, booking_user_name, booking_user_email, Booking.coordinator_name,
+        Booking.room_id, Booking.booking_date, Booking.period, Booking.created_at
+    ).outerjoin(User, Booking.user_id == User.id).filter(
+        Booking.booking_date.between(start_date, end_date)
+    )
+    if after is not None:
+        # A condição extra em booking_date deixa o índice começar a busca na data do cursor
+        query = query.filter(
+            Booking.booking_date >= after[0],
+            tuple_(Booking.booking_date, Booking.room_id, Booking.period, Booking.id) > tuple_(*after)
+        )
+    return query.order_by(Booking.booking_date, Booking.room_id, Booking.period, Booking.id)
+
+# Grade da semana (/api/schedule/grid) e PDF semanal: só o necessário para preencher as células
+def week_grid_rows_query(start_date, end_date):
+    return db.session.query(Booking.room_id, Booking.booking_date, Booking.period, booking_user_name).outerjoin(
+        User, Booking.user_id == User.id
+    ).filter(
+        Booking.booking_date.between(start_date, end_date)
+    )
+
+# Exportação de intervalos (CSV e PDF de várias semanas): só as colunas necessárias, como
+# tuplas, para poder ler em lotes com yield_per sem montar entidades nem carregar as salas
+def booking_export_rows_query(start_date, end_date):
+    return db.session.query(
+        Booking.booking_date, Booking.period, Booking.room_id,
+        booking_user_name, booking_user_email, Booking.coordinator_name
+    ).outerjoin(User, Booking.user_id == User.id).filter(
+        Booking.booking_date.between(start_date, end_date)
+    ).order_by(Booking.booking_date, Booking.room_id, Booking.period)
+
+# is_booking_allowed já bloqueia fins de semana na escrita; isto só descarta registros antigos
+def exclude_weekend_bookings(bookings):
+    return [booking for booking in bookings if booking.booking_date.weekday() < 5]
@@ -0,0 +1,121 @@
+# /home/ubuntu/lab_scheduler/src/services/booking_quotas.py
+
+# Cotas de agendamento por usuário, declaradas como regras:
+#   {"group": "Geral", "max": 1, "per": "period"}  -> no máximo 1 sala Geral por período
+#   {"group": null, "max": 3, "per": "day"}        -> no máximo 3 agendamentos por dia (qualquer sala)
+# group é um RoomGroup (null = todas as salas) e per é "period", "day" ou "week".
+#
+# check_quotas faz uma única query por pedido, qualquer que seja o número de regras e de
+# slots: os agendamentos do usuário nas datas envolvidas (índice ix_bookings_user_id_date_period).
+# A pertinência a grupos vem do room_registry, e cada regra filtra e soma em memória os já
+# existentes e os do pedido em cada período/dia/semana.
+
+from collections import namedtuple, defaultdict
+from datetime import timedelta
+from src.services.booking_queries import quota_bookings_query
+
+# Limite de agendamentos (sala e período) por usuário e por dia, em qualquer sala. Pedidos
+# acima disso recebem 409 com a mensagem de quota_error_message.
+MAX_BOOKINGS_PER_DAY = 3
+
+DEFAULT_QUOTA_RULES = [
+    {"group": "Geral", "max": 1, "per": "period"},
+    {"group": None, "max": MAX_BOOKINGS_PER_DAY, "per": "day"},
+]
+
+QUOTA_SCOPES = ("period", "day", "week")
+
+QuotaRule = namedtuple("QuotaRule", ["group", "max_rooms", "per"])
+
+def parse_quota_rules(rules):
+    parsed = []
+    for rule in rules:
+        if rule.get("per") not in QUOTA_SCOPES:
+            raise ValueError(f"Regra de cota inválida (per deve ser period, day ou week): {rule}")
+        parsed.append(QuotaRule(rule.get("group"), int(rule["max"]), rule["per"]))
+    return parsed
+
+def scope_key(per, booking_date, period):
+    if per == "period":
+        return (booking_date, period)
+    if per == "day":
+        return booking_date
+    return booking_date - timedelta(days=booking_date.weekday())
+
+def describe_scope(per, key):
+    if per == "period":
+        return f"'{key[1]}' de {key[0].strftime('%Y-%m-%d')}"
+    if per == "day":
+        return key.strftime('%Y-%m-%d')
+    return f"semana de {key.strftime('%Y-%m-%d')}"
+
+# Datas que a query precisa cobrir: as do pedido, ou a semana inteira (Seg-Sex) nas regras por semana
+def dates_to_check(rules, booking_dates):
+    dates = set(booking_dates)
+    if any(rule.per == "week" for rule in rules):
+        for booking_date in booking_dates:
+            monday = booking_date - timedelta(days=booking_date.weekday())
+            dates.update(monday + timedelta(days=i) for i in range(5))
+    return dates
+
+def quota_error_message(rule, key, existing_room_names, requested_count):
+    rooms_label = f"sala(s) '{rule.group}'" if rule.group else "agendamento(s)"
+    # Mensagens de sempre da regra "uma sala Geral por período"
+    if rule.max_rooms == 1 and rule.per == "period" and rule.group:
+        booking_date, period = key
+        if existing_room_names:
+            return f"Você já possui agendamento para sala '{existing_room_names[0]}' no período da '{period}' em {booking_date.strftime('%Y-%m-%d')}."
+        return f"Não é possível agendar mais de uma sala '{rule.group}' no mesmo período ('{period}') em {booking_date.strftime('%Y-%m-%d')}."
+    if rule.group is None and rule.per == "day":
+        message = (
+            f"Cada usuário pode ter no máximo {rule.max_rooms} agendamentos (sala e período) por dia, somando todas as salas. "
+            f"Em {describe_scope(rule.per, key)}: {requested_count} no pedido"
+        )
+        if existing_room_names:
+            message += f" e {len(existing_room_names)} já agendado(s) ({', '.join(existing_room_names)})"
+        return message + "."
+    scope_label = {"period": "período", "day": "dia", "week": "semana"}[rule.per]
+    message = f"Limite de {rule.max_rooms} {rooms_label} por {scope_label} excedido em {describe_scope(rule.per, key)}: {requested_count} no pedido"
+    if existing_room_names:
+        message += f" e {len(existing_room_names)} já agendado(s) ({', '.join(existing_room_names)})"
+    return message + "."
+
+# user_id: None para um usuário ainda sem cadastro (nenhum agendamento existente).
+# slots: [{"room_id", "booking_date_obj", "period"}]; rooms: snapshot do room_registry.
+# Retorna a mensagem da primeira regra violada, ou None.
+def check_quotas(user_id, slots, rooms, rules):
+    def rule_room_ids(rule):
+        return None if rule.group is None else rooms.group_ids(rule.group)
+
+    # Só as regras que alcançam alguma sala do pedido
+    active_rules = []
+    for rule in rules:
+        room_ids = rule_room_ids(rule)
+        if room_ids is None or any(slot["room_id"] in room_ids for slot in slots):
+            active_rules.append((rule, room_ids))
+    if not active_rules:
+        return None
+
+    existing_rows = []
+    if user_id is not None:
+        existing_rows = quota_bookings_query(
+            user_id, dates_to_check([rule for rule, _ in active_rules], {slot["booking_date_obj"] for slot in slots})
+        ).all()
+
+    for rule, room_ids in active_rules:
+        def in_rule(room_id):
+            return room_ids is None or room_id in room_ids
+        requested = defaultdict(int)
+        for slot in slots:
+            if in_rule(slot["room_id"]):
+                requested[scope_key(rule.per, slot["booking_date_obj"], slot["period"])] += 1
+        existing = defaultdict(list)
+        for booking_date, period, room_id in existing_rows:
+            if in_rule(room_id):
+                key = scope_key(rule.per, booking_date, period)
+                if key in requested:
+                    existing[key].append(rooms.name_of(room_id))
+        for key in sorted(requested):
+            if len(existing[key]) + requested[key] > rule.max_rooms:
+                return quota_error_message(rule, key, existing[key], requested[key])
+    return None
@@ -0,0 +1,94 @@
+# /home/ubuntu/lab_scheduler/src/services/booking_users.py
+
+# Usuários normalizados (tabela users) ligados aos agendamentos por bookings.user_id.
+#
+# O nome digitado no formulário varia ("José Silva", "jose silva", "JOSÉ  SILVA"): a chave
+# do usuário é o nome sem acentos, em minúsculas e com espaços simples (normalize_user_key).
+# O e-mail não entra na chave: e-mails de laboratório são compartilhados por várias pessoas.
+# As regras por usuário (booking_quotas) filtram por user_id, pelo índice
+# ix_bookings_user_id_date_period, em vez de comparar o texto de user_name.
+#
+# Nome e e-mail ficam só em users: os agendamentos novos gravam apenas user_id, e listagem,
+# grade, PDF, exportação e arquivo de limpeza leem users (booking_queries.booking_user_name).
+# bookings.user_name/user_email continuam nos agendamentos antigos (migração 0008 os tornou
+# opcionais) e são a reserva enquanto user_id é nulo.
+#
+# Agendamentos antigos (ou gravados por um worker da versão anterior durante o deploy) ficam
+# com user_id nulo até backfill_booking_users, que roda no startup e pelo comando
+# "flask --app src.main backfill-users", em lotes com uma transação cada.
+
+import unicodedata
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from src.extensions import db
+from src.models.entities import Booking, User
+
+BACKFILL_BATCH_SIZE = 500
+
+def normalize_user_key(name):
+    decomposed = unicodedata.normalize("NFKD", name or "")
+    without_accents = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(without_accents.casefold().split())
+
+def find_user(user_name):
+    return User.query.filter_by(name_key=normalize_user_key(user_name)).first()
+
+# Usuário do agendamento, criado se ainda não existe; a última grafia e o último e-mail ficam
+# registrados. Roda dentro da transação dos agendamentos: se outro worker criar o mesmo
+# usuário ao mesmo tempo, o savepoint desfaz só a inserção e o usuário dele é usado.
+# Retorna (usuário, datas dos agendamentos que ele já tinha se a grafia ou o e-mail mudaram):
+# esses agendamentos passam a mostrar o nome novo, e a rota avisa caches e grade.
+def get_or_create_user(user_name, user_email, user=None):
+    user = user or find_user(user_name)
+    if user is not None:
+        if user.name != user_name or user.email != user_email:
+            user.name, user.email = user_name, user_email
+            return user, user_booking_dates(user.id)
+        return user, set()
+    try:
+        with db.session.begin_nested():
+            user = User(name=user_name, email=user_email, name_key=normalize_user_key(user_name))
+            db.session.add(user)
+    except IntegrityError:
+        user = find_user(user_name)
+    return user, set()
+
+def user_booking_dates(user_id):
+    return {row[0] for row in db.session.query(Booking.booking_date).filter(Booking.user_id == user_id).distinct()}
+
+# Preenche bookings.user_id onde ainda é nulo, BACKFILL_BATCH_SIZE agendamentos por transação.
+# Retorna quantos agendamentos foram ligados a um usuário.
+def backfill_booking_users(batch_size=BACKFILL_BATCH_SIZE, logger=None):
+    total = 0
+    while True:
+        rows = db.session.query(Booking.id, Booking.user_name, Booking.user_email).filter(
+            Booking.user_id.is_(None)
+        ).order_by(Booking.id).limit(batch_size).all()
+        if not rows:
+            break
+        # Por chave, a grafia e o e-mail do agendamento mais recente do lote
+        latest = {}
+        for booking_id, user_name, user_email in rows:
+            latest[normalize_user_key(user_name)] = (user_name, user_email)
+        users = {user.name_key: user for user in User.query.filter(User.name_key.in_(latest))}
+        for key, (user_name, user_email) in latest.items():
+            if key not in users:
+                users[key] = User(name=user_name, email=user_email, name_key=key)
+                db.session.add(users[key])
+        try:
+            db.session.flush()
+            db.session.execute(update(Booking), [
+                {"id": booking_id, "user_id": users[normalize_user_key(user_name)].id}
+                for booking_id, user_name, _ in rows
+            ])
+            db.session.commit()
+        except IntegrityError:
+            # Outro worker criou algum desses usuários: o próximo lote os encontra
+            db.session.rollback()
+            if logger:
+                logger.info("Booking users backfill raced with another worker, retrying batch")
+            continue
+        total += len(rows)
+        if logger:
+            logger.info(f"Backfilled user_id for {total} bookings")
+    return total
@@ -0,0 +1,227 @@
+# /home/ubuntu/lab_scheduler/src/services/booking_window.py
+
+# Janela de agendamento (quando cada semana aceita agendamentos), calculada uma vez por
+# semana e grupo de salas em vez de a cada chamada.
+#
+# Para uma semana W (segunda-feira), em função do horário atual (UTC):
+#   - antes da semana anterior a W começar: fechada (mais de uma semana à frente);
+#   - durante a semana anterior: aberta de release (da semana anterior) até cutoff de W;
+#   - durante W: aberta até cutoff de W;
+#   - depois de W: aberta (datas passadas continuam permitidas, a pedido dos usuários).
+# A "semana atual" segue get_monday_of_week sobre a data UTC: domingo já pertence à semana
+# seguinte, então cada semana começa no domingo 00:00 UTC anterior à sua segunda-feira.
+#
+# week_calendar(W) guarda esses trechos como uma lista ordenada de (início, estado); a
+# consulta "esta data pode ser agendada agora?" é um acesso ao dicionário + bisect em no
+# máximo 6 trechos. next_transition_at diz até quando o status atual vale: status_payload
+# guarda o JSON de GET /api/booking-status até esse instante (Cache-Control/Expires também).
+#
+# As regras padrão (DEFAULT_WINDOW_RULES) podem ser trocadas por grupo de salas (RoomGroup):
+#   BOOKING_WINDOW_GROUP_RULES = {"Cultivo": {"cutoff_weekday": 4, "cutoff_time": "21:00"}}
+
+import hashlib
+import json
+import threading
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import datetime, time, timedelta, timezone
+
+DEFAULT_GROUP = "default"
+
+# Horários em UTC. Brasília é UTC-3: cutoff = Qua 18:00, release = Qui 23:59 (sexta 02:59 UTC)
+DEFAULT_WINDOW_RULES = {
+    "cutoff_weekday": 2, # Quarta-feira da própria semana
+    "cutoff_time": "21:00",
+    "release_weekday": 4, # Sexta-feira da semana anterior
+    "release_time": "02:59",
+}
+LOCAL_UTC_OFFSET_HOURS = -3 # Só para as mensagens (Horário Local)
+
+WEEKDAY_LABELS = ["Seg", "Ter", "Qua", "Qui", "Sex", "Sáb", "Dom"]
+MAX_CACHED_WEEKS = 512
+
+WindowRules = namedtuple("WindowRules", ["cutoff_weekday", "cutoff_time", "release_weekday", "release_time"])
+WindowState = namedtuple("WindowState", ["allowed", "reason"]) # reason: beyond, not_released, next_closed, current_closed, open, past
+
+_NEVER = datetime.min.replace(tzinfo=timezone.utc)
+
+def parse_rules(rules):
+    def parse_time(value):
+        hour, minute = (int(part) for part in value.split(":"))
+        return time(hour, minute, tzinfo=timezone.utc)
+    return WindowRules(
+        int(rules["cutoff_weekday"]), parse_time(rules["cutoff_time"]),
+        int(rules["release_weekday"]), parse_time(rules["release_time"])
+    )
+
+def week_monday(input_date):
+    # Mesma regra de get_monday_of_week nas rotas: domingo pertence à semana seguinte
+    if input_date.weekday() == 6:
+        return input_date + timedelta(days=1)
+    return input_date - timedelta(days=input_date.weekday())
+
+def week_begins_at(week_start):
+    return datetime.combine(week_start - timedelta(days=1), time(0, 0, tzinfo=timezone.utc))
+
+def cutoff_at(week_start, rules):
+    return datetime.combine(week_start + timedelta(days=rules.cutoff_weekday), rules.cutoff_time)
+
+# A semana W é liberada durante a semana anterior
+def release_at(week_start, rules):
+    return datetime.combine(week_start - timedelta(days=7 - rules.release_weekday), rules.release_time)
+
+# "Qua 18:00" no horário local
+def local_label(weekday, utc_time):
+    minutes = weekday * 1440 + utc_time.hour * 60 + utc_time.minute + LOCAL_UTC_OFFSET_HOURS * 60
+    minutes %= 7 * 1440
+    return f"{WEEKDAY_LABELS[minutes // 1440]} {minutes % 1440 // 60:02d}:{minutes % 60:02d}"
+
+# Estado da semana W no instante now, direto da regra (usado para montar o calendário)
+def _state_at(week_start, rules, now):
+    cutoff = cutoff_at(week_start, rules)
+    if now < week_begins_at(week_start - timedelta(days=7)):
+        return WindowState(False, "beyond")
+    if now < week_begins_at(week_start):
+        if now < release_at(week_start, rules):
+            return WindowState(False, "not_released")
+        return WindowState(now < cutoff, "open" if now < cutoff else "next_closed")
+    if now < week_begins_at(week_start + timedelta(days=7)):
+        return WindowState(now < cutoff, "open" if now < cutoff else "current_closed")
+    return WindowState(True, "past")
+
+def build_week_calendar(week_start, rules):
+    boundaries = sorted({
+        week_begins_at(week_start - timedelta(days=7)), week_begins_at(week_start),
+        week_begins_at(week_start + timedelta(days=7)),
+        release_at(week_start, rules), cutoff_at(week_start, rules)
+    })
+    starts, states = [_NEVER], [_state_at(week_start, rules, _NEVER)]
+    for boundary in boundaries:
+        state = _state_at(week_start, rules, boundary)
+        if state != states[-1]:
+            starts.append(boundary)
+            states.append(state)
+    return starts, states
+
+class BookingWindow:
+    def __init__(self, app=None):
+        self.app = None
+        self._calendars = {} # (grupo, segunda-feira) -> (inícios, estados)
+        self._rules = {}
+        self._status_payloads = {} # grupo -> (corpo JSON, etag, válido até)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("BOOKING_WINDOW_GROUP_RULES", {})
+        self.app = app
+        self._rules = {DEFAULT_GROUP: parse_rules(DEFAULT_WINDOW_RULES)}
+        for group, overrides in app.config["BOOKING_WINDOW_GROUP_RULES"].items():
+            self._rules[group] = parse_rules(dict(DEFAULT_WINDOW_RULES, **overrides))
+        with self._lock:
+            self._calendars = {}
+            self._status_payloads = {}
+        app.extensions["booking_window"] = self
+
+    # room: RoomInfo do room_registry; o primeiro grupo da sala (em ordem alfabética) com regras próprias
+    def group_for_room(self, room):
+        for group in sorted(room.groups):
+            if group in self._rules:
+                return group
+        return DEFAULT_GROUP
+
+    def rules_for(self, group=None):
+        return self._rules.get(group or DEFAULT_GROUP, self._rules[DEFAULT_GROUP])
+
+    def _group_key(self, group):
+        return group if group in self._rules else DEFAULT_GROUP
+
+    def week_calendar(self, week_start, group=None):
+        group = self._group_key(group)
+        key = (group, week_start)
+        calendar = self._calendars.get(key)
+        if calendar is None:
+            calendar = build_week_calendar(week_start, self.rules_for(group))
+            with self._lock:
+                if len(self._calendars) >= MAX_CACHED_WEEKS:
+                    self._calendars = {}
+                self._calendars[key] = calendar
+        return calendar
+
+    def state_of_week(self, week_start, now, group=None):
+        starts, states = self.week_calendar(week_start, group)
+        return states[bisect_right(starts, now) - 1]
+
+    # Mesmo contrato de is_booking_allowed: (permitido, mensagem)
+    def check(self, booking_date, now=None, group=None):
+        if booking_date.weekday() >= 5:
+            return False, f"Agendamentos só permitidos de Seg-Sex. Data: {booking_date.strftime('%d/%m/%Y')} é fim de semana."
+        now = now or datetime.now(timezone.utc)
+        week_start = booking_date - timedelta(days=booking_date.weekday())
+        state = self.state_of_week(week_start, now, group)
+        if state.allowed:
+            return True, "OK"
+        rules = self.rules_for(group)
+        week_label = f"{week_start.strftime('%d/%m')}-{(week_start + timedelta(days=4)).strftime('%d/%m')}"
+        cutoff_label = local_label(rules.cutoff_weekday, rules.cutoff_time)
+        if state.reason == "current_closed":
+            return False, f"Agendamento para semana atual ({week_label}) encerrou {cutoff_label} (Horário Local)."
+        if state.reason == "not_released":
+            release_label = local_label(rules.release_weekday, rules.release_time)
+            return False, f"Agendamento para próxima semana ({week_label}) abre {release_label} (Horário Local)."
+        if state.reason == "next_closed":
+            return False, f"Agendamento para semana de {week_start.strftime('%d/%m')} já encerrou ({cutoff_label} Horário Local)."
+        return False, f"Só é possível agendar para semana atual ou próxima. Data: {booking_date.strftime('%d/%m/%Y')} fora do período permitido."
+
+    # Próximo instante em que o status da semana atual/próxima muda (inclui a virada de semana)
+    def next_transition_at(self, now=None, group=None):
+        now = now or datetime.now(timezone.utc)
+        current_week = week_monday(now.date())
+        candidates = [week_begins_at(current_week + timedelta(days=7))]
+        for week_start in (current_week, current_week + timedelta(days=7)):
+            starts, _ = self.week_calendar(week_start, group)
+            index = bisect_right(starts, now)
+            if index < len(starts):
+                candidates.append(starts[index])
+        return min(candidates)
+
+    # Dados de GET /api/booking-status
+    def status(self, now=None, group=None):
+        now = now or datetime.now(timezone.utc)
+        rules = self.rules_for(group)
+        current_week = week_monday(now.date())
+        next_week = current_week + timedelta(days=7)
+        return {
+            "current_week_start": current_week.isoformat(),
+            "current_week_end": (current_week + timedelta(days=4)).isoformat(), # Sexta-feira
+            "current_week_open": self.state_of_week(current_week, now, group).allowed,
+            "current_week_cutoff": cutoff_at(current_week, rules).isoformat(),
+            "next_week_start": next_week.isoformat(),
+            "next_week_end": (next_week + timedelta(days=4)).isoformat(),
+            "next_week_open": self.state_of_week(next_week, now, group).allowed,
+            "next_week_release": release_at(next_week, rules).isoformat(),
+            "next_transition_at": self.next_transition_at(now, group).isoformat(),
+            "server_time_utc": now.isoformat()
+        }
+
+    # JSON de status() memorizado até next_transition_at, com ETag.
+    # server_time_utc fica sendo o instante do cálculo: qualquer instante antes da transição
+    # leva às mesmas decisões no frontend (cutoff, release e virada de semana são transições).
+    def status_payload(self, now=None, group=None):
+        now = now or datetime.now(timezone.utc)
+        group = self._group_key(group)
+        cached = self._status_payloads.get(group)
+        if cached is not None and now < cached[2]:
+            return cached
+        status = self.status(now, group)
+        body = json.dumps(status, sort_keys=True, separators=(",", ":"))
+        # O ETag ignora server_time_utc: só muda quando a janela de agendamento muda de estado
+        fingerprint = json.dumps({k: v for k, v in status.items() if k != "server_time_utc"}, sort_keys=True)
+        etag = f"status-{hashlib.sha1(fingerprint.encode()).hexdigest()[:16]}"
+        cached = (body, etag, datetime.fromisoformat(status["next_transition_at"]))
+        with self._lock:
+            self._status_payloads[group] = cached
+        return cached
+
+booking_window = BookingWindow()
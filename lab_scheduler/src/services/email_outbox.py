@@ -0,0 +1,172 @@
+# /home/ubuntu/lab_scheduler/src/services/email_outbox.py
+
+# Envio assíncrono de e-mails via tabela email_outbox.
+#
+# create_booking grava a mensagem na outbox na mesma transação dos agendamentos; o
+# EmailDispatcher (uma thread por worker) reivindica lotes de mensagens pendentes,
+# envia todas por uma única conexão SMTP e reagenda as que falharem com backoff
+# exponencial. A reivindicação é um UPDATE condicional (ver claim_pending_emails), então
+# vários workers podem drenar a fila ao mesmo tempo sem enviar a mesma mensagem duas vezes.
+
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_, select
+from src.extensions import db
+from src.instrumentation import request_metrics
+from src.models.entities import EmailOutbox
+
+def enqueue_email(recipient, subject, html_body):
+    # Não faz commit: a mensagem entra na transação de quem chamou
+    message = EmailOutbox(
+        recipient=recipient, subject=subject, html_body=html_body,
+        status="pending", attempts=0, next_attempt_at=datetime.utcnow()
+    )
+    db.session.add(message)
+    return message
+
+def get_retry_delay(attempts, base_seconds, max_seconds):
+    return timedelta(seconds=min(base_seconds * (2 ** max(attempts - 1, 0)), max_seconds))
+
+# Mensagens que podem ser reivindicadas agora
+def due_emails_condition(now, stale_after_seconds):
+    return or_(
+        and_(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now),
+        # Mensagens presas em "sending" (worker morreu no meio do envio) voltam para a fila
+        and_(EmailOutbox.status == "sending", EmailOutbox.claimed_at < now - timedelta(seconds=stale_after_seconds))
+    )
+
+# O UPDATE repete a condição inteira: no PostgreSQL (READ COMMITTED) um UPDATE que esperou
+# pelo de outro dispatcher reavalia o WHERE na linha já reivindicada, e só status "sending"
+# ainda valeria. No PostgreSQL a subquery também usa FOR UPDATE SKIP LOCKED, para que cada
+# dispatcher pegue linhas diferentes em vez de esperar pelo outro.
+def claim_pending_emails(batch_size, stale_after_seconds):
+    now = datetime.utcnow()
+    claim_token = uuid.uuid4().hex
+    due_ids = select(EmailOutbox.id).where(
+        due_emails_condition(now, stale_after_seconds)
+    ).order_by(EmailOutbox.next_attempt_at).limit(batch_size)
+    if db.session.get_bind().dialect.name == "postgresql":
+        due_ids = due_ids.with_for_update(skip_locked=True)
+    db.session.query(EmailOutbox).filter(
+        EmailOutbox.id.in_(due_ids),
+        due_emails_condition(now, stale_after_seconds)
+    ).update({"status": "sending", "claim_token": claim_token, "claimed_at": now}, synchronize_session=False)
+    db.session.commit()
+    return EmailOutbox.query.filter_by(claim_token=claim_token, status="sending").order_by(EmailOutbox.id).all()
+
+# Flask-Mail (e smtplib/email) só é importado e configurado no primeiro envio, fora do boot dos workers
+def get_mail(app):
+    mail = app.extensions.get("mail")
+    if mail is None:
+        try:
+            from flask_mail import Mail
+        except ImportError:
+            return None
+        mail = Mail(app)
+    return mail
+
+# Envia um lote de mensagens pendentes e retorna (enviadas, falhas)
+def dispatch_pending_emails(app):
+    mail = get_mail(app)
+    if not mail:
+        app.logger.error("Flask-Mail not found. Email outbox not dispatched.")
+        return 0, 0
+    messages = claim_pending_emails(app.config["EMAIL_OUTBOX_BATCH_SIZE"], app.config["EMAIL_OUTBOX_STALE_SECONDS"])
+    if not messages:
+        return 0, 0
+
+    from flask_mail import Message
+    sender = app.config.get("MAIL_DEFAULT_SENDER", "noreply@example.com")
+    sent = failed = 0
+    try:
+        # Uma conexão SMTP reaproveitada para o lote inteiro
+        with mail.connect() as connection:
+            for outbox_message in messages:
+                msg = Message(outbox_message.subject, sender=sender, recipients=[outbox_message.recipient])
+                msg.html = outbox_message.html_body
+                started = time.perf_counter()
+                try:
+                    connection.send(msg)
+                except Exception as e:
+                    mark_failed(app, outbox_message, e)
+                    failed += 1
+                else:
+                    request_metrics.observe("smtp_send", time.perf_counter() - started)
+                    outbox_message.status = "sent"
+                    outbox_message.sent_at = datetime.utcnow()
+                    outbox_message.attempts += 1
+                    sent += 1
+    except Exception as e:
+        # Falha ao abrir a conexão: todo o lote ainda não enviado volta para a fila
+        for outbox_message in messages:
+            if outbox_message.status == "sending":
+                mark_failed(app, outbox_message, e)
+                failed += 1
+    db.session.commit()
+    app.logger.info(f"Email outbox: {sent} sent, {failed} failed")
+    return sent, failed
+
+def mark_failed(app, outbox_message, error):
+    outbox_message.attempts += 1
+    outbox_message.last_error = str(error)[:1000]
+    if outbox_message.attempts >= app.config["EMAIL_OUTBOX_MAX_ATTEMPTS"]:
+        outbox_message.status = "failed"
+        app.logger.error(f"Giving up on email {outbox_message.id} to {outbox_message.recipient}: {str(error)}")
+    else:
+        outbox_message.status = "pending"
+        outbox_message.next_attempt_at = datetime.utcnow() + get_retry_delay(
+            outbox_message.attempts, app.config["EMAIL_OUTBOX_RETRY_BASE_SECONDS"], app.config["EMAIL_OUTBOX_RETRY_MAX_SECONDS"]
+        )
+        app.logger.warning(f"Failed to send email {outbox_message.id} to {outbox_message.recipient} (attempt {outbox_message.attempts}): {str(error)}")
+
+class EmailDispatcher:
+    def __init__(self, app=None):
+        self.app = None
+        self._wake_event = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("EMAIL_OUTBOX_DISPATCHER_ENABLED", True)
+        app.config.setdefault("EMAIL_OUTBOX_POLL_SECONDS", 30)
+        app.config.setdefault("EMAIL_OUTBOX_BATCH_SIZE", 20)
+        app.config.setdefault("EMAIL_OUTBOX_MAX_ATTEMPTS", 6)
+        app.config.setdefault("EMAIL_OUTBOX_RETRY_BASE_SECONDS", 30)
+        app.config.setdefault("EMAIL_OUTBOX_RETRY_MAX_SECONDS", 3600)
+        app.config.setdefault("EMAIL_OUTBOX_STALE_SECONDS", 600)
+        self.app = app
+        app.extensions["email_dispatcher"] = self
+
+    def start(self):
+        if self._thread is not None or not self.app.config["EMAIL_OUTBOX_DISPATCHER_ENABLED"]:
+            return
+        self._thread = threading.Thread(target=self._run, name="email-outbox-dispatcher", daemon=True)
+        self._thread.start()
+
+    # Chamado depois do commit de novos e-mails para enviar sem esperar o próximo ciclo
+    def wake(self):
+        if self._thread is None:
+            self.start()
+        self._wake_event.set()
+
+    def _run(self):
+        while True:
+            self._wake_event.wait(self.app.config["EMAIL_OUTBOX_POLL_SECONDS"])
+            self._wake_event.clear()
+            with self.app.app_context():
+                try:
+                    # Continua drenando enquanto os lotes vierem cheios
+                    while True:
+                        sent, failed = dispatch_pending_emails(self.app)
+                        if sent + failed < self.app.config["EMAIL_OUTBOX_BATCH_SIZE"]:
+                            break
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.error(f"Email outbox dispatcher error: {str(e)}", exc_info=True)
+                finally:
+                    db.session.remove()
+
+email_dispatcher = EmailDispatcher()
@@ -0,0 +1,201 @@
+# /home/ubuntu/lab_scheduler/src/services/pdf_cache.py
+
+# Cache em disco dos PDFs da escala semanal.
+#
+# Cada PDF é gravado como escala_<segunda>_<versão>.pdf, onde a versão é uma impressão
+# digital barata da semana (booking_queries.week_data_tag: quantidade, soma e maior id dos
+# agendamentos e o último evento da semana), o ETag do catálogo de salas (salas renomeadas)
+# e a data de modificação do template. Todos os workers enxergam o mesmo arquivo válido.
+# Quando create_booking/clear_bookings alteram a semana atual ou a próxima, uma thread
+# em segundo plano já gera o novo PDF, e o download vira só o envio de um arquivo.
+
+import os
+import queue
+import tempfile
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from jinja2 import Environment, FileSystemLoader
+from src.extensions import db
+from src.services.booking_queries import week_grid_rows_query, exclude_weekend_bookings, week_data_tag
+from src.services.room_registry import room_registry
+from src.services.schedule_cache import get_week_start
+from src.services.pdf_renderer import pdf_render_pool
+
+PDF_TEMPLATE_NAME = "schedule_pdf_template.html"
+# Templates que afetam o PDF semanal (entram na versão do cache)
+PDF_TEMPLATE_FILES = [PDF_TEMPLATE_NAME, "schedule_pdf_week_table.html"]
+DAYS_LOCALE = ["Segunda", "Terça", "Quarta", "Quinta", "Sexta"]
+
+def format_date_filter(date_str, fmt="%d/%m"):
+    try:
+        return datetime.strptime(date_str, "%Y-%m-%d").strftime(fmt)
+    except (TypeError, ValueError):
+        return date_str
+
+# schedule_data[room_id][data ISO][período] = nome do usuário, como o template espera.
+# Recebe as tuplas de week_grid_rows_query / booking_export_rows_query (user_name já vem de users).
+def build_schedule_data(bookings):
+    schedule_data = defaultdict(lambda: defaultdict(lambda: {"Manhã": None, "Tarde": None}))
+    for booking in bookings:
+        schedule_data[booking.room_id][booking.booking_date.isoformat()][booking.period] = booking.user_name
+    return schedule_data
+
+class PdfCache:
+    def __init__(self, app=None):
+        self.app = None
+        self.cache_dir = None
+        self._jinja_env = None
+        self._stats = {"hits": 0, "misses": 0, "prerendered": 0}
+        self._stats_lock = threading.Lock()
+        self._render_locks = {} # week_start -> [lock, threads usando]; só enquanto há render da semana
+        self._render_locks_guard = threading.Lock()
+        self._prerender_queue = queue.Queue()
+        self._prerender_pending = set()
+        self._prerender_thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "lab_scheduler_pdf_cache"))
+        app.config.setdefault("PDF_PRERENDER_ENABLED", True)
+        self.app = app
+        self.cache_dir = app.config["PDF_CACHE_DIR"]
+        os.makedirs(self.cache_dir, exist_ok=True)
+        app.extensions["pdf_cache"] = self
+
+    # Environment criado uma única vez por processo; o Jinja guarda o template já compilado
+    def get_jinja_env(self):
+        if self._jinja_env is None:
+            env = Environment(loader=FileSystemLoader(self.get_template_dir()), autoescape=True)
+            env.filters["format_date"] = format_date_filter
+            self._jinja_env = env
+        return self._jinja_env
+
+    def get_template_dir(self):
+        return os.path.join(self.app.root_path, self.app.template_folder or "templates")
+
+    def get_week_version(self, week_start):
+        data_tag = week_data_tag(week_start, week_start + timedelta(days=4))
+        rooms_tag = room_registry.get().etag.rsplit("-", 1)[-1][:8]
+        template_mtime = max(int(os.path.getmtime(os.path.join(self.get_template_dir(), name))) for name in PDF_TEMPLATE_FILES)
+        return f"{data_tag}-{rooms_tag}-{template_mtime}"
+
+    def get_path(self, week_start, version):
+        return os.path.join(self.cache_dir, f"escala_{week_start.isoformat()}_{version}.pdf")
+
+    def render_html(self, week_start):
+        week_end = week_start + timedelta(days=4)
+        rooms = room_registry.get()
+        bookings = exclude_weekend_bookings(week_grid_rows_query(week_start, week_end).all())
+
+        for booking in bookings:
+            if rooms.get(booking.room_id) is None:
+                self.app.logger.warning(f"Booking for room ID {booking.room_id} on {booking.booking_date} has no associated room for PDF!")
+        schedule_data = build_schedule_data(bookings)
+
+        template = self.get_jinja_env().get_template(PDF_TEMPLATE_NAME)
+        return template.render(
+            rooms=rooms.rooms,
+            dates_of_week=[(week_start + timedelta(days=i)).isoformat() for i in range(5)],
+            days_locale=DAYS_LOCALE,
+            schedule_data=schedule_data,
+            week_start_date_formatted=week_start.strftime("%d/%m/%Y"),
+            week_end_date_formatted=week_end.strftime("%d/%m/%Y")
+        )
+
+    def render_pdf_bytes(self, html_string):
+        # WeasyPrint roda no pool de processos dedicado (pode levantar PdfRenderUnavailable)
+        return pdf_render_pool.render(html_string)
+
+    def render_to_file(self, week_start, path):
+        pdf_bytes = self.render_pdf_bytes(self.render_html(week_start))
+        # Grava em arquivo temporário e renomeia: outro worker nunca lê um PDF pela metade
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf_bytes)
+        os.replace(tmp_path, path)
+        self.remove_week_files(week_start, keep=path)
+
+    # Retorna (caminho do PDF, True se veio do cache). A pré-renderização não entra nas estatísticas.
+    def get_pdf(self, week_start, count_stats=True):
+        path = self.get_path(week_start, self.get_week_version(week_start))
+        with self._render_lock(week_start):
+            # Dentro do lock: outra thread pode ter acabado de gerar o arquivo
+            if os.path.exists(path):
+                if count_stats:
+                    self._count("hits")
+                return path, True
+            if count_stats:
+                self._count("misses")
+            self.render_to_file(week_start, path)
+        return path, False
+
+    # Um lock por semana, criado na primeira thread e removido quando a última termina
+    @contextmanager
+    def _render_lock(self, week_start):
+        with self._render_locks_guard:
+            entry = self._render_locks.setdefault(week_start, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._render_locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._render_locks[week_start]
+
+    def remove_week_files(self, week_start, keep=None):
+        prefix = f"escala_{week_start.isoformat()}_"
+        for filename in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, filename)
+            if filename.startswith(prefix) and path != keep:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    # Chamado depois de alterações nas datas informadas
+    def invalidate(self, dates):
+        week_starts = {get_week_start(d) for d in dates}
+        for week_start in week_starts:
+            self.remove_week_files(week_start)
+        current_week = get_week_start(datetime.now(timezone.utc).date())
+        for week_start in week_starts & {current_week, current_week + timedelta(days=7)}:
+            self.schedule_prerender(week_start)
+
+    def schedule_prerender(self, week_start):
+        if not self.app.config["PDF_PRERENDER_ENABLED"] or week_start in self._prerender_pending:
+            return
+        self._prerender_pending.add(week_start)
+        self._prerender_queue.put(week_start)
+        if self._prerender_thread is None:
+            self._prerender_thread = threading.Thread(target=self._run_prerender, name="pdf-prerender", daemon=True)
+            self._prerender_thread.start()
+
+    def _run_prerender(self):
+        while True:
+            week_start = self._prerender_queue.get()
+            self._prerender_pending.discard(week_start)
+            with self.app.app_context():
+                try:
+                    path, hit = self.get_pdf(week_start, count_stats=False)
+                    if not hit:
+                        self._count("prerendered")
+                        self.app.logger.info(f"Pre-rendered schedule PDF for week {week_start}")
+                except Exception as e:
+                    self.app.logger.error(f"Error pre-rendering PDF for week {week_start}: {str(e)}", exc_info=True)
+                finally:
+                    db.session.remove()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self._stats, pid=os.getpid())
+
+pdf_cache = PdfCache()
@@ -0,0 +1,208 @@
+# /home/ubuntu/lab_scheduler/src/services/pdf_renderer.py
+
+# Pool de processos dedicado à geração de PDF com WeasyPrint.
+#
+# O WeasyPrint consome muita CPU e memória; rodando no processo do gunicorn ele disputa
+# a CPU com os agendamentos e faz a memória do worker crescer. Aqui o HTML já renderizado
+# é enviado para processos filhos, um job por processo de cada vez:
+#   - no máximo PDF_RENDER_WORKERS PDFs sendo gerados ao mesmo tempo (por worker do gunicorn);
+#   - até PDF_RENDER_QUEUE_SIZE pedidos esperando um processo livre, por no máximo
+#     PDF_RENDER_QUEUE_TIMEOUT_SECONDS; além disso PdfRenderUnavailable (503);
+#   - cada job tem PDF_RENDER_TIMEOUT_SECONDS contados a partir do momento em que um processo
+#     o recebe (a espera na fila não conta). Um job que estoura o tempo tem só o seu processo
+#     encerrado e substituído: os jobs dos outros processos e os da fila seguem normalmente;
+#   - cada processo filho tem limite de memória (PDF_RENDER_MEMORY_LIMIT_MB) e é
+#     substituído após PDF_RENDER_MAX_JOBS_PER_WORKER jobs, devolvendo a memória ao sistema.
+# Com PDF_RENDER_WORKERS = 0 o PDF é gerado no próprio processo (útil em desenvolvimento).
+
+import multiprocessing
+import threading
+import time
+from src.instrumentation import request_metrics
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+class PdfRenderUnavailable(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def _init_render_worker(memory_limit_mb):
+    if memory_limit_mb and resource is not None:
+        limit = memory_limit_mb * 1024 * 1024
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+def _render_pdf(html_string):
+    from weasyprint import HTML # Importado só nos processos de renderização
+    return HTML(string=html_string).write_pdf()
+
+# Laço do processo filho: recebe (função, argumentos) pelo pipe e devolve ("ok", resultado)
+# ou ("error", exceção). Termina quando o pool fecha a conexão.
+def _render_worker_main(conn, memory_limit_mb):
+    _init_render_worker(memory_limit_mb)
+    conn.send("ready")
+    while True:
+        try:
+            func, args = conn.recv()
+        except EOFError:
+            return
+        try:
+            result = ("ok", func(*args))
+        except Exception as e:
+            result = ("error", e)
+        try:
+            conn.send(result)
+        except Exception: # Resultado ou exceção que não pode ser serializada
+            conn.send(("error", RuntimeError(repr(result[1]))))
+
+# Um processo filho e a ponta do pipe que fala com ele
+class RenderProcess:
+    def __init__(self, context, memory_limit_mb):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_render_worker_main, args=(child_conn, memory_limit_mb), name="pdf-render", daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def wait_ready(self, timeout):
+        try:
+            return self.conn.poll(timeout) and self.conn.recv() == "ready"
+        except (EOFError, OSError):
+            return False
+
+    # Levanta multiprocessing.TimeoutError se o job passar de timeout segundos
+    def run(self, func, args, timeout):
+        self.conn.send((func, args))
+        if not self.conn.poll(timeout):
+            raise multiprocessing.TimeoutError()
+        try:
+            status, value = self.conn.recv()
+        except EOFError:
+            self.process.join(1)
+            raise RuntimeError(f"Processo de geração de PDF encerrado (exit code {self.process.exitcode})")
+        self.jobs += 1
+        return status, value
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    # Fecha o pipe: o filho sai do laço sozinho
+    def close(self):
+        self.conn.close()
+        self.process.join(1)
+
+class PdfRenderPool:
+    def __init__(self, app=None):
+        self.app = None
+        self._condition = threading.Condition()
+        self._idle = [] # Processos livres
+        self._process_count = 0 # Processos vivos: livres, ocupados e iniciando
+        self._slots = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("PDF_RENDER_WORKERS", 1)
+        app.config.setdefault("PDF_RENDER_QUEUE_SIZE", 4)
+        app.config.setdefault("PDF_RENDER_TIMEOUT_SECONDS", 60)
+        app.config.setdefault("PDF_RENDER_QUEUE_TIMEOUT_SECONDS", 60)
+        app.config.setdefault("PDF_RENDER_MEMORY_LIMIT_MB", 1024)
+        app.config.setdefault("PDF_RENDER_MAX_JOBS_PER_WORKER", 20)
+        app.config.setdefault("PDF_RENDER_RETRY_AFTER_SECONDS", 15)
+        self.shutdown()
+        self.app = app
+        # Vagas = processos ocupados + pedidos na fila
+        self._slots = threading.BoundedSemaphore(app.config["PDF_RENDER_WORKERS"] + app.config["PDF_RENDER_QUEUE_SIZE"])
+        app.extensions["pdf_render_pool"] = self
+
+    # Um processo livre, ou um novo se ainda há menos de PDF_RENDER_WORKERS; espera até deadline
+    def _acquire_process(self, deadline):
+        with self._condition:
+            while not self._idle and self._process_count >= self.app.config["PDF_RENDER_WORKERS"]:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PdfRenderUnavailable("Tempo esgotado na fila de geração de PDF", self.app.config["PDF_RENDER_RETRY_AFTER_SECONDS"])
+                self._condition.wait(remaining)
+            if self._idle:
+                return self._idle.pop()
+            self._process_count += 1
+        # spawn (fora do lock, leva algum tempo): o filho não herda threads/locks do worker do
+        # gunicorn (dispatcher de e-mail etc.)
+        try:
+            process = RenderProcess(multiprocessing.get_context("spawn"), self.app.config["PDF_RENDER_MEMORY_LIMIT_MB"])
+        except BaseException:
+            self._forget_process()
+            raise
+        if not process.wait_ready(self.app.config["PDF_RENDER_TIMEOUT_SECONDS"]):
+            process.kill()
+            self._forget_process()
+            raise PdfRenderUnavailable("Processo de geração de PDF não iniciou", self.app.config["PDF_RENDER_RETRY_AFTER_SECONDS"])
+        return process
+
+    def _release_process(self, process):
+        if process.jobs >= self.app.config["PDF_RENDER_MAX_JOBS_PER_WORKER"]:
+            process.close()
+            self._forget_process()
+            return
+        with self._condition:
+            self._idle.append(process)
+            self._condition.notify()
+
+    def _forget_process(self):
+        with self._condition:
+            self._process_count -= 1
+            self._condition.notify()
+
+    # Tempo medido inclui a espera na fila (é o que o request espera)
+    def render(self, html_string):
+        started = time.perf_counter()
+        pdf = self.submit(_render_pdf, html_string)
+        request_metrics.observe("pdf_render", time.perf_counter() - started)
+        return pdf
+
+    def submit(self, func, *args):
+        if self.app.config["PDF_RENDER_WORKERS"] <= 0:
+            return func(*args)
+        retry_after = self.app.config["PDF_RENDER_RETRY_AFTER_SECONDS"]
+        if not self._slots.acquire(blocking=False):
+            raise PdfRenderUnavailable("Fila de geração de PDF cheia", retry_after)
+        try:
+            process = self._acquire_process(time.monotonic() + self.app.config["PDF_RENDER_QUEUE_TIMEOUT_SECONDS"])
+            timeout = self.app.config["PDF_RENDER_TIMEOUT_SECONDS"]
+            try:
+                status, value = process.run(func, args, timeout)
+            except multiprocessing.TimeoutError:
+                # Só o processo deste job é encerrado; o próximo pedido inicia outro
+                self.app.logger.error(f"PDF render job timed out after {timeout}s; killing render process {process.process.pid}")
+                process.kill()
+                self._forget_process()
+                raise PdfRenderUnavailable("Tempo esgotado na geração do PDF", retry_after)
+            except BaseException:
+                # Processo morto (ex.: limite de memória) ou pipe quebrado: não é reaproveitado
+                process.kill()
+                self._forget_process()
+                raise
+            self._release_process(process)
+            if status == "error":
+                raise value
+            return value
+        finally:
+            self._slots.release()
+
+    # Encerra os processos livres; os ocupados terminam o job atual e voltam ao pool
+    def shutdown(self):
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._process_count -= len(idle)
+        for process in idle:
+            process.close()
+
+pdf_render_pool = PdfRenderPool()
@@ -0,0 +1,150 @@
+# /home/ubuntu/lab_scheduler/src/services/room_registry.py
+
+# Catálogo de salas em memória, carregado uma vez por processo.
+#
+# As salas só mudam no seed de main.py (ou por alguma manutenção manual), mas eram
+# consultadas em todo agendamento, listagem, grade e PDF. room_registry.get() devolve um
+# RoomSnapshot imutável: as rotas leem sem lock e, quando as salas mudam, um snapshot novo
+# substitui o anterior de uma vez (quem já tinha o antigo continua com uma versão coerente).
+#
+# Os grupos vêm de room_groups/room_group_members; assign_default_room_groups coloca cada
+# sala ainda sem grupo no grupo da sua família de nome (ver room_group_from_name).
+#
+# O snapshot é recarregado:
+#   - no mesmo processo, logo depois de um commit que alterou salas ou grupos;
+#   - nos outros workers, depois de ROOM_REGISTRY_TTL_SECONDS (como o antigo cache de salas).
+
+import hashlib
+import json
+import threading
+import time
+from collections import namedtuple, defaultdict
+from types import MappingProxyType
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from src.extensions import db
+from src.models.entities import Room, RoomGroup, room_group_members
+
+RoomInfo = namedtuple("RoomInfo", ["id", "name", "groups"]) # groups: frozenset de nomes
+
+UNKNOWN_ROOM_NAME = "Sala Desconhecida"
+
+# Salas criadas no primeiro startup (seed de main.py)
+DEFAULT_ROOM_NAMES = (
+    "Geral 1", "Geral 2", "Geral 3", "Geral 4", "Geral 5", "Geral 6", "Geral 7", "Geral 8",
+    "Citometria - Bancada", "Sala Clara - Lupa esquerda", "Sala Clara - Lupa direita",
+    "Sala Clara - Lupa com Câmera", "Sala Clara - Microscópio", "Sala Escura - Axio Imager.M2",
+    "Sala Escura - Axio Scope.A1", "Sala Escura - Microscópio CONFOCAL-LMSN",
+    "Microbiologia - Capela de Fluxo Laminar", "Microbiologia - Lupa", "Microbiologia - Equipamento",
+    "Geologia 1", "Geologia Micrótomo", "Cultivo A1", "Cultivo A2", "Cultivo B1", "Cultivo B2",
+)
+
+# Grupo da sala pelo nome: "Sala Escura - Axio Scope.A1" -> "Sala Escura", "Geral 3" -> "Geral",
+# "Cultivo A1" -> "Cultivo"
+def room_group_from_name(name):
+    if " - " in name:
+        return name.split(" - ", 1)[0]
+    return name.split(" ", 1)[0]
+
+class RoomSnapshot:
+    def __init__(self, rooms):
+        rooms = sorted(rooms, key=lambda room: room.id)
+        self.rooms = tuple(rooms)
+        self.by_id = MappingProxyType({room.id: room for room in rooms})
+        self.room_ids = tuple(room.id for room in rooms)
+        # room_index: sala -> linha da grade semanal (/api/schedule/grid)
+        self.room_index = MappingProxyType({room.id: i for i, room in enumerate(rooms)})
+        groups = defaultdict(list)
+        for room in rooms:
+            for group in room.groups:
+                groups[group].append(room.id)
+        # groups: nome do grupo -> ids das salas
+        self.groups = MappingProxyType({group: frozenset(ids) for group, ids in groups.items()})
+        self.payload = json.dumps([{"id": room.id, "name": room.name} for room in rooms], separators=(",", ":")).encode() + b"\n"
+        self.etag = f"rooms-{hashlib.sha1(self.payload).hexdigest()[:16]}"
+
+    def get(self, room_id):
+        return self.by_id.get(room_id)
+
+    def name_of(self, room_id):
+        room = self.by_id.get(room_id)
+        return room.name if room else UNKNOWN_ROOM_NAME
+
+    def group_ids(self, group):
+        return self.groups.get(group, frozenset())
+
+class RoomRegistry:
+    def __init__(self, app=None):
+        self.app = None
+        self._snapshot = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("ROOM_REGISTRY_TTL_SECONDS", 300)
+        self.app = app
+        app.extensions["room_registry"] = self
+        if not event.contains(Session, "after_flush", _track_room_changes):
+            event.listen(Session, "after_flush", _track_room_changes)
+            event.listen(Session, "after_commit", _refresh_after_room_commit)
+            event.listen(Session, "after_soft_rollback", _forget_room_changes)
+
+    # Snapshot atual; carrega do banco (precisa de app context) se ainda não há ou se expirou
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._loaded_at < self.app.config["ROOM_REGISTRY_TTL_SECONDS"]:
+            return snapshot
+        return self.refresh()
+
+    def refresh(self):
+        with self._lock:
+            groups_by_room = defaultdict(set)
+            for room_id, group_name in db.session.query(room_group_members.c.room_id, RoomGroup.name).join(RoomGroup):
+                groups_by_room[room_id].add(group_name)
+            rooms = [RoomInfo(room.id, room.name, frozenset(groups_by_room[room.id])) for room in Room.query.all()]
+            self._snapshot = RoomSnapshot(rooms)
+            self._loaded_at = time.monotonic()
+            return self._snapshot
+
+    # O próximo get() recarrega do banco
+    def invalidate(self):
+        self._loaded_at = 0.0
+
+room_registry = RoomRegistry()
+
+# Salas sem nenhum grupo entram no grupo da família do nome (seed e salas novas).
+# Vários workers podem rodar ao mesmo tempo: quem perder a corrida só ignora.
+def assign_default_room_groups(logger=None):
+    grouped_room_ids = {row[0] for row in db.session.query(room_group_members.c.room_id).distinct()}
+    ungrouped = [room for room in Room.query.all() if room.id not in grouped_room_ids]
+    if not ungrouped:
+        return 0
+    groups = {group.name: group for group in RoomGroup.query.all()}
+    for room in ungrouped:
+        group_name = room_group_from_name(room.name)
+        if group_name not in groups:
+            groups[group_name] = RoomGroup(name=group_name)
+            db.session.add(groups[group_name])
+        groups[group_name].rooms.append(room)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        if logger:
+            logger.info("Room groups already assigned by another worker")
+        return 0
+    return len(ungrouped)
+
+def _track_room_changes(session, flush_context):
+    if any(isinstance(obj, (Room, RoomGroup)) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["rooms_changed"] = True
+
+def _refresh_after_room_commit(session):
+    if session.info.pop("rooms_changed", False):
+        room_registry.invalidate()
+
+def _forget_room_changes(session, previous_transaction):
+    session.info.pop("rooms_changed", None)
@@ -0,0 +1,177 @@
+# /home/ubuntu/lab_scheduler/src/services/schedule_cache.py
+
+# Cache da escala semanal já serializada, por segunda-feira. Cada semana pode ter mais de
+# uma representação (variant): a lista de GET /api/bookings e a grade de /api/schedule/grid.
+#
+# Cada semana tem um número de versão que é incrementado quando create_booking ou
+# clear_bookings alteram a semana. Uma entrada do cache só é servida se foi gerada
+# com a versão atual. As versões ficam em um "version store":
+#   - LocalVersionStore: em memória, só o próprio processo vê as invalidações
+#     (por isso as entradas também expiram após SCHEDULE_CACHE_TTL_SECONDS);
+#   - SqliteVersionStore: arquivo SQLite compartilhado, todos os workers do gunicorn
+#     veem as invalidações (configure SCHEDULE_CACHE_SHARED_DB com o caminho do arquivo).
+# As rotas também passam data_tag (booking_queries.week_data_tag, lida do banco): a entrada
+# só é servida se foi gerada com os mesmos dados, e o ETag vem só dessa impressão digital,
+# então é o mesmo em qualquer worker e não muda com o tempo. A impressão digital fica
+# guardada junto com a versão da semana (week_tag): enquanto a versão não muda (e dentro do
+# TTL), um GET condicional ou um acerto de cache não consulta o banco.
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+def get_week_start(input_date):
+    # Mesma regra de get_monday_of_week nas rotas: domingo pertence à semana seguinte
+    if input_date.weekday() == 6:
+        return input_date + timedelta(days=1)
+    return input_date - timedelta(days=input_date.weekday())
+
+class LocalVersionStore:
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get_version(self, week_key):
+        return self._versions.get(week_key, 0)
+
+    def bump(self, week_keys):
+        with self._lock:
+            for week_key in week_keys:
+                self._versions[week_key] = self._versions.get(week_key, 0) + 1
+
+class SqliteVersionStore:
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS week_versions (week_start TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get_version(self, week_key):
+        with self._connect() as conn:
+            row = conn.execute("SELECT version FROM week_versions WHERE week_start = ?", (week_key,)).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, week_keys):
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO week_versions (week_start, version) VALUES (?, 1) "
+                "ON CONFLICT(week_start) DO UPDATE SET version = version + 1",
+                [(week_key,) for week_key in week_keys]
+            )
+
+class ScheduleCache:
+    def __init__(self, app=None):
+        self._entries = OrderedDict() # (week_key, variant) -> (version, created_at, payload)
+        self._week_tags = OrderedDict() # week_key -> (versão do store, created_at, data_tag)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.version_store = LocalVersionStore()
+        self.enabled = True
+        self.max_weeks = 32
+        self.max_bytes = 8 * 1024 * 1024
+        self.ttl_seconds = 30
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("SCHEDULE_CACHE_ENABLED", True)
+        app.config.setdefault("SCHEDULE_CACHE_MAX_WEEKS", 32)
+        app.config.setdefault("SCHEDULE_CACHE_MAX_BYTES", 8 * 1024 * 1024)
+        app.config.setdefault("SCHEDULE_CACHE_TTL_SECONDS", 30)
+        app.config.setdefault("SCHEDULE_CACHE_SHARED_DB", None)
+        self.enabled = app.config["SCHEDULE_CACHE_ENABLED"]
+        self.max_weeks = app.config["SCHEDULE_CACHE_MAX_WEEKS"]
+        self.max_bytes = app.config["SCHEDULE_CACHE_MAX_BYTES"]
+        self.ttl_seconds = app.config["SCHEDULE_CACHE_TTL_SECONDS"]
+        # Cada aplicação começa com o cache vazio (as entradas são de outro banco)
+        self.clear()
+        if app.config["SCHEDULE_CACHE_SHARED_DB"]:
+            self.version_store = SqliteVersionStore(app.config["SCHEDULE_CACHE_SHARED_DB"])
+        else:
+            self.version_store = LocalVersionStore()
+        app.extensions["schedule_cache"] = self
+
+    # Retorna (versão do store, data_tag da semana). load (que consulta o banco) só roda se
+    # a semana mudou de versão desde a última leitura neste processo ou se ela passou do TTL.
+    # A versão é lida antes de load: uma escrita concorrente sempre leva a uma versão nova.
+    def week_tag(self, week_start, load):
+        week_key = week_start.isoformat()
+        store_version = self.version_store.get_version(week_key)
+        if self.enabled:
+            with self._lock:
+                tag = self._week_tags.get(week_key)
+                if tag is not None and tag[0] == store_version and not self._expired(tag[1]):
+                    self._week_tags.move_to_end(week_key)
+                    return store_version, tag[2]
+        data_tag = load()
+        if self.enabled:
+            with self._lock:
+                self._week_tags[week_key] = (store_version, time.monotonic(), data_tag)
+                self._week_tags.move_to_end(week_key)
+                while len(self._week_tags) > self.max_weeks:
+                    self._week_tags.popitem(last=False)
+        return store_version, data_tag
+
+    # Retorna (payload ou None, versão atual). A versão deve ser passada para put()
+    # depois de consultar o banco, para não gravar como atual um resultado já invalidado.
+    # store_version: a devolvida por week_tag, para não ler o version store de novo.
+    def get(self, week_start, variant="bookings", data_tag=None, store_version=None):
+        week_key = week_start.isoformat()
+        if store_version is None:
+            store_version = self.version_store.get_version(week_key)
+        version = (store_version, data_tag)
+        if not self.enabled:
+            return None, version
+        entry_key = (week_key, variant)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is None:
+                return None, version
+            entry_version, created_at, payload = entry
+            if entry_version != version or self._expired(created_at):
+                self._remove(entry_key)
+                return None, version
+            self._entries.move_to_end(entry_key)
+            return payload, version
+
+    def put(self, week_start, version, payload, variant="bookings"):
+        if not self.enabled or len(payload) > self.max_bytes:
+            return
+        entry_key = (week_start.isoformat(), variant)
+        with self._lock:
+            self._remove(entry_key)
+            self._entries[entry_key] = (version, time.monotonic(), payload)
+            self._total_bytes += len(payload)
+            # Despejo LRU até respeitar os limites de semanas e de bytes
+            while len(self._entries) > self.max_weeks or self._total_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    # Invalida as semanas que contêm as datas informadas (em todos os workers, com o store compartilhado)
+    def invalidate(self, dates):
+        week_keys = {get_week_start(d).isoformat() for d in dates}
+        if not week_keys:
+            return
+        self.version_store.bump(sorted(week_keys))
+        with self._lock:
+            for entry_key in [key for key in self._entries if key[0] in week_keys]:
+                self._remove(entry_key)
+            for week_key in week_keys:
+                self._week_tags.pop(week_key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._week_tags.clear()
+            self._total_bytes = 0
+
+    def _expired(self, created_at):
+        return bool(self.ttl_seconds) and time.monotonic() - created_at > self.ttl_seconds
+
+    def _remove(self, entry_key):
+        entry = self._entries.pop(entry_key, None)
+        if entry is not None:
+            self._total_bytes -= len(entry[2])
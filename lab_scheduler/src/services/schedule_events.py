@@ -0,0 +1,214 @@
+# /home/ubuntu/lab_scheduler/src/services/schedule_events.py
+
+# Push em tempo real da grade semanal (GET /api/schedule/stream, Server-Sent Events).
+#
+# create_booking e clear_bookings gravam um ScheduleEvent por slot alterado na mesma
+# transação dos agendamentos (record_slot_events, sem commit). Em cada worker do gunicorn
+# uma única thread (ScheduleEventBroadcaster) consulta os eventos novos pelo id a cada
+# SCHEDULE_EVENTS_POLL_SECONDS e os entrega às conexões SSE daquele worker, por semana.
+# Como a fila é uma tabela, a distribuição entre workers funciona igual em SQLite e
+# PostgreSQL, com uma query barata por worker por intervalo, independente do número de
+# navegadores conectados. O worker que fez o commit chama wake() e entrega na hora.
+#
+# Os eventos são estados absolutos do slot ("taken" por fulano / "freed"), então
+# reenviar um evento já aplicado não tem efeito: o cliente pode pedir tudo desde
+# um id antigo (since / Last-Event-ID) sem risco.
+
+import json
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from src.extensions import db
+from src.models.entities import ScheduleEvent
+from src.services.schedule_cache import get_week_start
+
+# Acima disso por semana (ex.: limpeza administrativa) o cliente recebe um único "reload"
+MAX_DELTAS_PER_WEEK = 50
+
+class TooManySubscribers(Exception):
+    pass
+
+def record_slot_events(kind, bookings):
+    bookings_by_week = defaultdict(list)
+    for booking in bookings:
+        bookings_by_week[get_week_start(booking.booking_date)].append(booking)
+    for week_start, week_bookings in bookings_by_week.items():
+        if len(week_bookings) > MAX_DELTAS_PER_WEEK:
+            db.session.add(ScheduleEvent(week_start=week_start, kind="reload"))
+            continue
+        db.session.add_all([
+            ScheduleEvent(
+                week_start=week_start, kind=kind, room_id=booking.room_id, booking_date=booking.booking_date,
+                period=booking.period, user_name=booking.user.name if kind == "taken" else None
+            )
+            for booking in week_bookings
+        ])
+
+# Semanas inteiras para o cliente recarregar (ex.: o nome de um usuário mudou e aparece nos
+# agendamentos antigos dele). O novo id também muda a impressão digital dessas semanas.
+def record_week_reloads(dates):
+    db.session.add_all([ScheduleEvent(week_start=week_start, kind="reload") for week_start in sorted({get_week_start(d) for d in dates})])
+
+def get_last_event_id():
+    return db.session.query(func.max(ScheduleEvent.id)).scalar() or 0
+
+def event_to_dict(event):
+    return {
+        "id": event.id, "kind": event.kind, "room_id": event.room_id,
+        "booking_date": event.booking_date.isoformat() if event.booking_date else None,
+        "period": event.period, "user_name": event.user_name
+    }
+
+def format_sse(event_dict):
+    event_name = "reload" if event_dict["kind"] == "reload" else "slot"
+    return f"id: {event_dict['id']}\nevent: {event_name}\ndata: {json.dumps(event_dict)}\n\n"
+
+class ScheduleEventBroadcaster:
+    def __init__(self, app=None):
+        self.app = None
+        self._subscribers = defaultdict(set) # week_start -> {queue.Queue}
+        self._subscriber_count = 0
+        self._lock = threading.Lock()
+        self._wake_event = threading.Event()
+        self._thread = None
+        self._last_id = None
+        self._recent_ids = deque()
+        self._recent_id_set = set()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("SCHEDULE_EVENTS_ENABLED", True)
+        app.config.setdefault("SCHEDULE_EVENTS_POLL_SECONDS", 1.0)
+        app.config.setdefault("SCHEDULE_EVENTS_HEARTBEAT_SECONDS", 15)
+        # Conexões longas são encerradas periodicamente; o EventSource reconecta sozinho com Last-Event-ID
+        app.config.setdefault("SCHEDULE_EVENTS_STREAM_SECONDS", 300)
+        # Cada conexão SSE ocupa uma thread do worker (gunicorn gthread); o resto fica para a API
+        app.config.setdefault("SCHEDULE_EVENTS_MAX_SUBSCRIBERS", 24)
+        app.config.setdefault("SCHEDULE_EVENTS_MAX_BACKLOG", 500)
+        app.config.setdefault("SCHEDULE_EVENTS_RETENTION_HOURS", 24)
+        # No PostgreSQL um id menor pode ficar visível depois de um maior (commits fora de
+        # ordem); cada consulta relê essa margem de ids e ignora os já entregues
+        app.config.setdefault("SCHEDULE_EVENTS_LOOKBACK_IDS", 100)
+        self.app = app
+        app.extensions["schedule_events"] = self
+
+    # Eventos da semana depois de since_id, para quem está conectando ou reconectando.
+    # Retorna None se não há como reconstruir o intervalo (cliente deve recarregar a grade):
+    # eventos depois de since_id já foram apagados pela retenção, ou são muitos.
+    def get_backlog(self, week_start, since_id):
+        max_backlog = self.app.config["SCHEDULE_EVENTS_MAX_BACKLOG"]
+        oldest_id = db.session.query(func.min(ScheduleEvent.id)).scalar()
+        if oldest_id is not None and since_id < oldest_id - 1:
+            return None
+        events = ScheduleEvent.query.filter(
+            ScheduleEvent.week_start == week_start, ScheduleEvent.id > since_id
+        ).order_by(ScheduleEvent.id).limit(max_backlog + 1).all()
+        if len(events) > max_backlog:
+            return None
+        return [event_to_dict(event) for event in events]
+
+    def subscribe(self, week_start):
+        subscriber = queue.Queue()
+        with self._lock:
+            if self._subscriber_count >= self.app.config["SCHEDULE_EVENTS_MAX_SUBSCRIBERS"]:
+                raise TooManySubscribers()
+            self._subscribers[week_start].add(subscriber)
+            self._subscriber_count += 1
+        self.start()
+        return subscriber
+
+    def unsubscribe(self, week_start, subscriber):
+        with self._lock:
+            week_subscribers = self._subscribers.get(week_start)
+            if week_subscribers and subscriber in week_subscribers:
+                week_subscribers.discard(subscriber)
+                self._subscriber_count -= 1
+                if not week_subscribers:
+                    del self._subscribers[week_start]
+
+    # Gerador da resposta SSE; roda fora do contexto da requisição (não usa o banco)
+    def stream(self, week_start, subscriber, backlog):
+        heartbeat_seconds = self.app.config["SCHEDULE_EVENTS_HEARTBEAT_SECONDS"]
+        deadline = time.monotonic() + self.app.config["SCHEDULE_EVENTS_STREAM_SECONDS"]
+        try:
+            yield "retry: 3000\n\n"
+            if backlog is None:
+                yield "event: reload\ndata: {}\n\n"
+                return
+            for event_dict in backlog:
+                yield format_sse(event_dict)
+            while time.monotonic() < deadline:
+                try:
+                    event_dict = subscriber.get(timeout=heartbeat_seconds)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event_dict)
+        finally:
+            self.unsubscribe(week_start, subscriber)
+
+    def start(self):
+        if self._thread is not None or not self.app.config["SCHEDULE_EVENTS_ENABLED"]:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="schedule-events-broadcaster", daemon=True)
+            self._thread.start()
+
+    # Chamado depois do commit de novos eventos para entregar sem esperar o próximo ciclo
+    def wake(self):
+        self._wake_event.set()
+
+    def _run(self):
+        last_cleanup = time.monotonic()
+        while True:
+            with self.app.app_context():
+                try:
+                    if self._last_id is None:
+                        self._last_id = get_last_event_id()
+                    self._poll()
+                    if time.monotonic() - last_cleanup > 600:
+                        self._delete_expired_events()
+                        last_cleanup = time.monotonic()
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.error(f"Schedule events broadcaster error: {str(e)}", exc_info=True)
+                finally:
+                    db.session.remove()
+            self._wake_event.wait(self.app.config["SCHEDULE_EVENTS_POLL_SECONDS"])
+            self._wake_event.clear()
+
+    def _poll(self):
+        lookback = self.app.config["SCHEDULE_EVENTS_LOOKBACK_IDS"]
+        events = ScheduleEvent.query.filter(
+            ScheduleEvent.id > max(self._last_id - lookback, 0)
+        ).order_by(ScheduleEvent.id).all()
+        for event in events:
+            if event.id in self._recent_id_set:
+                continue
+            self._remember(event.id)
+            self._last_id = max(self._last_id, event.id)
+            event_dict = event_to_dict(event)
+            with self._lock:
+                week_subscribers = list(self._subscribers.get(event.week_start, ()))
+            for subscriber in week_subscribers:
+                subscriber.put(event_dict)
+
+    def _remember(self, event_id):
+        self._recent_ids.append(event_id)
+        self._recent_id_set.add(event_id)
+        # Só precisamos lembrar dos ids dentro da margem de releitura
+        while len(self._recent_ids) > 10 * self.app.config["SCHEDULE_EVENTS_LOOKBACK_IDS"]:
+            self._recent_id_set.discard(self._recent_ids.popleft())
+
+    def _delete_expired_events(self):
+        cutoff = datetime.utcnow() - timedelta(hours=self.app.config["SCHEDULE_EVENTS_RETENTION_HOURS"])
+        ScheduleEvent.query.filter(ScheduleEvent.created_at < cutoff).delete(synchronize_session=False)
+        db.session.commit()
+
+schedule_events = ScheduleEventBroadcaster()
@@ -0,0 +1,85 @@
+# /home/ubuntu/lab_scheduler/src/services/schedule_export.py
+
+# Exportação da escala para um intervalo de datas (GET /api/export).
+#
+# Os agendamentos do intervalo inteiro vêm de uma única query (booking_export_rows_query),
+# lida em lotes com yield_per:
+#   - CSV: gerado linha a linha e enviado em blocos (resposta em streaming), então a
+#     memória não cresce com o tamanho do intervalo;
+#   - PDF: todas as semanas em um único documento, com uma única execução do WeasyPrint
+#     no pool de renderização. O WeasyPrint precisa do documento inteiro em memória, por
+#     isso o intervalo do PDF é limitado a EXPORT_PDF_MAX_WEEKS semanas.
+
+import csv
+import io
+from datetime import timedelta
+from src.services.room_registry import room_registry
+from src.services.booking_queries import booking_export_rows_query
+from src.services.pdf_cache import pdf_cache, build_schedule_data, DAYS_LOCALE
+from src.services.pdf_renderer import pdf_render_pool
+
+RANGE_PDF_TEMPLATE_NAME = "schedule_range_pdf_template.html"
+EXPORT_PDF_MAX_WEEKS = 26
+EXPORT_CSV_BATCH_SIZE = 500
+
+CSV_HEADER = ["data", "dia", "periodo", "sala", "usuario", "email", "coordenador"]
+
+def iter_bookings_csv(start_date, end_date, batch_size=EXPORT_CSV_BATCH_SIZE):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("﻿") # BOM: o Excel abre o arquivo com os acentos corretos
+    writer.writerow(CSV_HEADER)
+    pending_rows = 0
+    rooms = room_registry.get()
+    for row in booking_export_rows_query(start_date, end_date).yield_per(batch_size):
+        weekday = row.booking_date.weekday()
+        if weekday >= 5: # Mesma regra de exclude_weekend_bookings
+            continue
+        writer.writerow([
+            row.booking_date.isoformat(), DAYS_LOCALE[weekday], row.period,
+            rooms.name_of(row.room_id), row.user_name, row.user_email, row.coordinator_name
+        ])
+        pending_rows += 1
+        if pending_rows >= batch_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending_rows = 0
+    yield buffer.getvalue()
+
+# Segundas-feiras de first_monday até last_monday (inclusive)
+def get_week_starts(first_monday, last_monday):
+    week_count = (last_monday - first_monday).days // 7 + 1
+    return [first_monday + timedelta(days=7 * i) for i in range(week_count)]
+
+def render_range_html(week_starts):
+    range_start = week_starts[0]
+    range_end = week_starts[-1] + timedelta(days=4)
+    rows_by_week = {week_start: [] for week_start in week_starts}
+    for row in booking_export_rows_query(range_start, range_end).yield_per(EXPORT_CSV_BATCH_SIZE):
+        weekday = row.booking_date.weekday()
+        if weekday < 5:
+            rows_by_week[row.booking_date - timedelta(days=weekday)].append(row)
+
+    weeks = []
+    for week_start in week_starts:
+        week_end = week_start + timedelta(days=4)
+        weeks.append({
+            "dates_of_week": [(week_start + timedelta(days=i)).isoformat() for i in range(5)],
+            "schedule_data": build_schedule_data(rows_by_week[week_start]),
+            "week_start_date_formatted": week_start.strftime("%d/%m/%Y"),
+            "week_end_date_formatted": week_end.strftime("%d/%m/%Y")
+        })
+
+    template = pdf_cache.get_jinja_env().get_template(RANGE_PDF_TEMPLATE_NAME)
+    return template.render(
+        rooms=room_registry.get().rooms,
+        days_locale=DAYS_LOCALE,
+        weeks=weeks,
+        range_start_date_formatted=range_start.strftime("%d/%m/%Y"),
+        range_end_date_formatted=range_end.strftime("%d/%m/%Y")
+    )
+
+# Pode levantar PdfRenderUnavailable (pool de renderização ocupado)
+def render_range_pdf(week_starts):
+    return pdf_render_pool.render(render_range_html(week_starts))
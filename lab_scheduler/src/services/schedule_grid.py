@@ -0,0 +1,43 @@
+# /home/ubuntu/lab_scheduler/src/services/schedule_grid.py
+
+# Grade compacta da semana para o frontend (GET /api/schedule/grid).
+#
+# Em vez de um objeto por agendamento (repetindo sala, e-mail, coordenador e data), a
+# grade tem uma linha por sala (na ordem de room_ids) com uma célula por dia e período:
+#   cells[linha][dia * len(periods) + período] = índice em names, ou -1 se livre.
+# Os nomes aparecem uma única vez em names. A grade é montada em uma passada pelas
+# tuplas da semana, usando o índice sala -> linha já calculado.
+
+from datetime import timedelta
+
+GRID_DAYS = 5 # Segunda a sexta
+GRID_PERIODS = ["Manhã", "Tarde"]
+FREE_CELL = -1
+
+_PERIOD_INDEX = {period: i for i, period in enumerate(GRID_PERIODS)}
+
+# rows: tuplas (room_id, booking_date, period, user_name) de week_grid_rows_query
+def build_week_grid(week_start, room_ids, room_index, rows):
+    periods_per_day = len(GRID_PERIODS)
+    cells = [[FREE_CELL] * (GRID_DAYS * periods_per_day) for _ in room_ids]
+    names = []
+    name_index = {}
+    for room_id, booking_date, period, user_name in rows:
+        row = room_index.get(room_id)
+        period_index = _PERIOD_INDEX.get(period)
+        day = (booking_date - week_start).days
+        if row is None or period_index is None or not 0 <= day < GRID_DAYS:
+            continue
+        index = name_index.get(user_name)
+        if index is None:
+            index = name_index[user_name] = len(names)
+            names.append(user_name)
+        cells[row][day * periods_per_day + period_index] = index
+    return {
+        "week_start": week_start.isoformat(),
+        "dates": [(week_start + timedelta(days=i)).isoformat() for i in range(GRID_DAYS)],
+        "periods": GRID_PERIODS,
+        "room_ids": room_ids,
+        "names": names,
+        "cells": cells
+    }
@@ -19,7 +19,12 @@ document.addEventListener("DOMContentLoaded", () => {
     const API_BASE_URL = "/api";
     let allRooms = [];
     let selectedSlots = []; // Stores { roomId, roomName, date, period, cellRef }
-    let currentFetchedBookings = [];
+    let currentGrid = null; // Grade compacta da semana (/api/schedule/grid)
+    let cellsBySlot = new Map(); // "roomId|data|período" -> { cell, room, date, period }
+    let scheduleStream = null; // EventSource da semana exibida
+    let scheduleStreamRetryTimer = null;
+    let lastScheduleEventId = 0;
+    let bookingSubmissionInProgress = false; // Eventos dos próprios slots chegam durante o POST
     let currentWeekStartDate; // Monday of the currently displayed week
     let currentBookingStatus = {}; // Store booking window status
 
@@ -91,12 +96,44 @@ document.addEventListener("DOMContentLoaded", () => {
         bookingStatusMessage.className = "message info";
     }
 
+    // --- Conditional GET (ETag) ---
+    // Guarda o último ETag e corpo de cada URL no localStorage e envia If-None-Match;
+    // se nada mudou o servidor responde 304 sem corpo e reaproveitamos o corpo guardado.
+    async function fetchJsonWithValidators(url) {
+        const storageKey = `etag-cache:${url}`;
+        let stored = null;
+        try {
+            stored = JSON.parse(localStorage.getItem(storageKey));
+        } catch (error) {
+            stored = null;
+        }
+        const headers = {};
+        if (stored && stored.etag) headers["If-None-Match"] = stored.etag;
+
+        const response = await fetch(url, { headers, cache: "no-store" });
+        if (response.status === 304 && stored) {
+            return { response, data: stored.body, notModified: true };
+        }
+        if (!response.ok) return { response, data: null, notModified: false };
+
+        const data = await response.json();
+        const etag = response.headers.get("ETag");
+        if (etag) {
+            try {
+                localStorage.setItem(storageKey, JSON.stringify({ etag, body: data }));
+            } catch (error) {
+                console.warn("Não foi possível guardar resposta no localStorage:", error);
+            }
+        }
+        return { response, data, notModified: false };
+    }
+
     // --- Room Data --- 
     async function fetchAllRooms() {
         try {
-            const response = await fetch(`${API_BASE_URL}/rooms`);
-            if (!response.ok) throw new Error(`Erro ao buscar salas: ${response.statusText}`);
-            allRooms = await response.json();
+            const { response, data } = await fetchJsonWithValidators(`${API_BASE_URL}/rooms`);
+            if (!data) throw new Error(`Erro ao buscar salas: ${response.statusText}`);
+            allRooms = data;
         } catch (error) {
             console.error("Falha ao buscar salas:", error);
             showScheduleMessage("Não foi possível carregar dados das salas. Tente recarregar.", "error");
@@ -106,9 +143,14 @@ document.addEventListener("DOMContentLoaded", () => {
     // --- Booking Status --- 
     async function fetchBookingStatus() {
         try {
+            // O servidor manda Cache-Control/Expires até a próxima mudança de status
+            // (next_transition_at): usa o cache HTTP do navegador em vez de no-store.
+            // server_time_utc pode ser de quando o status foi calculado; até a transição
+            // qualquer instante leva às mesmas decisões.
             const response = await fetch(`${API_BASE_URL}/booking-status`);
             if (!response.ok) throw new Error(`Erro ao buscar status: ${response.statusText}`);
-            currentBookingStatus = await response.json();
+            const data = await response.json();
+            currentBookingStatus = data;
             showBookingStatusMessage(currentBookingStatus);
             return currentBookingStatus; // Return status for default week logic
         } catch (error) {
@@ -195,9 +237,9 @@ document.addEventListener("DOMContentLoaded", () => {
             // Status might already be fetched if loading default week
             const promises = [
                 (async () => {
-                    const response = await fetch(`${API_BASE_URL}/bookings?start_date=${startDateStrAPI}&end_date=${endDateStrAPI}`);
-                    if (!response.ok) throw new Error(`Erro ao buscar agendamentos: ${response.statusText}`);
-                    currentFetchedBookings = await response.json();
+                    const { response, data } = await fetchJsonWithValidators(`${API_BASE_URL}/schedule/grid?week_start=${startDateStrAPI}`);
+                    if (!data) throw new Error(`Erro ao buscar agendamentos: ${response.statusText}`);
+                    currentGrid = data;
                 })(),
                 (async () => {
                      if (allRooms.length === 0) await fetchAllRooms();
@@ -210,7 +252,8 @@ document.addEventListener("DOMContentLoaded", () => {
             
             await Promise.all(promises);
             
-            renderScheduleTable(currentFetchedBookings, allRooms, currentWeekStartDate);
+            renderScheduleTable(currentGrid, allRooms, currentWeekStartDate);
+            connectScheduleStream(startDateStrAPI, currentGrid.last_event_id || 0);
             showScheduleMessage("Escala carregada.", "success");
         } catch (error) {
             console.error("Falha ao carregar escala:", error);
@@ -220,11 +263,12 @@ document.addEventListener("DOMContentLoaded", () => {
     }
 
     // Renders the schedule table for 5 days (Mon-Fri)
-        function renderScheduleTable(bookings, roomsData, weekStartDateObj) {
+    // grid.cells[linha da sala][dia * períodos + período] = índice em grid.names, ou -1 (livre)
+        function renderScheduleTable(grid, roomsData, weekStartDateObj) {
         scheduleTableContainer.innerHTML = "";
         selectedSlots = [];
+        cellsBySlot = new Map();
         updateProceedButtonState();
-        const todayUTC = getTodayUTC();
 
         const table = document.createElement("table");
         table.id = "scheduleTable"; // Add ID for PDF generation
@@ -260,39 +304,21 @@ document.addEventListener("DOMContentLoaded", () => {
         thead.appendChild(subHeaderRow);
         table.appendChild(thead);
 
+        const gridRowByRoomId = new Map(grid.room_ids.map((roomId, index) => [roomId, index]));
+
         roomsData.sort((a,b) => a.id - b.id).forEach(room => {
+            const gridRow = gridRowByRoomId.has(room.id) ? grid.cells[gridRowByRoomId.get(room.id)] : null;
             const row = document.createElement("tr");
             const roomCell = document.createElement("td");
             roomCell.textContent = room.name;
             row.appendChild(roomCell);
 
-            datesOfWeek.forEach(dateStr => {
-                const slotDateUTC = parseDateStrToUTC(dateStr);
-                const isPastDate = slotDateUTC < todayUTC;
-                const isBookingAllowedForSlot = checkBookingWindowFrontend(slotDateUTC);
-
-                periods.forEach(period => {
+            datesOfWeek.forEach((dateStr, dayIndex) => {
+                periods.forEach((period, periodIndex) => {
                     const cell = document.createElement("td");
-                    const booking = bookings.find(b => 
-                        b.room_id === room.id && 
-                        b.booking_date === dateStr && 
-                        b.period === period
-                    );
-                    if (booking) {
-                        cell.textContent = booking.user_name;
-                        cell.classList.add("booked");
-                    } else if (!isBookingAllowedForSlot) {
-                        cell.textContent = "Bloqueado";
-                        cell.classList.add("locked"); // New class for slots outside booking window
-                    } else {
-                        cell.textContent = "Disponível";
-                        cell.classList.add("available");
-                        cell.dataset.roomId = room.id;
-                        cell.dataset.roomName = room.name;
-                        cell.dataset.date = dateStr;
-                        cell.dataset.period = period;
-                        cell.addEventListener("click", handleSlotClick);
-                    }
+                    const nameIndex = gridRow ? gridRow[dayIndex * periods.length + periodIndex] : -1;
+                    setCellState(cell, room, dateStr, period, nameIndex >= 0 ? grid.names[nameIndex] : null);
+                    cellsBySlot.set(`${room.id}|${dateStr}|${period}`, { cell, room, date: dateStr, period });
                     row.appendChild(cell);
                 });
             });
@@ -302,6 +328,70 @@ document.addEventListener("DOMContentLoaded", () => {
         scheduleTableContainer.appendChild(table);
     }
 
+    // Estado de uma célula: reservada (userName), bloqueada ou disponível para seleção
+    function setCellState(cell, room, dateStr, period, userName) {
+        cell.className = "";
+        cell.removeEventListener("click", handleSlotClick);
+        if (userName) {
+            cell.textContent = userName;
+            cell.classList.add("booked");
+        } else if (!checkBookingWindowFrontend(parseDateStrToUTC(dateStr))) {
+            cell.textContent = "Bloqueado";
+            cell.classList.add("locked"); // New class for slots outside booking window
+        } else {
+            cell.textContent = "Disponível";
+            cell.classList.add("available");
+            cell.dataset.roomId = room.id;
+            cell.dataset.roomName = room.name;
+            cell.dataset.date = dateStr;
+            cell.dataset.period = period;
+            cell.addEventListener("click", handleSlotClick);
+        }
+    }
+
+    // --- Atualizações em tempo real (Server-Sent Events) ---
+    // O servidor envia cada slot reservado/liberado na semana exibida e a grade é corrigida
+    // no lugar, sem recarregar a escala inteira.
+    function connectScheduleStream(weekStartStr, sinceId) {
+        if (scheduleStream) scheduleStream.close();
+        clearTimeout(scheduleStreamRetryTimer);
+        if (!window.EventSource) return;
+        lastScheduleEventId = Math.max(lastScheduleEventId, sinceId);
+        scheduleStream = new EventSource(`${API_BASE_URL}/schedule/stream?week_start=${weekStartStr}&since=${sinceId}`);
+        scheduleStream.addEventListener("slot", event => {
+            lastScheduleEventId = Math.max(lastScheduleEventId, Number(event.lastEventId) || 0);
+            applySlotEvent(JSON.parse(event.data));
+        });
+        scheduleStream.addEventListener("reload", () => {
+            // Muitas alterações de uma vez (ou histórico perdido): recarrega a semana
+            scheduleStream.close();
+            loadScheduleData(weekStartStr);
+        });
+        scheduleStream.onerror = () => {
+            // O navegador reconecta sozinho em quedas; se o servidor recusou (ex.: 503), tenta mais tarde
+            if (scheduleStream.readyState === EventSource.CLOSED) {
+                scheduleStreamRetryTimer = setTimeout(() => connectScheduleStream(weekStartStr, lastScheduleEventId), 30000);
+            }
+        };
+    }
+
+    function applySlotEvent(slotEvent) {
+        const entry = cellsBySlot.get(`${slotEvent.room_id}|${slotEvent.booking_date}|${slotEvent.period}`);
+        if (!entry) return; // Outra semana ou sala fora da grade
+        const selectedIndex = selectedSlots.findIndex(s => s.cellRef === entry.cell);
+        if (selectedIndex > -1 && bookingSubmissionInProgress) {
+            return; // Provavelmente o próprio agendamento; handleModalFormSubmit atualiza a célula
+        }
+        if (slotEvent.kind === "taken" && selectedIndex > -1) {
+            selectedSlots.splice(selectedIndex, 1);
+            showScheduleMessage(`${entry.room.name} (${entry.period}) acabou de ser reservada por outra pessoa.`, "error");
+        } else if (selectedIndex > -1) {
+            return; // Slot liberado que o usuário já selecionou: mantém a seleção
+        }
+        setCellState(entry.cell, entry.room, entry.date, entry.period, slotEvent.kind === "taken" ? slotEvent.user_name : null);
+        updateProceedButtonState();
+    }
+
     // Frontend check based on fetched status (uses UTC dates)
     function checkBookingWindowFrontend(slotDateUTC) {
         if (!currentBookingStatus || !currentBookingStatus.current_week_start) {
@@ -443,6 +533,32 @@ document.addEventListener("DOMContentLoaded", () => {
         bookingModal.style.display = "none";
     }
 
+    // No pico da abertura o servidor pode responder 503 com a posição na fila e um queue_token;
+    // tentamos de novo após Retry-After enviando o token, que mantém o lugar original na fila
+    const MAX_QUEUE_ATTEMPTS = 20;
+    async function postBookingWithQueue(requestData) {
+        let queueToken = null;
+        let response = null;
+        for (let attempt = 0; attempt < MAX_QUEUE_ATTEMPTS; attempt++) {
+            const headers = { "Content-Type": "application/json" };
+            if (queueToken) headers["X-Queue-Token"] = queueToken;
+            response = await fetch(`${API_BASE_URL}/bookings`, {
+                method: "POST",
+                headers,
+                body: JSON.stringify(requestData)
+            });
+            if (response.status !== 503) return response;
+            const result = await response.clone().json().catch(() => ({}));
+            if (!result.queue_token) return response;
+            queueToken = result.queue_token;
+            const retryAfterMs = result.retry_after_ms || (Number(response.headers.get("Retry-After")) || 2) * 1000;
+            showModalMessage(`Muitos agendamentos neste momento. Você está na posição ${result.queue_position} da fila; tentando novamente...`, "info");
+            // Pequena variação para as novas tentativas não chegarem todas juntas
+            await new Promise(resolve => setTimeout(resolve, retryAfterMs * (0.8 + Math.random() * 0.4)));
+        }
+        return response;
+    }
+
     async function handleModalFormSubmit(event) {
         event.preventDefault();
         const formData = new FormData(modalBookingForm);
@@ -463,12 +579,9 @@ document.addEventListener("DOMContentLoaded", () => {
         }
 
         showModalMessage("Processando agendamento...", "");
+        bookingSubmissionInProgress = true;
         try {
-            const response = await fetch(`${API_BASE_URL}/bookings`, {
-                method: "POST",
-                headers: { "Content-Type": "application/json" },
-                body: JSON.stringify(requestData)
-            });
+            const response = await postBookingWithQueue(requestData);
             const result = await response.json();
             if (response.ok) {
                 showModalMessage(result.message || "Agendamento(s) realizado(s) com sucesso!", "success");
@@ -496,6 +609,8 @@ document.addEventListener("DOMContentLoaded", () => {
         } catch (error) {
             console.error("Erro ao submeter agendamento do modal:", error);
             showModalMessage("Falha na comunicação com o servidor. Tente novamente.", "error");
+        } finally {
+            bookingSubmissionInProgress = false;
         }
     }
 
@@ -0,0 +1,213 @@
+# /home/ubuntu/lab_scheduler/src/static_assets.py
+
+# Arquivos estáticos da página (index.html, script.js, style.css, imagens).
+#
+# Build (flask --app src.main build-assets, uma vez por deploy): copia src/static para
+# STATIC_BUILD_DIR com o hash do conteúdo no nome (style.3f9a0c1d2e4b.css), reescreve as
+# referências no HTML e no CSS e grava ao lado as versões .gz e .br (Brotli, se o pacote
+# estiver instalado) dos arquivos de texto. index.html mantém o nome, porque é a URL da página.
+# Arquivos de builds anteriores não são apagados: uma página antiga ainda aberta continua
+# encontrando os seus assets durante o deploy.
+#
+# Servidor: o diretório é lido uma vez por processo num índice em memória (caminho da URL ->
+# arquivo, tamanho, variantes comprimidas); nenhum request consulta o disco para saber se um
+# arquivo existe. A variante é escolhida pelo Accept-Encoding (br, depois gzip), os arquivos com
+# hash vão com "Cache-Control: public, max-age=31536000, immutable" e os demais (index.html, nomes
+# sem hash) com "no-cache" + ETag. O corpo vai por wsgi.file_wrapper, que no gunicorn usa
+# sendfile() (sem cópia pelo Python).
+#
+# Sem build (desenvolvimento), o índice aponta para src/static, sem compressão nem hash.
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+from datetime import datetime, timezone
+from flask import request
+from werkzeug.http import http_date, is_resource_modified
+from werkzeug.wsgi import wrap_file
+
+try:
+    import brotli
+except ImportError: # Opcional: sem o pacote o build gera só .gz
+    brotli = None
+
+MANIFEST_NAME = "manifest.json"
+ENTRY_POINTS = ("index.html",) # Mantêm o nome (URLs da página)
+HASH_LENGTH = 12
+HASHED_NAME_RE = re.compile(r"\.[0-9a-f]{%d}\.[^./]+$" % HASH_LENGTH)
+# Arquivos cujas referências a outros assets são reescritas, na ordem do build
+REWRITE_EXTENSIONS = (".css", ".html")
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+COMPRESS_MIN_BYTES = 256
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Content-Encoding -> extensão, na ordem de preferência
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+def is_compressible(mimetype):
+    return mimetype is not None and mimetype.startswith(COMPRESSIBLE_TYPES)
+
+def hashed_name(rel_path, content):
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    root, ext = os.path.splitext(rel_path)
+    return f"{root}.{digest}{ext}"
+
+def _write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+# Referências "style.css", 'images/logo.png', url(style.css) ou "/style.css" (caminhos a partir
+# da raiz de src/static), trocadas pelos nomes com hash
+def _rewrite_references(content, manifest):
+    if not manifest:
+        return content
+    names = sorted(manifest, key=len, reverse=True)
+    pattern = re.compile(r"(?<=[\"'(/])(%s)(?=[\"')?#])" % "|".join(re.escape(name) for name in names))
+    return pattern.sub(lambda match: manifest[match.group(1)], content.decode("utf-8")).encode("utf-8")
+
+def _build_order(rel_path):
+    ext = os.path.splitext(rel_path)[1]
+    return (REWRITE_EXTENSIONS.index(ext) + 1 if ext in REWRITE_EXTENSIONS else 0, rel_path)
+
+def _compressed_variants(content, mimetype):
+    if not is_compressible(mimetype) or len(content) < COMPRESS_MIN_BYTES:
+        return {}
+    variants = {".gz": gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = brotli.compress(content, quality=11)
+    return {ext: data for ext, data in variants.items() if len(data) < len(content)}
+
+def build_static_assets(source_dir, output_dir, logger=None):
+    sources = []
+    for dirpath, dirnames, filenames in os.walk(source_dir):
+        dirnames[:] = sorted(name for name in dirnames if not name.startswith("."))
+        for filename in sorted(filenames):
+            if not filename.startswith("."):
+                sources.append(os.path.relpath(os.path.join(dirpath, filename), source_dir).replace(os.sep, "/"))
+    # Primeiro os arquivos referenciados (imagens, JS), depois o CSS e por fim o HTML, para que
+    # o hash de quem referencia já inclua os nomes novos
+    sources.sort(key=_build_order)
+    manifest = {}
+    for rel_path in sources:
+        with open(os.path.join(source_dir, rel_path), "rb") as f:
+            content = f.read()
+        if os.path.splitext(rel_path)[1] in REWRITE_EXTENSIONS:
+            content = _rewrite_references(content, manifest)
+        output_name = rel_path if rel_path in ENTRY_POINTS else hashed_name(rel_path, content)
+        output_path = os.path.join(output_dir, output_name)
+        _write_file(output_path, content)
+        variants = _compressed_variants(content, mimetypes.guess_type(rel_path)[0])
+        for ext, data in variants.items():
+            _write_file(output_path + ext, data)
+        if rel_path not in ENTRY_POINTS:
+            manifest[rel_path] = output_name
+        if logger:
+            sizes = ", ".join(f"{ext} {len(data)}" for ext, data in variants.items())
+            logger.info("Asset %s -> %s (%d bytes%s)", rel_path, output_name, len(content), f"; {sizes}" if sizes else "")
+    _write_file(os.path.join(output_dir, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+    return manifest
+
+# Um arquivo do índice. variants: Content-Encoding -> (caminho, tamanho)
+class StaticAsset:
+    __slots__ = ("path", "size", "mtime", "last_modified", "mimetype", "etag", "immutable", "variants")
+
+    def __init__(self, path, size, mtime, mimetype, immutable, variants):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.last_modified = datetime.fromtimestamp(int(mtime), timezone.utc)
+        self.mimetype = mimetype
+        self.etag = f"{int(mtime)}-{size}"
+        self.immutable = immutable
+        self.variants = variants
+
+class StaticAssets:
+    def __init__(self, app=None):
+        self.app = None
+        self.root = None
+        self.built = False
+        self._index = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("STATIC_BUILD_DIR", os.path.join(os.path.dirname(app.root_path), "build", "static"))
+        self.app = app
+        app.extensions["static_assets"] = self
+        self.load()
+
+    # Monta o índice (uma listagem do diretório, sem ler os arquivos)
+    def load(self):
+        build_dir = self.app.config["STATIC_BUILD_DIR"]
+        self.built = os.path.exists(os.path.join(build_dir, MANIFEST_NAME))
+        self.root = build_dir if self.built else self.app.static_folder
+        files = {}
+        if self.root and os.path.isdir(self.root):
+            for dirpath, _, filenames in os.walk(self.root):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    files[os.path.relpath(path, self.root).replace(os.sep, "/")] = os.stat(path)
+        index = {}
+        for rel_path, stat in files.items():
+            if rel_path == MANIFEST_NAME or rel_path.endswith((".gz", ".br", ".tmp")):
+                continue
+            variants = {}
+            if self.built:
+                for encoding, ext in ENCODINGS:
+                    if rel_path + ext in files:
+                        variants[encoding] = (os.path.join(self.root, rel_path + ext), files[rel_path + ext].st_size)
+            immutable = self.built and HASHED_NAME_RE.search(rel_path) is not None
+            index[rel_path] = StaticAsset(os.path.join(self.root, rel_path), stat.st_size, stat.st_mtime,
+                                          mimetypes.guess_type(rel_path)[0] or "application/octet-stream", immutable, variants)
+        if self.built:
+            # Nomes originais (de páginas em cache de antes do build) levam à versão atual, sem cache longo
+            with open(os.path.join(build_dir, MANIFEST_NAME), encoding="utf-8") as f:
+                for rel_path, output_name in json.load(f).items():
+                    asset = index.get(output_name)
+                    if asset is not None and rel_path not in index:
+                        index[rel_path] = StaticAsset(asset.path, asset.size, asset.mtime, asset.mimetype, False, asset.variants)
+        else:
+            self.app.logger.info("Static assets served from %s without build (run flask --app src.main build-assets)", self.root)
+        self._index = index
+
+    def get(self, path):
+        return self._index.get(path)
+
+    def send(self, asset):
+        if not self.built:
+            # Sem build (desenvolvimento) os arquivos podem mudar com o servidor rodando
+            stat = os.stat(asset.path)
+            asset = StaticAsset(asset.path, stat.st_size, stat.st_mtime, asset.mimetype, False, {})
+        path, size, encoding = asset.path, asset.size, None
+        if asset.variants:
+            for candidate, _ in ENCODINGS:
+                if candidate in asset.variants and request.accept_encodings[candidate]:
+                    encoding = candidate
+                    path, size = asset.variants[candidate]
+                    break
+        etag = f"{asset.etag}-{encoding}" if encoding else asset.etag
+        headers = {"ETag": f'"{etag}"', "Last-Modified": http_date(asset.last_modified)}
+        if asset.variants:
+            headers["Vary"] = "Accept-Encoding"
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        response_class = self.app.response_class
+        if not is_resource_modified(request.environ, etag=etag, last_modified=asset.last_modified):
+            response = response_class(status=304, headers=headers)
+        else:
+            data = wrap_file(request.environ, open(path, "rb"))
+            response = response_class(data, mimetype=asset.mimetype, headers=headers, direct_passthrough=True)
+            response.content_length = size
+            response.make_conditional(request.environ, accept_ranges=True, complete_length=size)
+        if asset.immutable:
+            response.headers["Cache-Control"] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response
+
+static_assets = StaticAssets()
@@ -0,0 +1,53 @@
+# /home/ubuntu/lab_scheduler/tests/conftest.py
+
+# Fixtures dos testes (python -m pytest, a partir da pasta lab_scheduler).
+# Cada teste recebe uma aplicação nova (create_app) sobre um SQLite temporário, sem a thread
+# de e-mails nem os processos de PDF.
+#   - app_context: para chamar os serviços direto (db.session etc.); o schema fica a cargo do
+#     teste (init_database ou um banco "antigo" montado à mão);
+#   - client: banco pronto (init_database, salas padrão) e nenhum contexto ativo, para que cada
+#     request abra o seu (g, sessão e X-Query-Count como em produção). Para olhar o banco no
+#     meio do teste, use with app.app_context().
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.extensions import db
+from src.main import create_app, init_database
+from src.services.room_registry import room_registry
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'lab_scheduler.db'}")
+    monkeypatch.setenv("EMAIL_OUTBOX_DISPATCHER_ENABLED", "false")
+    monkeypatch.setenv("PDF_RENDER_WORKERS", "0")
+    monkeypatch.setenv("PDF_CACHE_DIR", str(tmp_path / "pdf_cache"))
+    monkeypatch.setenv("BOOKINGS_ARCHIVE_DIR", str(tmp_path / "archives"))
+    monkeypatch.setenv("STATIC_BUILD_DIR", str(tmp_path / "static_build"))
+    app = create_app()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+@pytest.fixture
+def client(app):
+    with app.app_context():
+        init_database(app)
+        db.session.remove()
+    return app.test_client()
+
+# Nome da sala -> id, das salas criadas por init_database
+@pytest.fixture
+def room_ids(app, client):
+    with app.app_context():
+        return {room.name: room.id for room in room_registry.get().rooms}
@@ -0,0 +1,91 @@
+# /home/ubuntu/lab_scheduler/tests/test_booking_admission.py
+
+# Controle de admissão de POST /api/bookings (src/services/booking_admission.py):
+#   - pedidos simultâneos do mesmo usuário não passam todos pelo limite por usuário;
+#   - só agendamentos criados contam no limite (um 409 devolve o lugar);
+#   - com o worker ocupado o pedido recebe 503 + Retry-After e um queue_token, e a nova
+#     tentativa com X-Queue-Token é atendida.
+
+import threading
+from datetime import date
+
+import pytest
+
+from src.routes import booking_routes
+from src.services.booking_admission import AdmissionRejected, booking_admission
+
+PAST_MONDAY = date(2025, 3, 3) # Semanas passadas sempre aceitam agendamentos
+
+def booking_request(room_id, period="Manhã", user_name="Ana"):
+    return {
+        "user_name": user_name, "user_email": "lab@itv.org", "coordinator_name": "Coord",
+        "slots": [{"room_id": room_id, "booking_date": PAST_MONDAY.isoformat(), "period": period}]
+    }
+
+def test_concurrent_requests_reserve_the_rate_limit(app_context):
+    app_context.config["BOOKING_RATE_LIMIT_PER_USER"] = 5
+    barrier = threading.Barrier(20)
+    reservations, rejected = [], []
+
+    def request_booking():
+        barrier.wait()
+        try:
+            reservations.append(booking_admission.check_rate_limit("ana"))
+        except AdmissionRejected as e:
+            rejected.append(e.reason)
+
+    threads = [threading.Thread(target=request_booking) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(reservations) == 5
+    assert rejected == ["rate_limited"] * 15
+
+    # Um pedido que não criou o agendamento devolve o lugar
+    booking_admission.release_booking("ana", reservations[0])
+    booking_admission.check_rate_limit("ana")
+    with pytest.raises(AdmissionRejected):
+        booking_admission.check_rate_limit("ana")
+
+def test_only_created_bookings_count(app, client, room_ids):
+    app.config["BOOKING_RATE_LIMIT_PER_USER"] = 1
+    room_id = room_ids["Geologia 1"]
+    assert client.post("/api/bookings", json=booking_request(room_id, user_name="Bruno")).status_code == 200
+    assert client.post("/api/bookings", json=booking_request(room_id)).status_code == 409
+    assert client.post("/api/bookings", json=booking_request(room_id, period="Tarde")).status_code == 200
+    response = client.post("/api/bookings", json=booking_request(room_ids["Cultivo A1"]))
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+
+# Um pedido fica preso dentro da view; sem fila, o seguinte é recusado na hora
+def test_busy_worker_returns_queue_token(app, client, room_ids, monkeypatch):
+    app.config.update(BOOKING_ADMISSION_MAX_IN_FLIGHT=1, BOOKING_ADMISSION_QUEUE_SIZE=0)
+    inside, release = threading.Event(), threading.Event()
+    real_find_conflicts = booking_routes.find_booking_conflicts
+    def blocking_find_conflicts(processed_slots):
+        if not release.is_set():
+            inside.set()
+            release.wait(10)
+        return real_find_conflicts(processed_slots)
+    monkeypatch.setattr(booking_routes, "find_booking_conflicts", blocking_find_conflicts)
+
+    statuses = []
+    blocked = threading.Thread(target=lambda: statuses.append(
+        app.test_client().post("/api/bookings", json=booking_request(room_ids["Geologia 1"], user_name="Bruno")).status_code
+    ))
+    blocked.start()
+    assert inside.wait(10)
+
+    rejected = client.post("/api/bookings", json=booking_request(room_ids["Cultivo A1"]))
+    assert rejected.status_code == 503
+    body = rejected.get_json()
+    assert body["queue_position"] == 1
+    assert body["queue_token"]
+    assert int(rejected.headers["Retry-After"]) >= 1
+
+    release.set()
+    blocked.join()
+    assert statuses == [200]
+    retried = client.post("/api/bookings", json=booking_request(room_ids["Cultivo A1"]), headers={"X-Queue-Token": body["queue_token"]})
+    assert retried.status_code == 200
@@ -0,0 +1,54 @@
+# /home/ubuntu/lab_scheduler/tests/test_booking_listing.py
+
+# Paginação por keyset de GET /api/bookings (src/services/booking_listing.py): com limit, o
+# cursor da próxima página vem em X-Next-Cursor e no Link rel="next"; as páginas cobrem todos
+# os agendamentos sem repetir, a última não tem cursor e um cursor inválido é recusado.
+
+import re
+from datetime import date, timedelta
+
+from src.extensions import db
+from src.models.entities import Booking, User
+
+PAST_MONDAY = date(2025, 3, 3)
+END_DATE = PAST_MONDAY + timedelta(days=11)
+LISTING_URL = f"/api/bookings?start_date={PAST_MONDAY.isoformat()}&end_date={END_DATE.isoformat()}"
+
+def add_bookings(app, room_ids):
+    with app.app_context():
+        user = User(name="Ana", name_key="ana", email="lab@itv.org")
+        for day in (0, 1, 7, 8, 11):
+            for period in ("Manhã", "Tarde"):
+                db.session.add(Booking(user=user, room_id=room_ids["Geologia 1"], booking_date=PAST_MONDAY + timedelta(days=day), period=period))
+        db.session.add(Booking(user=user, room_id=room_ids["Cultivo A1"], booking_date=PAST_MONDAY, period="Manhã"))
+        db.session.commit()
+        return sorted(booking.id for booking in Booking.query.all())
+
+def test_pages_cover_all_bookings(app, client, room_ids):
+    booking_ids = add_bookings(app, room_ids)
+    full_listing = client.get(LISTING_URL).get_json()
+
+    pages = []
+    url = f"{LISTING_URL}&limit=4"
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        pages.append(response.get_json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            assert "Link" not in response.headers
+            url = None
+        else:
+            link = re.fullmatch(r'<(.+)>; rel="next"', response.headers["Link"]).group(1)
+            assert f"cursor={cursor}" in link and "limit=4" in link
+            url = f"{LISTING_URL}&limit=4&cursor={cursor}"
+
+    assert [len(page) for page in pages] == [4, 4, 3]
+    assert [booking for page in pages for booking in page] == full_listing
+    assert sorted(booking["id"] for page in pages for booking in page) == booking_ids
+
+def test_invalid_pagination_is_rejected(client):
+    for query in ("cursor=nao-e-um-cursor", "limit=0", "limit=abc"):
+        response = client.get(f"{LISTING_URL}&{query}")
+        assert response.status_code == 400, query
+        assert "paginação" in response.get_json()["error"]
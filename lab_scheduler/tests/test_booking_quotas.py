@@ -0,0 +1,55 @@
+# /home/ubuntu/lab_scheduler/tests/test_booking_quotas.py
+
+# Cotas por usuário em POST /api/bookings (src/services/booking_quotas.py, regras padrão):
+#   - uma sala Geral por período;
+#   - no máximo MAX_BOOKINGS_PER_DAY agendamentos por dia, somando todas as salas, contando
+#     os do pedido e os já gravados. Nada do pedido recusado é gravado.
+
+from datetime import date
+
+from src.models.entities import Booking
+from src.services.booking_quotas import MAX_BOOKINGS_PER_DAY
+
+PAST_MONDAY = date(2025, 3, 3) # Semanas passadas sempre aceitam agendamentos
+DAY = PAST_MONDAY.isoformat()
+
+def post_booking(client, slots, user_name="Ana"):
+    return client.post("/api/bookings", json={
+        "user_name": user_name, "user_email": "lab@itv.org", "coordinator_name": "Coord",
+        "slots": [{"room_id": room_id, "booking_date": DAY, "period": period} for room_id, period in slots]
+    })
+
+def booking_count(app):
+    with app.app_context():
+        return Booking.query.count()
+
+def test_one_geral_room_per_period(app, client, room_ids):
+    response = post_booking(client, [(room_ids["Geral 1"], "Manhã"), (room_ids["Geral 2"], "Manhã")])
+    assert response.status_code == 409
+    assert response.get_json()["error"] == f"Não é possível agendar mais de uma sala 'Geral' no mesmo período ('Manhã') em {DAY}."
+
+    assert post_booking(client, [(room_ids["Geral 1"], "Manhã")]).status_code == 200
+    response = post_booking(client, [(room_ids["Geral 2"], "Manhã")], user_name="ana")
+    assert response.status_code == 409
+    assert response.get_json()["error"] == f"Você já possui agendamento para sala 'Geral 1' no período da 'Manhã' em {DAY}."
+    # Outro período do mesmo dia e outro usuário no mesmo período continuam livres
+    assert post_booking(client, [(room_ids["Geral 2"], "Tarde")]).status_code == 200
+    assert post_booking(client, [(room_ids["Geral 3"], "Manhã")], user_name="Bruno").status_code == 200
+
+def test_daily_cap_in_one_request(app, client, room_ids):
+    rooms = [room_ids["Geologia 1"], room_ids["Cultivo A1"], room_ids["Citometria - Bancada"]]
+    response = post_booking(client, [(rooms[0], "Manhã"), (rooms[1], "Manhã"), (rooms[2], "Manhã"), (rooms[0], "Tarde")])
+    assert response.status_code == 409
+    assert response.get_json()["error"] == (
+        f"Cada usuário pode ter no máximo {MAX_BOOKINGS_PER_DAY} agendamentos (sala e período) por dia, "
+        f"somando todas as salas. Em {DAY}: 4 no pedido."
+    )
+    assert booking_count(app) == 0
+
+def test_daily_cap_counts_existing_bookings(app, client, room_ids):
+    assert post_booking(client, [(room_ids["Geologia 1"], "Manhã"), (room_ids["Cultivo A1"], "Manhã")]).status_code == 200
+    assert post_booking(client, [(room_ids["Geologia 1"], "Tarde")]).status_code == 200
+    response = post_booking(client, [(room_ids["Cultivo A1"], "Tarde")], user_name="ANA")
+    assert response.status_code == 409
+    assert response.get_json()["error"].endswith(f"Em {DAY}: 1 no pedido e 3 já agendado(s) (Geologia 1, Cultivo A1, Geologia 1).")
+    assert booking_count(app) == 3
@@ -0,0 +1,130 @@
+# /home/ubuntu/lab_scheduler/tests/test_booking_slots.py
+
+# Um agendamento por slot (sala, data, período), garantido pelo índice único uq_bookings_slot:
+#   - um banco antigo com slots duplicados bloqueia a migração 0001 (relatório do .check.sql)
+#     até dedupe-bookings arquivar e remover os excedentes;
+#   - POST /api/bookings devolve 409 para slot ocupado, inclusive quando outro worker o
+#     reservou entre a verificação e o commit (IntegrityError), e nunca grava só parte do pedido.
+
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from src.extensions import db
+from src.migrations.runner import MigrationError, get_pending_migrations, list_migrations, run_migrations
+from src.models.entities import Booking, EmailOutbox, Room, ScheduleEvent
+from src.routes import booking_routes
+
+PAST_MONDAY = date(2025, 3, 3) # Semanas passadas sempre aceitam agendamentos
+
+def add_booking(room, booking_date, period, user_name="Ana"):
+    booking = Booking(user_name=user_name, user_email="ana@itv.org", room_id=room.id, booking_date=booking_date, period=period)
+    db.session.add(booking)
+    return booking
+
+def index_exists(name):
+    return db.session.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = :name"), {"name": name}).first() is not None
+
+def booking_request(slots, user_name="Ana"):
+    return {
+        "user_name": user_name, "user_email": "lab@itv.org", "coordinator_name": "Coord",
+        "slots": [{"room_id": room_id, "booking_date": booking_date.isoformat(), "period": period} for room_id, booking_date, period in slots]
+    }
+
+# Schema de antes da migração 0001 (sem uq_bookings_slot) com dois slots duplicados
+@pytest.fixture
+def legacy_database(app_context):
+    db.create_all()
+    db.session.execute(text("DROP INDEX uq_bookings_slot"))
+    db.session.commit()
+    room_a, room_b = Room(name="Sala 1"), Room(name="Sala 2")
+    db.session.add_all([room_a, room_b])
+    db.session.flush()
+    kept = [
+        add_booking(room_a, date(2026, 10, 19), "Manhã"),
+        add_booking(room_b, date(2026, 10, 20), "Tarde"),
+        add_booking(room_a, date(2026, 10, 21), "Tarde"), # Slot sem duplicata
+    ]
+    db.session.flush()
+    duplicates = [
+        add_booking(room_a, date(2026, 10, 19), "Manhã", user_name="Bruno"),
+        add_booking(room_a, date(2026, 10, 19), "Manhã", user_name="Carla"),
+        add_booking(room_b, date(2026, 10, 20), "Tarde", user_name="Bruno"),
+    ]
+    db.session.commit()
+    return (room_a, room_b), [booking.id for booking in kept], [booking.id for booking in duplicates]
+
+def test_duplicate_slots_block_the_unique_index(legacy_database):
+    all_versions = [m[0] for m in list_migrations("sqlite")]
+    with pytest.raises(MigrationError) as error:
+        run_migrations(db.engine)
+    report = str(error.value)
+    assert "0001_bookings_slot_unique blocked: 2 rows" in report
+    assert "dedupe-bookings" in report
+    assert "2026-10-19 | Manhã | 3" in report
+    # Nada registrado e nenhum índice criado: a migração inteira foi desfeita
+    assert [m[0] for m in get_pending_migrations(db.engine)] == all_versions
+    assert not index_exists("uq_bookings_slot")
+    assert db.session.query(Booking).count() == 6
+
+def test_dedupe_bookings_then_migrations_apply(app_context, legacy_database, tmp_path):
+    (room_a, room_b), kept_ids, duplicate_ids = legacy_database
+    cli = app_context.test_cli_runner()
+
+    listing = cli.invoke(args=["dedupe-bookings"])
+    assert listing.exit_code == 0
+    assert f"Sala {room_a.id} em 2026-10-19 (Manhã): 3 agendamentos, mantido o id {kept_ids[0]}" in listing.output
+    assert f"Sala {room_b.id} em 2026-10-20 (Tarde): 2 agendamentos, mantido o id {kept_ids[1]}" in listing.output
+    assert db.session.query(Booking).count() == 6 # Sem --apply nada é removido
+
+    applied = cli.invoke(args=["dedupe-bookings", "--apply"])
+    assert applied.exit_code == 0, applied.output
+    db.session.expire_all()
+    assert sorted(row[0] for row in db.session.query(Booking.id)) == sorted(kept_ids)
+    assert len(list((tmp_path / "archives").glob("bookings_duplicates_*.csv.gz"))) == 1
+
+    assert run_migrations(db.engine) == [f"{version:04d}_{name}" for version, name, _ in list_migrations("sqlite")]
+    assert index_exists("uq_bookings_slot")
+    add_booking(room_a, date(2026, 10, 19), "Manhã", user_name="Bruno")
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
+
+def test_taken_slot_is_rejected(client, room_ids):
+    room_id = room_ids["Citometria - Bancada"]
+    assert client.post("/api/bookings", json=booking_request([(room_id, PAST_MONDAY, "Manhã")])).status_code == 200
+    response = client.post("/api/bookings", json=booking_request([(room_id, PAST_MONDAY, "Manhã")], user_name="Bruno"))
+    assert response.status_code == 409
+    assert response.get_json()["error"] == f"Sala 'Citometria - Bancada' já reservada para 'Manhã' em {PAST_MONDAY.isoformat()}."
+
+# Outro worker reserva o slot depois da verificação: o índice único barra o commit, a
+# violação vira o mesmo 409 e nenhum slot do pedido (nem o e-mail ou o evento) é gravado
+def test_slot_taken_between_check_and_commit(app, client, room_ids, monkeypatch):
+    taken_room, free_room = room_ids["Citometria - Bancada"], room_ids["Geologia 1"]
+    assert client.post("/api/bookings", json=booking_request([(taken_room, PAST_MONDAY, "Tarde")])).status_code == 200
+
+    real_find_conflicts = booking_routes.find_booking_conflicts
+    calls = []
+    def pre_check_misses(processed_slots):
+        calls.append(len(processed_slots))
+        return set() if len(calls) == 1 else real_find_conflicts(processed_slots)
+    monkeypatch.setattr(booking_routes, "find_booking_conflicts", pre_check_misses)
+
+    response = client.post("/api/bookings", json=booking_request(
+        [(free_room, PAST_MONDAY, "Tarde"), (taken_room, PAST_MONDAY, "Tarde")], user_name="Bruno"
+    ))
+    assert response.status_code == 409
+    assert response.get_json()["error"] == f"Sala 'Citometria - Bancada' já reservada para 'Tarde' em {PAST_MONDAY.isoformat()}."
+    assert len(calls) == 2 # Pré-verificação e mapeamento da violação
+    with app.app_context():
+        assert [(b.room_id, b.user.name) for b in Booking.query.all()] == [(taken_room, "Ana")]
+        assert EmailOutbox.query.count() == 1
+        assert ScheduleEvent.query.count() == 1
+
+def test_duplicate_slot_in_one_request(client, room_ids):
+    room_id = room_ids["Geologia 1"]
+    response = client.post("/api/bookings", json=booking_request([(room_id, PAST_MONDAY, "Manhã"), (room_id, PAST_MONDAY, "Manhã")]))
+    assert response.status_code == 400
+    assert "Slot duplicado no pedido" in response.get_json()["error"]
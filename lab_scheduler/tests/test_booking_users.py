@@ -0,0 +1,67 @@
+# /home/ubuntu/lab_scheduler/tests/test_booking_users.py
+
+# Nome e e-mail de quem agenda ficam em users (src/services/booking_users.py):
+#   - agendamentos novos gravam só user_id; listagem, grade e exportação leem users, e um
+#     agendamento antigo ainda sem user_id mostra o próprio user_name;
+#   - uma grafia nova do mesmo usuário aparece nos agendamentos antigos e muda o ETag deles;
+#   - a migração 0008 remove o índice por user_name e torna as colunas antigas opcionais.
+
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+from src.extensions import db
+from src.migrations.runner import run_migrations
+from src.models.entities import Booking, User
+
+PAST_MONDAY = date(2025, 3, 3) # Semanas passadas sempre aceitam agendamentos
+LISTING_URL = f"/api/bookings?start_date={PAST_MONDAY.isoformat()}&end_date={(PAST_MONDAY + timedelta(days=4)).isoformat()}"
+GRID_URL = f"/api/schedule/grid?week_start={PAST_MONDAY.isoformat()}"
+
+def book(client, room_id, booking_date, user_name="José Silva", user_email="lab@itv.org"):
+    response = client.post("/api/bookings", json={
+        "user_name": user_name, "user_email": user_email, "coordinator_name": "Coord",
+        "slots": [{"room_id": room_id, "booking_date": booking_date.isoformat(), "period": "Manhã"}]
+    })
+    assert response.status_code == 200, response.get_json()
+
+def test_bookings_are_read_from_users(app, client, room_ids):
+    book(client, room_ids["Geologia 1"], PAST_MONDAY)
+    with app.app_context():
+        booking = Booking.query.one()
+        assert (booking.user_name, booking.user_email, booking.user.name) == (None, None, "José Silva")
+        # Agendamento antigo, anterior ao vínculo com users
+        db.session.add(Booking(user_name="Carla", user_email="carla@itv.org", room_id=room_ids["Cultivo A1"], booking_date=PAST_MONDAY, period="Tarde"))
+        db.session.commit()
+
+    listing = client.get(LISTING_URL).get_json()
+    assert sorted((b["user_name"], b["user_email"]) for b in listing) == [("Carla", "carla@itv.org"), ("José Silva", "lab@itv.org")]
+    assert sorted(client.get(GRID_URL).get_json()["names"]) == ["Carla", "José Silva"]
+    export = client.get(f"/api/export?start_date={PAST_MONDAY.isoformat()}&end_date={PAST_MONDAY.isoformat()}&format=csv")
+    assert "José Silva,lab@itv.org" in export.get_data(as_text=True)
+
+def test_new_spelling_updates_old_weeks(client, room_ids):
+    book(client, room_ids["Geologia 1"], PAST_MONDAY)
+    listing, grid = client.get(LISTING_URL), client.get(GRID_URL)
+
+    book(client, room_ids["Geologia 1"], PAST_MONDAY + timedelta(days=14), user_name="jose  silva", user_email="jose@itv.org")
+    response = client.get(LISTING_URL, headers={"If-None-Match": listing.headers["ETag"]})
+    assert response.status_code == 200
+    assert [(b["user_name"], b["user_email"]) for b in response.get_json()] == [("jose  silva", "jose@itv.org")]
+    response = client.get(GRID_URL, headers={"If-None-Match": grid.headers["ETag"]})
+    assert response.status_code == 200
+    assert response.get_json()["names"] == ["jose  silva"]
+
+def test_user_name_index_is_dropped(app_context):
+    db.create_all()
+    db.session.execute(text("CREATE INDEX ix_bookings_user_date_period ON bookings (user_name, booking_date, period)"))
+    db.session.add(Booking(user_name="Carla", user_email="carla@itv.org", room_id=1, booking_date=PAST_MONDAY, period="Manhã"))
+    db.session.commit()
+
+    assert "0008_bookings_user_columns" in run_migrations(db.engine)
+    indexes = {row[0] for row in db.session.execute(text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'bookings'"))}
+    assert indexes == {"uq_bookings_slot", "ix_bookings_date_room_period", "ix_bookings_user_id_date_period"}
+    assert [(b.user_name, b.period) for b in Booking.query.all()] == [("Carla", "Manhã")]
+    user = User(name="Ana", name_key="ana")
+    db.session.add(Booking(user=user, room_id=1, booking_date=PAST_MONDAY, period="Tarde"))
+    db.session.commit()
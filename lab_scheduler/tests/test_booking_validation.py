@@ -0,0 +1,35 @@
+# /home/ubuntu/lab_scheduler/tests/test_booking_validation.py
+
+# Ordem das validações de POST /api/bookings, slot a slot como sempre foi: dados do slot,
+# janela de agendamento (400) e só então a sala (404). A janela usa o grupo da sala no
+# registro em memória; uma sala desconhecida usa a janela padrão.
+
+from datetime import date
+
+import pytest
+
+PAST_MONDAY = date(2025, 3, 3) # Semanas passadas sempre aceitam agendamentos
+PAST_SATURDAY = date(2025, 3, 8)
+UNKNOWN_ROOM = 9999
+
+def post_slots(client, slots):
+    return client.post("/api/bookings", json={
+        "user_name": "Ana", "user_email": "lab@itv.org", "coordinator_name": "Coord",
+        "slots": [{"room_id": room_id, "booking_date": booking_date.isoformat(), "period": "Manhã"} for room_id, booking_date in slots]
+    })
+
+@pytest.mark.parametrize("room_name", ["Geologia 1", None])
+def test_window_is_checked_before_the_room(client, room_ids, room_name):
+    response = post_slots(client, [(room_ids.get(room_name, UNKNOWN_ROOM), PAST_SATURDAY)])
+    assert response.status_code == 400
+    assert "fim de semana" in response.get_json()["error"]
+
+def test_unknown_room_in_open_window(client):
+    response = post_slots(client, [(UNKNOWN_ROOM, PAST_MONDAY)])
+    assert response.status_code == 404
+    assert response.get_json()["error"] == f"Sala ID {UNKNOWN_ROOM} não encontrada"
+
+# Slot a slot: o primeiro slot inválido decide a resposta
+def test_first_invalid_slot_wins(client, room_ids):
+    assert post_slots(client, [(UNKNOWN_ROOM, PAST_MONDAY), (room_ids["Geologia 1"], PAST_SATURDAY)]).status_code == 404
+    assert post_slots(client, [(room_ids["Geologia 1"], PAST_SATURDAY), (UNKNOWN_ROOM, PAST_MONDAY)]).status_code == 400
@@ -0,0 +1,163 @@
+# /home/ubuntu/lab_scheduler/tests/test_booking_window.py
+
+# Propriedades do calendário da janela de agendamento (src/services/booking_window.py),
+# conferido contra a regra anterior (is_booking_allowed / get_booking_status de antes do
+# calendário, copiada abaixo com o horário atual como parâmetro):
+#   - mesmo (permitido, mensagem) e mesmo status em cada fronteira e 1 microssegundo antes/depois;
+#   - o mesmo em instantes aleatórios (semente fixa);
+#   - o status não muda antes de next_transition_at e muda nele;
+#   - o calendário de cada semana é uma sequência curta e ordenada de trechos distintos;
+#   - regras de um grupo de salas não alteram as do grupo padrão.
+# As semanas ficam em volta de uma data fixa, para que uma falha se repita igual.
+
+import random
+from datetime import date, datetime, time, timedelta, timezone
+
+import pytest
+from flask import Flask
+
+from src.services.booking_window import BookingWindow, DEFAULT_GROUP, week_begins_at, week_monday
+
+# --- Regra anterior (booking_routes.py antes do calendário) ---
+LEGACY_CUTOFF_WEEKDAY = 2
+LEGACY_CUTOFF_TIME = time(21, 0, 0, tzinfo=timezone.utc)
+LEGACY_RELEASE_WEEKDAY = 3
+LEGACY_RELEASE_TIME = time(2, 59, 0, tzinfo=timezone.utc)
+
+def legacy_windows(now_utc):
+    start_of_current_week = week_monday(now_utc.date())
+    start_of_next_week = start_of_current_week + timedelta(days=7)
+    cutoff_current = datetime.combine(start_of_current_week + timedelta(days=LEGACY_CUTOFF_WEEKDAY), LEGACY_CUTOFF_TIME)
+    # A regra antiga somava um dia à liberação marcada entre 00:00 e 03:00 UTC
+    release_next = datetime.combine(start_of_current_week + timedelta(days=LEGACY_RELEASE_WEEKDAY + 1), LEGACY_RELEASE_TIME)
+    cutoff_next = datetime.combine(start_of_next_week + timedelta(days=LEGACY_CUTOFF_WEEKDAY), LEGACY_CUTOFF_TIME)
+    return start_of_current_week, start_of_next_week, cutoff_current, release_next, cutoff_next
+
+def legacy_is_booking_allowed(booking_date_obj, now_utc):
+    start_of_current_week, start_of_next_week, cutoff_current, release_next, cutoff_next = legacy_windows(now_utc)
+    end_of_current_week = start_of_current_week + timedelta(days=4)
+    end_of_next_week = start_of_next_week + timedelta(days=4)
+    if booking_date_obj.weekday() >= 5:
+        return False, f"Agendamentos só permitidos de Seg-Sex. Data: {booking_date_obj.strftime('%d/%m/%Y')} é fim de semana."
+    if start_of_current_week <= booking_date_obj <= end_of_current_week:
+        if now_utc >= cutoff_current:
+            return False, f"Agendamento para semana atual ({start_of_current_week.strftime('%d/%m')}-{end_of_current_week.strftime('%d/%m')}) encerrou Qua 18:00 (Horário Local)."
+        return True, "OK"
+    elif start_of_next_week <= booking_date_obj <= end_of_next_week:
+        if now_utc < release_next:
+            return False, f"Agendamento para próxima semana ({start_of_next_week.strftime('%d/%m')}-{end_of_next_week.strftime('%d/%m')}) abre Qui 23:59 (Horário Local)."
+        elif now_utc >= cutoff_next:
+            return False, f"Agendamento para semana de {start_of_next_week.strftime('%d/%m')} já encerrou (Qua 18:00 Horário Local)."
+        return True, "OK"
+    if booking_date_obj < start_of_current_week:
+        return True, "OK"
+    return False, f"Só é possível agendar para semana atual ou próxima. Data: {booking_date_obj.strftime('%d/%m/%Y')} fora do período permitido."
+
+def legacy_status(now_utc):
+    start_of_current_week, start_of_next_week, cutoff_current, release_next, cutoff_next = legacy_windows(now_utc)
+    return {
+        "current_week_start": start_of_current_week.isoformat(),
+        "current_week_end": (start_of_current_week + timedelta(days=4)).isoformat(),
+        "current_week_open": now_utc < cutoff_current,
+        "current_week_cutoff": cutoff_current.isoformat(),
+        "next_week_start": start_of_next_week.isoformat(),
+        "next_week_end": (start_of_next_week + timedelta(days=4)).isoformat(),
+        "next_week_open": release_next <= now_utc < cutoff_next,
+        "next_week_release": release_next.isoformat(),
+    }
+# ---
+
+def status_without_clock(status):
+    return {k: v for k, v in status.items() if k not in ("server_time_utc", "next_transition_at")}
+
+def assert_matches_legacy(window, now):
+    current_week = week_monday(now.date())
+    for offset in range(-7, 14):
+        booking_date = current_week + timedelta(days=offset)
+        assert window.check(booking_date, now=now) == legacy_is_booking_allowed(booking_date, now), (booking_date, now)
+    assert status_without_clock(window.status(now=now)) == legacy_status(now), now
+
+def assert_constant_until_transition(window, now):
+    transition = window.next_transition_at(now=now)
+    assert transition > now
+    before = status_without_clock(window.status(now=now))
+    for instant in (now + (transition - now) / 2, transition - timedelta(microseconds=1)):
+        assert status_without_clock(window.status(now=instant)) == before, (now, instant)
+    assert status_without_clock(window.status(now=transition)) != before, (now, transition)
+
+ANCHOR = date(2026, 10, 19) # Segunda-feira
+WEEKS = 16
+RANDOM_INSTANTS = 3000
+
+def window_for(group_rules=None):
+    app = Flask(__name__)
+    app.config["BOOKING_WINDOW_GROUP_RULES"] = group_rules or {}
+    return BookingWindow(app)
+
+def weeks_around_anchor():
+    first_week = ANCHOR - timedelta(days=7 * (WEEKS // 2))
+    return [first_week + timedelta(days=7 * week) for week in range(WEEKS)]
+
+def boundary_instants():
+    instants = []
+    for week_start in weeks_around_anchor():
+        _, _, cutoff_current, release_next, _ = legacy_windows(datetime.combine(week_start, time(12, tzinfo=timezone.utc)))
+        for boundary in (cutoff_current, release_next, week_begins_at(week_start)):
+            instants += [boundary - timedelta(microseconds=1), boundary, boundary + timedelta(microseconds=1)]
+    return instants
+
+def random_instants():
+    rng = random.Random(42)
+    start = datetime.combine(weeks_around_anchor()[0], time(0, tzinfo=timezone.utc))
+    return [start + timedelta(seconds=rng.uniform(0, WEEKS * 7 * 86400)) for _ in range(RANDOM_INSTANTS)]
+
+def test_matches_previous_rule_at_boundaries():
+    window = window_for()
+    for now in boundary_instants():
+        assert_matches_legacy(window, now)
+
+def test_matches_previous_rule_at_random_instants():
+    window = window_for()
+    for now in random_instants():
+        assert_matches_legacy(window, now)
+
+def test_status_constant_until_next_transition():
+    window = window_for()
+    for now in boundary_instants() + random_instants()[:500]:
+        assert_constant_until_transition(window, now)
+
+def test_week_calendar_segments():
+    window = window_for()
+    for week_start in weeks_around_anchor():
+        starts, states = window.week_calendar(week_start)
+        assert 1 <= len(starts) <= 6
+        assert starts == sorted(set(starts))
+        assert all(previous != state for previous, state in zip(states, states[1:]))
+        assert states[0].reason == "beyond" and states[-1].reason == "past"
+        # Calculado uma vez por semana e reutilizado
+        assert window.week_calendar(week_start) is window.week_calendar(week_start)
+
+def test_week_monday_puts_sunday_in_next_week():
+    for offset in range(-14, 14):
+        day = ANCHOR + timedelta(days=offset)
+        monday = week_monday(day)
+        assert monday.weekday() == 0
+        assert monday - timedelta(days=1) <= day <= monday + timedelta(days=5)
+
+def test_weekend_is_never_allowed():
+    window = window_for()
+    for now in random_instants()[:200]:
+        saturday = week_monday(now.date()) + timedelta(days=5)
+        for day in (saturday, saturday + timedelta(days=1)):
+            allowed, message = window.check(day, now=now)
+            assert not allowed and "fim de semana" in message
+
+@pytest.mark.parametrize("hour, default_open, group_open", [(20, True, True), (22, False, True), (23, False, False)])
+def test_group_rules_override_only_their_group(hour, default_open, group_open):
+    window = window_for({"Cultivo": {"cutoff_time": "23:00"}})
+    wednesday = ANCHOR + timedelta(days=2)
+    now = datetime.combine(wednesday, time(hour, tzinfo=timezone.utc))
+    assert window.check(ANCHOR, now=now)[0] is default_open
+    assert window.check(ANCHOR, now=now, group="Cultivo")[0] is group_open
+    # Grupo sem regras próprias segue o padrão
+    assert window.check(ANCHOR, now=now, group="Geral") == window.check(ANCHOR, now=now, group=DEFAULT_GROUP)
@@ -0,0 +1,71 @@
+# /home/ubuntu/lab_scheduler/tests/test_clear_bookings.py
+
+# POST /api/admin/clear-bookings (src/services/booking_cleanup.py):
+#   - dry_run só conta o que seria removido;
+#   - a remoção responde NDJSON: uma linha de progresso por lote (CLEAR_BOOKINGS_CHUNK_SIZE)
+#     e o resumo no fim, com o arquivo .csv.gz de auditoria.
+
+import csv
+import gzip
+import json
+import os
+from datetime import date, timedelta
+
+from src.extensions import db
+from src.models.entities import Booking, User
+from src.routes import booking_routes
+
+PAST_MONDAY = date(2025, 3, 3)
+FRIDAY = PAST_MONDAY + timedelta(days=4)
+
+def add_week_bookings(app, room_ids):
+    with app.app_context():
+        user = User(name="Ana", name_key="ana", email="lab@itv.org")
+        for day in range(5):
+            for period in ("Manhã", "Tarde"):
+                db.session.add(Booking(user=user, room_id=room_ids["Geologia 1"], booking_date=PAST_MONDAY + timedelta(days=day), period=period))
+        db.session.add(Booking(user=user, room_id=room_ids["Cultivo A1"], booking_date=PAST_MONDAY, period="Manhã"))
+        db.session.commit()
+
+def clear_request(room_ids, **extra):
+    return dict({
+        "password": booking_routes.ADMIN_PASSWORD, "start_date": PAST_MONDAY.isoformat(),
+        "end_date": FRIDAY.isoformat(), "room_id": room_ids["Geologia 1"]
+    }, **extra)
+
+def remaining_rooms(app):
+    with app.app_context():
+        return sorted(booking.room_id for booking in Booking.query.all())
+
+def test_dry_run_only_counts(app, client, room_ids):
+    add_week_bookings(app, room_ids)
+    response = client.post("/api/admin/clear-bookings", json=clear_request(room_ids, dry_run=True))
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body["count"], body["first_date"], body["last_date"], body["dry_run"]) == (10, PAST_MONDAY.isoformat(), FRIDAY.isoformat(), True)
+    assert len(remaining_rooms(app)) == 11
+
+def test_clear_streams_progress_per_chunk(app, client, room_ids):
+    app.config["CLEAR_BOOKINGS_CHUNK_SIZE"] = 4
+    add_week_bookings(app, room_ids)
+    response = client.post("/api/admin/clear-bookings", json=clear_request(room_ids))
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    archive = lines[0]["archive"]
+    assert lines[:-1] == [{"deleted": 4, "archive": archive}, {"deleted": 8, "archive": archive}, {"deleted": 10, "archive": archive}]
+    summary = lines[-1]
+    assert (summary["count"], summary["archive"], summary["first_date"], summary["last_date"]) == (10, archive, PAST_MONDAY.isoformat(), FRIDAY.isoformat())
+    assert remaining_rooms(app) == [room_ids["Cultivo A1"]]
+
+    with gzip.open(os.path.join(app.config["BOOKINGS_ARCHIVE_DIR"], archive), "rt", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 10
+    assert {(row["user_name"], row["user_email"], row["room_name"]) for row in rows} == {("Ana", "lab@itv.org", "Geologia 1")}
+
+def test_wrong_password_is_rejected(app, client, room_ids):
+    add_week_bookings(app, room_ids)
+    response = client.post("/api/admin/clear-bookings", json=clear_request(room_ids, password="errada"))
+    assert response.status_code == 401
+    assert len(remaining_rooms(app)) == 11
@@ -0,0 +1,126 @@
+# /home/ubuntu/lab_scheduler/tests/test_email_outbox.py
+
+# Outbox de e-mails (src/services/email_outbox.py):
+#   - dois dispatchers reivindicando ao mesmo tempo (cada um com sua sessão, numa thread,
+#     liberados juntos por uma barreira) nunca pegam a mesma mensagem;
+#   - mensagens presas em "sending" voltam uma vez só; retentativas futuras esperam;
+#   - uma falha de envio reagenda a mensagem com backoff, sem afetar as demais do lote.
+
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.extensions import db
+from src.main import init_database
+from src.models.entities import EmailOutbox
+from src.services.email_outbox import claim_pending_emails, dispatch_pending_emails, enqueue_email
+
+STALE_AFTER_SECONDS = 300
+
+@pytest.fixture
+def outbox(app_context):
+    init_database(app_context)
+    return app_context
+
+def add_pending_emails(count, prefix="user"):
+    messages = [enqueue_email(f"{prefix}{i}@itv.org", "Agendamento confirmado", "<p>ok</p>") for i in range(count)]
+    db.session.commit()
+    return {message.id for message in messages}
+
+# Ids reivindicados por cada dispatcher numa rodada simultânea
+def claim_concurrently(app, batch_size, dispatchers=2):
+    barrier = threading.Barrier(dispatchers)
+    claimed = [None] * dispatchers
+    errors = []
+
+    def dispatcher(index):
+        with app.app_context():
+            try:
+                barrier.wait()
+                claimed[index] = {message.id for message in claim_pending_emails(batch_size, STALE_AFTER_SECONDS)}
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=dispatcher, args=(index,)) for index in range(dispatchers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    return claimed
+
+@pytest.mark.parametrize("batch_size", [3, 10, 40])
+def test_concurrent_claims_are_disjoint(outbox, batch_size):
+    pending = add_pending_emails(40)
+    seen = set()
+    for _ in range(40):
+        claimed = claim_concurrently(outbox, batch_size)
+        assert claimed[0].isdisjoint(claimed[1])
+        assert all(len(ids) <= batch_size for ids in claimed)
+        round_ids = claimed[0] | claimed[1]
+        assert seen.isdisjoint(round_ids) # Já reivindicadas (e ainda em "sending") não voltam
+        seen |= round_ids
+        if not round_ids:
+            break
+    assert seen == pending
+    assert {status for (status,) in db.session.query(EmailOutbox.status)} == {"sending"}
+
+# Mensagens presas em "sending" (dispatcher morreu) voltam uma vez só; as recentes ficam
+def test_stale_messages_are_reclaimed_once(outbox):
+    stale = add_pending_emails(10)
+    recent = add_pending_emails(5, prefix="recent")
+    now = datetime.utcnow()
+    for message in EmailOutbox.query.all():
+        message.status = "sending"
+        message.claim_token = "dead-dispatcher"
+        message.claimed_at = now - timedelta(hours=1) if message.id in stale else now
+    db.session.commit()
+
+    claimed = claim_concurrently(outbox, batch_size=20)
+    assert claimed[0].isdisjoint(claimed[1])
+    assert claimed[0] | claimed[1] == stale
+    assert claim_concurrently(outbox, batch_size=20) == [set(), set()]
+    db.session.expire_all()
+    assert {m.id for m in EmailOutbox.query.filter_by(claim_token="dead-dispatcher")} == recent
+
+def test_future_retries_are_not_claimed(outbox):
+    pending = add_pending_emails(4)
+    retry = enqueue_email("later@itv.org", "Agendamento confirmado", "<p>ok</p>")
+    retry.next_attempt_at = datetime.utcnow() + timedelta(minutes=5)
+    db.session.commit()
+    assert {message.id for message in claim_pending_emails(10, STALE_AFTER_SECONDS)} == pending
+
+# Flask-Mail falso: recusa os destinatários em failing
+class FakeMail:
+    def __init__(self, failing):
+        self.failing = failing
+        self.sent = []
+
+    @contextmanager
+    def connect(self):
+        yield self
+
+    def send(self, message):
+        if message.recipients[0] in self.failing:
+            raise OSError("550 mailbox unavailable")
+        self.sent.append(message.recipients[0])
+
+def test_failed_send_is_rescheduled_with_backoff(outbox):
+    add_pending_emails(3)
+    mail = FakeMail({"user1@itv.org"})
+    outbox.extensions["mail"] = mail
+    before = datetime.utcnow()
+
+    assert dispatch_pending_emails(outbox) == (2, 1)
+    assert sorted(mail.sent) == ["user0@itv.org", "user2@itv.org"]
+    failed = EmailOutbox.query.filter_by(recipient="user1@itv.org").one()
+    assert (failed.status, failed.attempts, failed.last_error) == ("pending", 1, "550 mailbox unavailable")
+    base_seconds = outbox.config["EMAIL_OUTBOX_RETRY_BASE_SECONDS"]
+    assert failed.next_attempt_at >= before + timedelta(seconds=base_seconds)
+    assert {m.status for m in EmailOutbox.query.filter(EmailOutbox.recipient != "user1@itv.org")} == {"sent"}
+    # A falha só volta depois do backoff
+    assert dispatch_pending_emails(outbox) == (0, 0)
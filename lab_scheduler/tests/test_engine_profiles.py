@@ -0,0 +1,48 @@
+# /home/ubuntu/lab_scheduler/tests/test_engine_profiles.py
+
+# Lock de escrita do SQLite (src/engine_profiles.py): quando outra thread do worker segura o
+# lock por mais de SQLITE_BUSY_TIMEOUT_MS, POST /api/bookings responde 503 + Retry-After
+# (sem gravar nada) e o evento é contado nas métricas; liberado o lock, o pedido passa.
+
+import threading
+from datetime import date
+
+from src import engine_profiles
+from src.extensions import db
+from src.instrumentation import request_metrics
+from src.models.entities import Booking
+
+PAST_MONDAY = date(2025, 3, 3) # Semanas passadas sempre aceitam agendamentos
+
+def database_busy_count():
+    return request_metrics._events["database_busy"]
+
+def test_busy_write_lock_returns_503(app, client, room_ids):
+    app.config["SQLITE_BUSY_TIMEOUT_MS"] = 200
+    payload = {
+        "user_name": "Ana", "user_email": "lab@itv.org", "coordinator_name": "Coord",
+        "slots": [{"room_id": room_ids["Geologia 1"], "booking_date": PAST_MONDAY.isoformat(), "period": "Manhã"}]
+    }
+    busy_before = database_busy_count()
+
+    held, release = threading.Event(), threading.Event()
+    def hold_write_lock():
+        with engine_profiles._sqlite_write_lock:
+            held.set()
+            release.wait(10)
+    holder = threading.Thread(target=hold_write_lock)
+    holder.start()
+    try:
+        assert held.wait(10)
+        response = client.post("/api/bookings", json=payload)
+    finally:
+        release.set()
+        holder.join()
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert database_busy_count() == busy_before + 1
+    with app.app_context():
+        assert db.session.query(Booking).count() == 0
+
+    assert client.post("/api/bookings", json=payload).status_code == 200
@@ -0,0 +1,45 @@
+# /home/ubuntu/lab_scheduler/tests/test_migrations.py
+
+# Runner de migrações (src/migrations/runner.py) e os índices que elas criam: cada versão é
+# aplicada uma vez, uma versão registrada por outro worker é pulada, e um erro do script é
+# propagado sem registrar a versão.
+
+import pytest
+
+from src.extensions import db
+from src.main import init_database
+from src.migrations import runner
+from src.migrations.explain import check_query_plans
+from src.migrations.runner import MigrationError, get_pending_migrations, list_migrations, run_migrations
+
+def all_migration_names():
+    return [f"{version:04d}_{name}" for version, name, _ in list_migrations("sqlite")]
+
+def test_applies_every_version_once(app_context):
+    db.create_all()
+    assert run_migrations(db.engine) == all_migration_names()
+    assert get_pending_migrations(db.engine) == []
+    assert run_migrations(db.engine) == []
+
+# Dois workers viram as mesmas versões pendentes; o segundo encontra todas já registradas
+def test_versions_applied_by_another_worker_are_skipped(app_context, monkeypatch):
+    db.create_all()
+    pending = get_pending_migrations(db.engine)
+    assert run_migrations(db.engine) == all_migration_names()
+    monkeypatch.setattr(runner, "get_pending_migrations", lambda engine: pending)
+    assert run_migrations(db.engine) == []
+
+# Um erro do script (aqui, tabela já existente) não pode ser tratado como "já aplicada"
+def test_failing_script_is_not_registered(app_context, tmp_path, monkeypatch):
+    db.create_all()
+    (tmp_path / "0001_broken.sqlite.sql").write_text("CREATE TABLE rooms (id INTEGER PRIMARY KEY);\n", encoding="utf-8")
+    monkeypatch.setattr(runner, "VERSIONS_DIR", str(tmp_path))
+    with pytest.raises(MigrationError, match="0001_broken failed"):
+        run_migrations(db.engine)
+    assert [m[0] for m in get_pending_migrations(db.engine)] == [1]
+
+# Mesma verificação de flask --app src.main explain-queries
+def test_route_queries_use_their_indexes(app_context):
+    init_database(app_context)
+    for label, uses_index, plan in check_query_plans(db.engine):
+        assert uses_index, f"{label}: {plan}"
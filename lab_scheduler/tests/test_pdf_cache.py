@@ -0,0 +1,42 @@
+# /home/ubuntu/lab_scheduler/tests/test_pdf_cache.py
+
+# Cache de PDFs da escala (src/services/pdf_cache.py): pedidos simultâneos da mesma semana
+# geram o PDF uma vez só, e o lock da semana sai de _render_locks quando o último termina.
+
+import threading
+import time
+from datetime import date
+
+from src.extensions import db
+from src.services.pdf_cache import pdf_cache
+
+PAST_MONDAY = date(2025, 3, 3)
+
+def test_concurrent_requests_render_once(app_context, monkeypatch):
+    db.create_all()
+    rendered = []
+    def slow_render(html_string):
+        rendered.append(html_string)
+        time.sleep(0.2)
+        return b"%PDF-1.7"
+    monkeypatch.setattr(pdf_cache, "render_pdf_bytes", slow_render)
+
+    barrier = threading.Barrier(8)
+    results = []
+    def request_pdf():
+        with app_context.app_context():
+            barrier.wait()
+            results.append(pdf_cache.get_pdf(PAST_MONDAY))
+            db.session.remove()
+
+    threads = [threading.Thread(target=request_pdf) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(rendered) == 1
+    assert sorted(hit for _, hit in results) == [False] + [True] * 7
+    assert pdf_cache._render_locks == {}
+    assert pdf_cache.get_pdf(PAST_MONDAY) == (results[0][0], True)
+    assert pdf_cache._render_locks == {}
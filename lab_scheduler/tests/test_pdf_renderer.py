@@ -0,0 +1,82 @@
+# /home/ubuntu/lab_scheduler/tests/test_pdf_renderer.py
+
+# Pool de processos de PDF (src/services/pdf_renderer.py), com funções simples no lugar do
+# WeasyPrint (time.sleep para um job travado):
+#   - um job que estoura o tempo encerra só o próprio processo; o job concorrente termina e o
+#     pool continua atendendo;
+#   - o tempo de cada job conta a partir do início dele, não da entrada na fila.
+
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from src.services.pdf_renderer import PdfRenderPool, PdfRenderUnavailable
+
+TIMEOUT_SECONDS = 3
+
+@pytest.fixture
+def make_pool():
+    pools = []
+    def make(workers, queue_size=4):
+        app = Flask(__name__)
+        app.config.update(PDF_RENDER_WORKERS=workers, PDF_RENDER_QUEUE_SIZE=queue_size, PDF_RENDER_TIMEOUT_SECONDS=TIMEOUT_SECONDS)
+        pools.append(PdfRenderPool(app))
+        return pools[-1]
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+# Roda os jobs ao mesmo tempo; devolve o resultado (ou a exceção) e a duração de cada um
+def submit_concurrently(pool, jobs):
+    results = [None] * len(jobs)
+    def run(index, func, args):
+        started = time.monotonic()
+        try:
+            outcome = pool.submit(func, *args)
+        except Exception as e:
+            outcome = e
+        results[index] = (outcome, time.monotonic() - started)
+
+    threads = [threading.Thread(target=run, args=(index, func, args)) for index, (func, args) in enumerate(jobs)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.2) # Ordem de chegada previsível
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_hung_job_does_not_kill_concurrent_job(make_pool):
+    pool = make_pool(workers=2)
+    pool.submit(pow, 2, 3), pool.submit(pow, 2, 3) # Processos já iniciados
+    hung, finished = submit_concurrently(pool, [(time.sleep, (60,)), (time.sleep, (TIMEOUT_SECONDS - 0.5,))])
+
+    assert isinstance(hung[0], PdfRenderUnavailable)
+    assert str(hung[0]) == "Tempo esgotado na geração do PDF"
+    assert hung[1] < TIMEOUT_SECONDS + 1
+    assert finished[0] is None # O processo do job travado foi encerrado sem afetar este
+    assert pool.submit(pow, 2, 10) == 1024
+
+def test_queued_job_timeout_starts_when_it_runs(make_pool):
+    pool = make_pool(workers=1)
+    pool.submit(pow, 2, 3)
+    job = (time.sleep, (TIMEOUT_SECONDS * 0.6,))
+    first, queued = submit_concurrently(pool, [job, job])
+
+    assert first[0] is None
+    assert queued[0] is None # Na fila + execução passa de TIMEOUT_SECONDS, a execução sozinha não
+    assert queued[1] > TIMEOUT_SECONDS
+
+def test_full_queue_is_rejected(make_pool):
+    pool = make_pool(workers=1, queue_size=0)
+    busy, rejected = submit_concurrently(pool, [(time.sleep, (1,)), (pow, (2, 3))])
+    assert busy[0] is None
+    assert isinstance(rejected[0], PdfRenderUnavailable)
+    assert rejected[0].retry_after == 15
+
+def test_job_errors_are_raised(make_pool):
+    pool = make_pool(workers=1)
+    with pytest.raises(ZeroDivisionError):
+        pool.submit(divmod, 1, 0)
+    assert pool.submit(divmod, 7, 2) == (3, 1) # O processo segue em uso
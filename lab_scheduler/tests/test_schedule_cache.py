@@ -0,0 +1,79 @@
+# /home/ubuntu/lab_scheduler/tests/test_schedule_cache.py
+
+# Cache por semana e ETag de GET /api/bookings e /api/schedule/grid:
+#   - um GET condicional com o ETag atual recebe 304 sem consultar os dados da semana;
+#   - um POST ou uma limpeza administrativa na semana mudam o ETag;
+#   - agendamentos da semana seguinte não mudam o ETag da listagem (Seg a Sex, como a grade).
+
+from datetime import date, timedelta
+
+import pytest
+
+from src.routes import booking_routes
+
+PAST_MONDAY = date(2025, 3, 3) # Semanas passadas sempre aceitam agendamentos
+WEEK_URLS = [
+    f"/api/bookings?start_date={PAST_MONDAY.isoformat()}&end_date={(PAST_MONDAY + timedelta(days=6)).isoformat()}",
+    f"/api/schedule/grid?week_start={PAST_MONDAY.isoformat()}",
+]
+
+def book(client, room_id, booking_date, period="Manhã"):
+    response = client.post("/api/bookings", json={
+        "user_name": "Ana", "user_email": "lab@itv.org", "coordinator_name": "Coord",
+        "slots": [{"room_id": room_id, "booking_date": booking_date.isoformat(), "period": period}]
+    })
+    assert response.status_code == 200, response.get_json()
+
+@pytest.fixture
+def data_tag_calls(monkeypatch):
+    calls = []
+    real_week_data_tag = booking_routes.week_data_tag
+    def counting_week_data_tag(start_date, end_date):
+        calls.append((start_date, end_date))
+        return real_week_data_tag(start_date, end_date)
+    monkeypatch.setattr(booking_routes, "week_data_tag", counting_week_data_tag)
+    return calls
+
+@pytest.mark.parametrize("url", WEEK_URLS)
+def test_conditional_get_is_answered_without_reading_the_week(client, room_ids, data_tag_calls, url):
+    book(client, room_ids["Geologia 1"], PAST_MONDAY)
+    first = client.get(url)
+    assert first.status_code == 200
+    assert data_tag_calls == [(PAST_MONDAY, PAST_MONDAY + timedelta(days=4))]
+
+    for _ in range(3):
+        revalidated = client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+        assert revalidated.status_code == 304
+        assert revalidated.headers["ETag"] == first.headers["ETag"]
+        assert revalidated.headers["X-Query-Count"] == "0"
+    assert len(data_tag_calls) == 1
+
+@pytest.mark.parametrize("url", WEEK_URLS)
+def test_new_booking_changes_the_etag(client, room_ids, url):
+    first = client.get(url)
+    book(client, room_ids["Geologia 1"], PAST_MONDAY + timedelta(days=2))
+    response = client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != first.headers["ETag"]
+    assert b"Geologia 1" in response.data or str(room_ids["Geologia 1"]).encode() in response.data
+
+@pytest.mark.parametrize("url", WEEK_URLS)
+def test_next_week_bookings_keep_the_etag(client, room_ids, url):
+    first = client.get(url)
+    book(client, room_ids["Geologia 1"], PAST_MONDAY + timedelta(days=7))
+    response = client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+    assert response.status_code == 304
+
+@pytest.mark.parametrize("url", WEEK_URLS)
+def test_clear_bookings_changes_the_etag(client, room_ids, url):
+    book(client, room_ids["Geologia 1"], PAST_MONDAY)
+    first = client.get(url)
+    cleared = client.post("/api/admin/clear-bookings", json={
+        "password": booking_routes.ADMIN_PASSWORD, "start_date": PAST_MONDAY.isoformat(), "end_date": PAST_MONDAY.isoformat()
+    })
+    assert cleared.status_code == 200
+    cleared.get_data() # Consome o stream: a remoção acontece enquanto a resposta é enviada
+
+    response = client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != first.headers["ETag"]